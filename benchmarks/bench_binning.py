@@ -0,0 +1,122 @@
+"""
+Benchmark the NumPy binning engine against the former astropy path.
+
+Builds a synthetic 30 s cadence series, bins it once per column with
+astropy's ``aggregate_downsample`` (as ``main_plots`` used to) and once with
+``datasets.binning.aggregate_bins``, checks that both agree and prints the
+timings.
+
+Usage:
+  python benchmarks/bench_binning.py [rows] [bin_seconds]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+import astropy.units as u
+from astropy.time import Time
+from astropy.timeseries import TimeSeries, aggregate_downsample
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from datasets.binning import aggregate_bins  # noqa: E402
+
+COLUMNS = {
+    'temperature': 'median',
+    'pressure': 'median',
+    'humidity': 'median',
+    'illuminance': 'median',
+    'wind_speed': 'median',
+    'rain': 'sum',
+    'is_raining': 'mean',
+}
+ASTROPY_FUNCS = {
+    'median': np.nanmedian,
+    'sum': np.nansum,
+    'mean': np.nanmean,
+    'max': np.nanmax,
+}
+
+
+def synthetic_rows(rows, seed=1):
+    rng = np.random.default_rng(seed)
+    # Upload timestamps jitter by a few seconds around the 30 s cadence.
+    seconds = np.arange(rows) * 30.0 + rng.uniform(-5.0, 5.0, rows)
+    jd = 2460000.5 + seconds / 86400.0
+    values = {
+        'temperature': 15.0 + 5.0 * np.sin(np.arange(rows) / 2880.0) + rng.normal(0, 0.3, rows),
+        'pressure': 1013.0 + rng.normal(0, 1.0, rows),
+        'humidity': np.clip(60.0 + rng.normal(0, 10.0, rows), 0.0, 100.0),
+        'illuminance': np.abs(rng.normal(5000.0, 2000.0, rows)),
+        'wind_speed': np.abs(rng.normal(10.0, 5.0, rows)),
+        'rain': np.where(rng.random(rows) < 0.02, 1.25, 0.0),
+        'is_raining': (rng.random(rows) < 0.05).astype(float),
+    }
+    # Sprinkle missing readings like legacy rows with NULLs.
+    values['temperature'][rng.random(rows) < 0.001] = np.nan
+    return jd, values
+
+
+def astropy_path(jd, values, bin_seconds):
+    results = {}
+    x_binned = None
+    for name, how in COLUMNS.items():
+        ts = TimeSeries(time=Time(jd, format='jd'), data={'data': values[name]})
+        binned = aggregate_downsample(
+            ts,
+            time_bin_size=float(bin_seconds) * u.s,
+            aggregate_func=ASTROPY_FUNCS[how],
+        )
+        y = binned['data']
+        mask = np.invert(y.mask) if hasattr(y, 'mask') else np.ones(len(y), dtype=bool)
+        x_binned = binned['time_bin_start'].value[mask]
+        results[name] = np.asarray(y.value if hasattr(y, 'value') else y)[mask]
+    return x_binned, results
+
+
+def numpy_path(jd, values, bin_seconds):
+    return aggregate_bins(
+        jd,
+        {name: (values[name], how) for name, how in COLUMNS.items()},
+        bin_seconds,
+    )
+
+
+def _best_of(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    bin_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 300.0
+    jd, values = synthetic_rows(rows)
+
+    astropy_s, (x_ref, ref) = _best_of(lambda: astropy_path(jd, values, bin_seconds), 1)
+    numpy_s, (x_new, new) = _best_of(lambda: numpy_path(jd, values, bin_seconds), 5)
+
+    print(f'rows={rows:,} bin_seconds={bin_seconds:g} columns={len(COLUMNS)}')
+    print(f'astropy aggregate_downsample: {astropy_s * 1000:9.1f} ms')
+    print(f'numpy aggregate_bins:         {numpy_s * 1000:9.1f} ms')
+    print(f'speed-up:                     {astropy_s / numpy_s:9.1f}x')
+
+    if len(x_ref) != len(x_new) or not np.allclose(x_ref, x_new, rtol=0, atol=1e-7):
+        print('MISMATCH: bin start times differ')
+        sys.exit(1)
+    for name in COLUMNS:
+        if not np.allclose(ref[name], new[name], equal_nan=True):
+            print(f'MISMATCH: {name}')
+            sys.exit(1)
+    print('results match')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark the vectorized JD to local wall-clock conversion.
+
+Converts a synthetic series spanning both 2024 DST changes once with the
+former per-element path (astropy ``Time(...).datetime`` plus ``astimezone``
+on every datetime) and once with ``datasets.local_time.jd_to_local_datetime64``
+and prints the timings. Results are checked against an exact per-element
+``datetime.fromtimestamp`` on the same epoch ms: the former path truncates
+astropy's float noise (``00:59:59.999``), which puts samples exactly on a
+transition on the wrong side of it.
+
+Usage:
+  python benchmarks/bench_local_time.py [points] [timezone]
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from astropy.time import Time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from datasets.local_time import jd_to_epoch_ms, jd_to_local_datetime64, offset_table  # noqa: E402
+
+
+def synthetic_jd(points):
+    # 60 s cadence starting a week before the 2024 spring-forward in Europe
+    return Time('2024-03-24T00:00:00').jd + np.arange(points) * 60.0 / 86400.0
+
+
+def per_element_path(x_jd, tz):
+    datetimes = Time(x_jd, format='jd').datetime
+    local = np.array([
+        dt.replace(tzinfo=timezone.utc).astimezone(tz).replace(tzinfo=None)
+        for dt in datetimes
+    ])
+    return local.astype('datetime64[ms]')
+
+
+def exact_reference(x_jd, tz):
+    local = [
+        datetime.fromtimestamp(ms / 1000, tz).replace(tzinfo=None)
+        for ms in jd_to_epoch_ms(x_jd).tolist()
+    ]
+    return np.array(local, dtype='datetime64[ms]')
+
+
+def _best_of(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    tz = ZoneInfo(sys.argv[2] if len(sys.argv) > 2 else 'Europe/Berlin')
+    x_jd = synthetic_jd(points)
+
+    loop_s, _ = _best_of(lambda: per_element_path(x_jd, tz), 1)
+    offset_table.cache_clear()
+    cold_s, _ = _best_of(lambda: jd_to_local_datetime64(x_jd, tz), 1)
+    warm_s, new = _best_of(lambda: jd_to_local_datetime64(x_jd, tz), 5)
+
+    print(f'points={points:,} timezone={tz.key}')
+    print(f'astropy + astimezone loop:   {loop_s * 1000:9.1f} ms')
+    print(f'vectorized (cold table):     {cold_s * 1000:9.1f} ms')
+    print(f'vectorized (cached table):   {warm_s * 1000:9.1f} ms')
+    print(f'speed-up (cached):           {loop_s / warm_s:9.1f}x')
+
+    ref = exact_reference(x_jd, tz)
+    if not np.array_equal(ref, new):
+        diff = np.abs(ref.astype(np.int64) - new.astype(np.int64))
+        print(f'MISMATCH: max difference {diff.max()} ms')
+        sys.exit(1)
+    print('results match')
+
+
+if __name__ == '__main__':
+    main()
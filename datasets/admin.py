@@ -1,9 +1,14 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 from django.contrib.auth import get_user_model
+from django.db.models import Max, Min
 from django_otp.admin import OTPAdminSite
 
+from .api.credential_cache import invalidate_upload_credentials
+from .conditions import invalidate_snapshot
+from .data_versions import bump_data_version
 from .models import Dataset, UploadDevice, UploadSigningKey
+from .rollups import refresh_rollups
 
 # Require TOTP for Django admin logins.
 admin.site.__class__ = OTPAdminSite
@@ -26,6 +31,51 @@ class DatasetAdmin(admin.ModelAdmin):
     readonly_fields = ('added_on', 'last_modified', 'upload_device')
     date_hierarchy = 'added_on'
 
+    def save_model(self, request, obj, form, change):
+        old_jd = None
+        if change:
+            old_jd = Dataset.objects.filter(pk=obj.pk).values_list('jd', flat=True).first()
+        super().save_model(request, obj, form, change)
+        self._data_changed(obj.jd)
+        if old_jd is not None and old_jd != obj.jd:
+            self._data_changed(old_jd)
+
+    def delete_model(self, request, obj):
+        jd = obj.jd
+        super().delete_model(request, obj)
+        self._data_changed(jd)
+
+    def delete_queryset(self, request, queryset):
+        jd_range = queryset.aggregate(lo=Min('jd'), hi=Max('jd'))
+        super().delete_queryset(request, queryset)
+        if jd_range['lo'] is not None:
+            # One refresh over the whole range, not one per row
+            self._data_changed(jd_range['lo'], jd_range['hi'])
+
+    @staticmethod
+    def _data_changed(start_jd, end_jd=None):
+        if end_jd is None:
+            end_jd = start_jd
+        refresh_rollups(start_jd, end_jd)
+        bump_data_version(start_jd, end_jd)
+        invalidate_snapshot()
+
+
+class UploadCredentialsAdminMixin:
+    """Drop the upload workers' cached credentials after admin changes."""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_upload_credentials()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_upload_credentials()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        invalidate_upload_credentials()
+
 
 class UploadSigningKeyInline(admin.TabularInline):
     model = UploadSigningKey
@@ -41,7 +91,7 @@ class UploadSigningKeyInline(admin.TabularInline):
 
 
 @admin.register(UploadDevice)
-class UploadDeviceAdmin(admin.ModelAdmin):
+class UploadDeviceAdmin(UploadCredentialsAdminMixin, admin.ModelAdmin):
     list_display = ('device_id', 'label', 'is_active', 'service_user', 'created_at')
     list_filter = ('is_active',)
     search_fields = ('device_id', 'label')
@@ -50,7 +100,7 @@ class UploadDeviceAdmin(admin.ModelAdmin):
 
 
 @admin.register(UploadSigningKey)
-class UploadSigningKeyAdmin(admin.ModelAdmin):
+class UploadSigningKeyAdmin(UploadCredentialsAdminMixin, admin.ModelAdmin):
     list_display = (
         'key_id', 'device', 'valid_from', 'valid_until', 'revoked_at', 'created_at',
     )
@@ -0,0 +1,225 @@
+"""
+Async (ASGI) versions of the read-only API endpoints.
+
+With ``ASYNC_READ_API = True`` the URLs of ``last_dataset``, ``plot-data``,
+``additional-plots`` and ``download-csv`` route to these views. Run the
+site under uvicorn workers (``weather_station.asgi``) to benefit: a CSV
+export then streams from an async database iterator and a plot render
+runs in a thread of its own, so slow clients and long renders no longer
+occupy one of the few sync workers while the dashboard waits.
+
+The views answer like their DRF counterparts in ``views.py`` (same
+helpers, payloads, throttles and status codes); DRF itself has no async
+views, so they return plain ``JsonResponse`` objects.
+"""
+
+import logging
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_GET
+from rest_framework.request import Request
+
+from datasets.conditions import current_conditions
+from datasets.forms import plot_form_from_query
+from datasets.models import Dataset
+from datasets.plots import PLOT_DATA_FIGURES, additional_plots_components, plot_data
+
+from .serializers import DatasetSerializer
+from .throttles import DownloadRateThrottle, PlotRateThrottle
+from .views import (
+    CSV_FIELD_NAMES,
+    MAX_JSON_DOWNLOAD_ROWS,
+    _cache_headers,
+    _csv_headers,
+    _download_etag,
+    _download_jd_range,
+    _json_download_limit_error,
+    _not_modified_response,
+    _plot_data_delta_payload,
+    _plot_query_params,
+    _since_jd,
+    _wants_csv,
+    csv_row,
+    csv_writer,
+)
+
+logger = logging.getLogger('weather.api')
+
+INVALID_PLOT_PARAMS = {'code': 'invalid_plot_params', 'detail': 'Invalid plot parameters'}
+
+
+def _throttle_wait(request, throttle_classes):
+    """Seconds until the request is allowed again, `None` if it is allowed now."""
+    # Anonymous like the DRF views (authentication_classes([]))
+    drf_request = Request(request, authenticators=())
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(drf_request, None):
+            return throttle.wait() or 1
+    return None
+
+
+async def _throttled_response(request, throttle_classes):
+    wait = await sync_to_async(_throttle_wait)(request, throttle_classes)
+    if wait is None:
+        return None
+    wait = int(round(wait))
+    response = JsonResponse(
+        {'detail': f'Request was throttled. Expected available in {wait} seconds.'},
+        status=429,
+    )
+    response['Retry-After'] = str(wait)
+    return response
+
+
+async def _staff_fresh_requested(request):
+    bypass_key = getattr(settings, 'PLOT_CACHE_BYPASS_QUERY', 'fresh')
+    if request.GET.get(bypass_key) != '1':
+        return False
+    user = await request.auser()
+    return bool(user.is_authenticated and user.is_staff)
+
+
+def _plot_form(request):
+    """Valid plot form and ``since_jd`` of a plot query, or ``(None, None)``."""
+    query = _plot_query_params(request)
+    form = plot_form_from_query(query)
+    try:
+        since_jd = _since_jd(query)
+    except ValueError:
+        return None, None
+    if not form.is_valid():
+        return None, None
+    return form, since_jd
+
+
+@require_GET
+async def get_last_dataset(request):
+    conditions = await sync_to_async(current_conditions)()
+    if conditions is None:
+        return JsonResponse({'detail': 'No datasets available.'}, status=404)
+    return JsonResponse(conditions['reading'])
+
+
+@require_GET
+async def plot_data_view(request):
+    """Async ``plot-data`` (see ``views.plot_data_view``)."""
+    throttled = await _throttled_response(request, [PlotRateThrottle])
+    if throttled is not None:
+        return throttled
+    plot_set = request.GET.get('set', 'main')
+    form, since_jd = _plot_form(request)
+    if plot_set not in PLOT_DATA_FIGURES or form is None:
+        return JsonResponse(INVALID_PLOT_PARAMS, status=400)
+
+    fresh = await _staff_fresh_requested(request)
+    if since_jd is not None and not form.cleaned_data.get('downsample'):
+        payload = await sync_to_async(_plot_data_delta_payload)(
+            plot_set, since_jd, fresh, form.cleaned_data,
+        )
+        return JsonResponse(payload)
+    payload, plot_meta = await sync_to_async(plot_data)(
+        plot_set, fresh=fresh, **form.cleaned_data,
+    )
+    return JsonResponse({
+        **payload,
+        'set': plot_set,
+        'cache_hit': plot_meta.get('cache_hit', False),
+        'cache_state': plot_meta.get('cache_state'),
+    })
+
+
+@require_GET
+async def additional_plots(request):
+    """Async ``additional-plots`` (see ``views.additional_plots``)."""
+    throttled = await _throttled_response(request, [PlotRateThrottle])
+    if throttled is not None:
+        return throttled
+    form, since_jd = _plot_form(request)
+    if form is None:
+        return JsonResponse(INVALID_PLOT_PARAMS, status=400)
+
+    fresh = await _staff_fresh_requested(request)
+    if since_jd is not None and not form.cleaned_data.get('downsample'):
+        payload = await sync_to_async(_plot_data_delta_payload)(
+            'additional', since_jd, fresh, form.cleaned_data,
+        )
+        return JsonResponse(payload)
+    script, figures, plot_meta = await sync_to_async(additional_plots_components)(
+        fresh=fresh, **form.cleaned_data,
+    )
+    payload = {
+        'script': script,
+        'figures': figures,
+        'cache_hit': plot_meta.get('cache_hit', False),
+        'cache_state': plot_meta.get('cache_state'),
+    }
+    if figures.get('note'):
+        payload['note'] = figures['note']
+    return JsonResponse(payload)
+
+
+async def _csv_rows(qs):
+    writer = csv_writer()
+    yield writer.writerow(CSV_FIELD_NAMES)
+    # values(), not values_list(): the latter runs its query on the event
+    # loop thread in aiterator()
+    async for values in qs.values(*CSV_FIELD_NAMES).aiterator(chunk_size=2000):
+        yield writer.writerow(csv_row(values[name] for name in CSV_FIELD_NAMES))
+
+
+@require_GET
+async def download_csv(request):
+    """Async ``download-csv``: the CSV streams from an async database iterator."""
+    # Throttle before the page cache, like the DRF view: cached responses
+    # count, too.
+    throttled = await _throttled_response(request, [DownloadRateThrottle])
+    if throttled is not None:
+        return throttled
+    return await _download_csv(request)
+
+
+@cache_page(60)
+async def _download_csv(request):
+    try:
+        start_jd, end_jd, errors = _download_jd_range(request.GET)
+        if errors is not None:
+            errors = {field: [str(error) for error in field_errors] for field, field_errors in errors.items()}
+            return JsonResponse({'status': 'error', 'errors': errors}, status=400)
+
+        start_time = datetime.now()
+        qs = Dataset.objects.filter(jd__range=[start_jd, end_jd]).order_by('jd')
+        latest = await qs.order_by('-added_on').values('added_on').afirst()
+        last_modified = latest['added_on'] if latest and latest['added_on'] else None
+        etag = _download_etag(start_jd, end_jd, last_modified)
+        not_modified = _not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        if _wants_csv(request):
+            response = StreamingHttpResponse(_csv_rows(qs), content_type='text/csv')
+            _csv_headers(response, request, etag, last_modified)
+            logger.info(
+                'download_csv csv async range=[%s,%s] duration_ms=%.1f',
+                start_jd, end_jd, (datetime.now() - start_time).total_seconds() * 1000,
+            )
+            return response
+
+        if await qs.acount() > MAX_JSON_DOWNLOAD_ROWS:
+            return JsonResponse(_json_download_limit_error(), status=400)
+        data = [DatasetSerializer(obj).data async for obj in qs]
+        response = JsonResponse({'status': 'success', 'data': data})
+        _cache_headers(response, etag, last_modified)
+        logger.info(
+            'download_csv json async range=[%s,%s] rows=%s duration_ms=%.1f',
+            start_jd, end_jd, len(data), (datetime.now() - start_time).total_seconds() * 1000,
+        )
+        return response
+    except Exception as exc:
+        logger.exception('download_csv failed')
+        message = str(exc) if settings.DEBUG else 'Internal server error'
+        return JsonResponse({'status': 'error', 'message': message}, status=500)
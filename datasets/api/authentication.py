@@ -12,10 +12,10 @@ from django.utils import timezone
 from rest_framework import exceptions
 from rest_framework.authentication import BaseAuthentication, BasicAuthentication
 
-from datasets.credentials import decrypt_secret
 from datasets.models import UploadDevice, UploadSigningKey
 
 from . import signing
+from .credential_cache import get_credential
 
 logger = logging.getLogger('weather.upload')
 
@@ -34,6 +34,9 @@ class DeviceHMACAuthentication(BaseAuthentication):
     """Authenticate uploads via HMAC-SHA256 over the exact raw body."""
 
     www_authenticate_realm = 'weather-upload'
+    content_type = signing.DEFAULT_CONTENT_TYPE
+    canonical_path_setting = 'UPLOAD_HMAC_CANONICAL_PATH'
+    default_canonical_path = '/weather_station/weather_api/datasets/'
 
     def authenticate(self, request):
         device_id = request.META.get(HEADER_DEVICE)
@@ -65,21 +68,20 @@ class DeviceHMACAuthentication(BaseAuthentication):
             raise exceptions.AuthenticationFailed('Invalid upload credentials')
 
         try:
-            device = UploadDevice.objects.select_related('service_user').get(device_id=device_id)
+            credential = get_credential(device_id, key_id)
         except UploadDevice.DoesNotExist:
             logger.info('hmac_auth_failed reason=unknown_device device=%s', device_id)
             raise exceptions.AuthenticationFailed('Invalid upload credentials')
+        except UploadSigningKey.DoesNotExist:
+            logger.info('hmac_auth_failed reason=unknown_key device=%s key_id=%s', device_id, key_id)
+            raise exceptions.AuthenticationFailed('Invalid upload credentials')
+        device = credential.device
+        signing_key = credential.signing_key
 
         if not device.is_active or not device.service_user.is_active:
             logger.info('hmac_auth_failed reason=inactive_device device=%s', device_id)
             raise exceptions.AuthenticationFailed('Invalid upload credentials')
 
-        try:
-            signing_key = UploadSigningKey.objects.get(device=device, key_id=key_id)
-        except UploadSigningKey.DoesNotExist:
-            logger.info('hmac_auth_failed reason=unknown_key device=%s key_id=%s', device_id, key_id)
-            raise exceptions.AuthenticationFailed('Invalid upload credentials')
-
         now_dt = timezone.now()
         if signing_key.revoked_at is not None:
             raise exceptions.AuthenticationFailed('Invalid upload credentials')
@@ -89,24 +91,23 @@ class DeviceHMACAuthentication(BaseAuthentication):
             raise exceptions.AuthenticationFailed('Invalid upload credentials')
 
         content_type = (request.META.get('CONTENT_TYPE') or '').split(';')[0].strip().lower()
-        if content_type != signing.DEFAULT_CONTENT_TYPE:
+        if content_type != self.content_type:
             raise exceptions.AuthenticationFailed('Invalid upload credentials')
 
         body = request.body
         body_digest = signing.body_sha256_hex(body)
-        path = getattr(settings, 'UPLOAD_HMAC_CANONICAL_PATH', '/weather_station/weather_api/datasets/')
+        path = getattr(settings, self.canonical_path_setting, self.default_canonical_path)
         canonical = signing.canonical_string(
             method=signing.DEFAULT_METHOD,
             path=path,
-            content_type=signing.DEFAULT_CONTENT_TYPE,
+            content_type=self.content_type,
             device_id=device_id,
             key_id=key_id,
             timestamp=str(ts),
             nonce=nonce.lower(),
             body_digest_hex=body_digest,
         )
-        secret = decrypt_secret(signing_key.encrypted_secret)
-        if not signing.verify_signature(secret, canonical, signature):
+        if not signing.verify_signature(credential.secret, canonical, signature):
             logger.info('hmac_auth_failed reason=bad_signature device=%s key_id=%s', device_id, key_id)
             raise exceptions.AuthenticationFailed('Invalid upload credentials')
 
@@ -125,6 +126,14 @@ class DeviceHMACAuthentication(BaseAuthentication):
         return f'WeatherHMAC realm="{self.www_authenticate_realm}"'
 
 
+class DeviceHMACBatchAuthentication(DeviceHMACAuthentication):
+    """WEATHER-HMAC-V1 over an NDJSON batch body (own canonical path)."""
+
+    content_type = signing.NDJSON_CONTENT_TYPE
+    canonical_path_setting = 'UPLOAD_HMAC_BATCH_CANONICAL_PATH'
+    default_canonical_path = '/weather_station/weather_api/datasets/batch/'
+
+
 class LegacyUploadBasicAuthentication(BasicAuthentication):
     """
     Basic Auth restricted to the dedicated legacy upload user.
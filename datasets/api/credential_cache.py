@@ -0,0 +1,124 @@
+"""
+Per-process cache of upload devices and decrypted signing keys.
+
+HMAC authentication needs the device, its signing key and the decrypted
+secret for every upload. They are kept per worker for
+``UPLOAD_CREDENTIAL_CACHE_TTL_SECONDS`` so the upload path does neither
+database queries nor Fernet decryption. Entries are tagged with a version
+token in the shared cache (Redis in production); revoking or rotating keys
+and admin edits bump the token, which drops the entries in every worker
+on their next lookup.
+
+Validity windows and the active flags are still checked on every request,
+only against the cached rows.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+from datasets.credentials import decrypt_secret
+from datasets.models import UploadDevice, UploadSigningKey
+
+logger = logging.getLogger('weather.upload')
+
+VERSION_KEY = 'upload_credentials:version'
+
+#   Marks a version lookup that failed; such entries are never cached.
+_UNAVAILABLE = object()
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class UploadCredential:
+    device: UploadDevice
+    signing_key: UploadSigningKey
+    secret: bytes
+    version: object
+    expires_at: float
+
+
+def _ttl():
+    return float(getattr(settings, 'UPLOAD_CREDENTIAL_CACHE_TTL_SECONDS', 300))
+
+
+def _max_entries():
+    return int(getattr(settings, 'UPLOAD_CREDENTIAL_CACHE_SIZE', 64))
+
+
+def credentials_version():
+    """Current version token; seeded from the clock when missing (cold cache)."""
+    try:
+        token = cache.get(VERSION_KEY)
+        if token is None:
+            cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+            token = cache.get(VERSION_KEY)
+        return _UNAVAILABLE if token is None else token
+    except Exception:
+        logger.exception('credential_version_unavailable')
+        return _UNAVAILABLE
+
+
+def invalidate_upload_credentials():
+    """Drop cached credentials in all workers (after key or device changes)."""
+    with _lock:
+        _entries.clear()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Not seeded yet (or evicted): any fresh clock value is new.
+        if not cache.add(VERSION_KEY, time.time_ns(), timeout=None):
+            cache.incr(VERSION_KEY)
+
+
+def clear_credential_cache():
+    """Forget this worker's entries (the shared version token is kept)."""
+    with _lock:
+        _entries.clear()
+
+
+def _load(device_id, key_id, version):
+    device = UploadDevice.objects.select_related('service_user').get(device_id=device_id)
+    signing_key = UploadSigningKey.objects.get(device=device, key_id=key_id)
+    return UploadCredential(
+        device=device,
+        signing_key=signing_key,
+        secret=decrypt_secret(signing_key.encrypted_secret),
+        version=version,
+        expires_at=time.monotonic() + _ttl(),
+    )
+
+
+def get_credential(device_id, key_id):
+    """
+    Device, signing key and decrypted secret of an upload key
+
+    Raises ``UploadDevice.DoesNotExist`` or ``UploadSigningKey.DoesNotExist``
+    for unknown ids; those are not cached.
+    """
+    version = credentials_version()
+    cacheable = version is not _UNAVAILABLE and _ttl() > 0
+    key = (device_id, key_id)
+    if cacheable:
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None:
+                if entry.version == version and entry.expires_at > time.monotonic():
+                    _entries.move_to_end(key)
+                    return entry
+                del _entries[key]
+
+    entry = _load(device_id, key_id, version)
+    if cacheable:
+        with _lock:
+            _entries[key] = entry
+            while len(_entries) > _max_entries():
+                _entries.popitem(last=False)
+    return entry
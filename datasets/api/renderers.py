@@ -0,0 +1,23 @@
+"""DRF renderers for non-JSON API responses."""
+
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Accepts ``text/event-stream`` (``EventSource``) requests.
+
+    Streams are returned as ``StreamingHttpResponse``; only error responses
+    go through ``render`` and are sent as JSON.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data).encode(self.charset)
@@ -1,23 +1,114 @@
-"""Redis/cache-backed nonce replay and idempotent upload retries."""
+"""Redis/cache-backed nonce replay and idempotent upload retries.
+
+``reserve_nonce`` reserves a nonce or returns what is stored for it in one
+round trip: an atomic Lua script with ``REDIS_URL``, otherwise the Django
+cache (``cache.add`` and a ``get`` on conflict). Stored values are JSON
+with ``state`` (``pending`` / ``queued`` / ``success``), the body digest
+and, after success, the created primary key(s). ``clear_reservation``
+drops a queued upload the writer could not store, so a retry is taken in
+again.
+"""
 
 from __future__ import annotations
 
 import json
 import logging
 from dataclasses import dataclass
-from typing import Optional
+from functools import lru_cache
+from typing import List, Optional
 
 from django.conf import settings
 from django.core.cache import caches
 from django.core.cache.backends.base import InvalidCacheBackendError
 
+from datasets.redis_client import redis_client
+
 logger = logging.getLogger('weather.upload')
 
+#   GET, and SET with expiry only if the key is missing. Returns the stored
+#   value, or nil for a fresh reservation.
+CLAIM_SCRIPT = """
+local existing = redis.call('GET', KEYS[1])
+if existing then
+    return existing
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', tonumber(ARGV[2]))
+return false
+"""
+
 
 @dataclass
 class ReplayReservation:
     key: str
     created: bool
+    existing: Optional[dict] = None
+
+    def stored_pk(self) -> Optional[int]:
+        """Primary key of a completed single upload with this nonce."""
+        if not self.existing or self.existing.get('state') != 'success':
+            return None
+        pk = self.existing.get('pk')
+        return int(pk) if pk is not None else None
+
+    def stored_pks(self) -> Optional[List[int]]:
+        """Primary keys of a completed batch upload with this nonce."""
+        if not self.existing or self.existing.get('state') != 'success':
+            return None
+        pks = self.existing.get('pks')
+        return [int(pk) for pk in pks] if pks is not None else None
+
+    def is_queued(self) -> bool:
+        """Whether the upload with this nonce waits in the ingest queue."""
+        return bool(self.existing) and self.existing.get('state') == 'queued'
+
+
+class CacheReplayStore:
+    """Replay store on a Django cache alias (fallback without Redis)."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def claim(self, key: str, payload: str, ttl: int) -> Optional[str]:
+        if self.cache.add(key, payload, timeout=ttl):
+            return None
+        raw = self.cache.get(key)
+        if raw is None:
+            # Race: expired between add failure and get — try once more.
+            if self.cache.add(key, payload, timeout=ttl):
+                return None
+            raw = self.cache.get(key)
+        # Unreadable value: report as taken (pending) rather than reserve twice.
+        return raw if raw is not None else '{}'
+
+    def get(self, key: str) -> Optional[str]:
+        return self.cache.get(key)
+
+    def set(self, key: str, payload: str, ttl: int) -> None:
+        self.cache.set(key, payload, timeout=ttl)
+
+    def delete(self, key: str) -> None:
+        self.cache.delete(key)
+
+
+class RedisReplayStore:
+    """Replay store on Redis; a reservation is one atomic script call."""
+
+    def __init__(self, client, prefix: str = ''):
+        self.client = client
+        self.prefix = prefix
+        self._claim = client.register_script(CLAIM_SCRIPT)
+
+    def claim(self, key: str, payload: str, ttl: int) -> Optional[str]:
+        return self._claim(keys=[self.prefix + key], args=[payload, int(ttl)])
+
+    def get(self, key: str) -> Optional[str]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, payload: str, ttl: int) -> None:
+        self.client.set(self.prefix + key, payload, ex=int(ttl))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
 
 
 def _cache():
@@ -28,6 +119,29 @@ def _cache():
         return caches['default']
 
 
+@lru_cache(maxsize=1)
+def _redis_store(client, prefix):
+    return RedisReplayStore(client, prefix)
+
+
+def replay_store():
+    """
+    Backend selected by ``UPLOAD_REPLAY_BACKEND``
+
+    ``auto`` uses Redis when ``REDIS_URL`` is set and the cache alias
+    otherwise; ``redis`` and ``cache`` force one of them.
+    """
+    backend = getattr(settings, 'UPLOAD_REPLAY_BACKEND', 'auto')
+    if backend != 'cache':
+        client = redis_client()
+        if client is not None:
+            return _redis_store(client, getattr(settings, 'UPLOAD_REPLAY_REDIS_PREFIX', 'weather:'))
+        if backend == 'redis':
+            logger.error('replay_store_unavailable reason=no_redis_client')
+            raise ReplayStoreUnavailable('UPLOAD_REPLAY_BACKEND=redis requires REDIS_URL')
+    return CacheReplayStore(_cache())
+
+
 def _ttl() -> int:
     return int(getattr(settings, 'UPLOAD_HMAC_REPLAY_TTL_SECONDS', 600))
 
@@ -36,81 +150,103 @@ def replay_key(device_id: str, key_id: str, nonce: str) -> str:
     return f'upload-hmac-v1:{device_id}:{key_id}:{nonce}'
 
 
+def _decode(raw) -> Optional[dict]:
+    if not raw:
+        return None
+    if isinstance(raw, dict):
+        return raw
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8', 'replace')
+    try:
+        value = json.loads(raw)
+    except Exception:
+        return None
+    return value if isinstance(value, dict) else None
+
+
 def reserve_nonce(device_id: str, key_id: str, nonce: str, body_digest: str) -> ReplayReservation:
     """
-    Atomically reserve a nonce.
+    Atomically reserve a nonce, or return what is stored for it.
 
-    Returns created=True for a fresh reservation.
+    Returns created=True for a fresh reservation. Otherwise ``existing``
+    holds the stored state (see ``ReplayReservation.stored_pk``).
     Raises ReplayConflict for same nonce with different body.
-    Raises ReplayStoreUnavailable if the cache backend fails.
+    Raises ReplayStoreUnavailable if the store fails.
     """
-    cache = _cache()
     key = replay_key(device_id, key_id, nonce)
     payload = json.dumps({'state': 'pending', 'body_digest': body_digest})
     try:
-        created = cache.add(key, payload, timeout=_ttl())
+        raw = replay_store().claim(key, payload, _ttl())
+    except ReplayStoreUnavailable:
+        raise
     except Exception as exc:
-        logger.error('replay_store_unavailable op=add device=%s key_id=%s', device_id, key_id)
+        logger.error('replay_store_unavailable op=claim device=%s key_id=%s', device_id, key_id)
         raise ReplayStoreUnavailable from exc
 
-    if created:
+    if raw is None:
         return ReplayReservation(key=key, created=True)
-
-    existing = _load(key)
-    if existing is None:
-        # Race: expired between add failure and get — try once more.
-        try:
-            created = cache.add(key, payload, timeout=_ttl())
-        except Exception as exc:
-            raise ReplayStoreUnavailable from exc
-        if created:
-            return ReplayReservation(key=key, created=True)
-        existing = _load(key)
-
+    existing = _decode(raw)
     if existing and existing.get('body_digest') != body_digest:
         raise ReplayConflict('nonce reused with different body')
-    return ReplayReservation(key=key, created=False)
+    return ReplayReservation(key=key, created=False, existing=existing)
+
+
+def _store_state(reservation: ReplayReservation, payload: dict) -> None:
+    try:
+        replay_store().set(reservation.key, json.dumps(payload), _ttl())
+    except Exception as exc:
+        raise ReplayStoreUnavailable from exc
+
+
+def mark_queued(reservation: ReplayReservation, body_digest: str) -> None:
+    _store_state(reservation, {
+        'state': 'queued',
+        'body_digest': body_digest,
+    })
 
 
 def mark_success(reservation: ReplayReservation, body_digest: str, response_pk: int) -> None:
-    cache = _cache()
-    payload = json.dumps({
+    _store_state(reservation, {
         'state': 'success',
         'body_digest': body_digest,
         'pk': response_pk,
     })
+
+
+def mark_batch_success(reservation: ReplayReservation, body_digest: str, response_pks: List[int]) -> None:
+    _store_state(reservation, {
+        'state': 'success',
+        'body_digest': body_digest,
+        'pks': [int(pk) for pk in response_pks],
+    })
+
+
+def clear_reservation(key: str) -> None:
+    """Forget a nonce, so an identical retry is reserved (and stored) again."""
     try:
-        cache.set(reservation.key, payload, timeout=_ttl())
+        replay_store().delete(key)
+    except ReplayStoreUnavailable:
+        raise
     except Exception as exc:
         raise ReplayStoreUnavailable from exc
 
 
-def get_success(device_id: str, key_id: str, nonce: str, body_digest: str) -> Optional[int]:
-    existing = _load(replay_key(device_id, key_id, nonce))
-    if not existing:
-        return None
-    if existing.get('state') != 'success':
+def lookup_reservation(key: str) -> Optional[ReplayReservation]:
+    """Stored state under a replay key (`None` if nothing is stored)."""
+    existing = _load(key)
+    if existing is None:
         return None
-    if existing.get('body_digest') != body_digest:
-        raise ReplayConflict('nonce reused with different body')
-    pk = existing.get('pk')
-    return int(pk) if pk is not None else None
+    return ReplayReservation(key=key, created=False, existing=existing)
 
 
 def _load(key: str) -> Optional[dict]:
-    cache = _cache()
     try:
-        raw = cache.get(key)
+        raw = replay_store().get(key)
+    except ReplayStoreUnavailable:
+        raise
     except Exception as exc:
         raise ReplayStoreUnavailable from exc
-    if not raw:
-        return None
-    if isinstance(raw, dict):
-        return raw
-    try:
-        return json.loads(raw)
-    except Exception:
-        return None
+    return _decode(raw)
 
 
 class ReplayConflict(Exception):
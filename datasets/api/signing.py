@@ -11,6 +11,7 @@ BytesLike = Union[bytes, bytearray, memoryview]
 PROTOCOL = 'WEATHER-HMAC-V1'
 DEFAULT_METHOD = 'POST'
 DEFAULT_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
 
 
 def body_sha256_hex(body: BytesLike) -> str:
@@ -1,19 +1,26 @@
+from django.conf import settings
 from django.urls import path
 
+from . import async_views, views
 from .views import (
+    CreateDatasetBatchView,
     CreateDatasetView,
-    additional_plots,
     dataset_detail_not_allowed,
-    download_csv,
-    get_last_dataset,
+    live_stream,
 )
 
 app_name = 'datasets-api'
 
+#   Async read endpoints for ASGI (uvicorn) workers
+read_views = async_views if getattr(settings, 'ASYNC_READ_API', False) else views
+
 urlpatterns = [
-    path('last_dataset/', get_last_dataset, name='last_dataset'),
-    path('additional-plots/', additional_plots, name='additional-plots'),
-    path('download-csv/', download_csv, name='download-csv'),
+    path('last_dataset/', read_views.get_last_dataset, name='last_dataset'),
+    path('additional-plots/', read_views.additional_plots, name='additional-plots'),
+    path('plot-data/', read_views.plot_data_view, name='plot-data'),
+    path('live/', live_stream, name='live-stream'),
+    path('download-csv/', read_views.download_csv, name='download-csv'),
     path('datasets/', CreateDatasetView.as_view(), name='dataset-create'),
+    path('datasets/batch/', CreateDatasetBatchView.as_view(), name='dataset-batch-create'),
     path('datasets/<int:pk>/', dataset_detail_not_allowed, name='dataset-detail'),
 ]
@@ -1,12 +1,15 @@
 from email.utils import parsedate_to_datetime
 
 import csv
+import json
 import logging
+import math
 from datetime import date, datetime, time, timedelta, timezone as dt_timezone
 
 import pytz
 from astropy.time import Time
 from django.conf import settings
+from django.db import transaction
 from django.http import HttpResponseNotModified, StreamingHttpResponse
 from django.utils import timezone
 from django.utils.http import http_date
@@ -16,22 +19,40 @@ from rest_framework.decorators import (
     api_view,
     authentication_classes,
     permission_classes,
+    renderer_classes,
     throttle_classes,
 )
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from datasets.conditions import current_conditions
 from datasets.csv_safe import sanitize_csv_cell
 from datasets.forms import DateRangeForm, plot_form_from_query
+from datasets.ingest import after_ingest, enqueue_readings, ingest_queue_enabled
+from datasets.live import bin_stream, live_stream_enabled
 from datasets.models import Dataset
-from datasets.plots import additional_plots_components
+from datasets.plot_cache import plot_cache_enabled
+from datasets.plots import (
+    PLOT_DATA_FIGURES,
+    additional_plots_components,
+    plot_data,
+    plot_data_delta,
+)
 
-from .authentication import DeviceHMACAuthentication, LegacyUploadBasicAuthentication
+from .authentication import (
+    DeviceHMACAuthentication,
+    DeviceHMACBatchAuthentication,
+    LegacyUploadBasicAuthentication,
+)
 from .permissions import IsActiveUploadDevice
+from .renderers import EventStreamRenderer
 from .replay import (
     ReplayConflict,
     ReplayStoreUnavailable,
-    get_success,
+    mark_batch_success,
+    mark_queued,
     mark_success,
     reserve_nonce,
 )
@@ -47,7 +68,9 @@ PLOT_QUERY_KEYS = frozenset({
     'time_resolution',
     'start_date',
     'end_date',
+    'downsample',
     'fresh',
+    'since_jd',
 })
 
 
@@ -63,6 +86,37 @@ def _plot_query_params(request):
     return query
 
 
+def _since_jd(query):
+    """Delta cursor ``since_jd`` of a plot query (`None` if absent).
+
+    Raises ``ValueError`` for values that are not a finite number.
+    """
+    value = str(query.get('since_jd', '')).strip()
+    if not value:
+        return None
+    since_jd = float(value)
+    if not math.isfinite(since_jd):
+        raise ValueError('since_jd must be finite')
+    return since_jd
+
+
+def _plot_data_delta_payload(plot_set, since_jd, fresh, cleaned):
+    payload = plot_data_delta(
+        plot_set,
+        since_jd,
+        chunk_cache=plot_cache_enabled(
+            time_resolution=cleaned['time_resolution'],
+            fresh=fresh,
+        ),
+        **cleaned,
+    )
+    return {**payload, 'set': plot_set, 'delta': True}
+
+
+def _plot_data_delta_response(plot_set, since_jd, fresh, cleaned):
+    return Response(_plot_data_delta_payload(plot_set, since_jd, fresh, cleaned))
+
+
 def _staff_fresh_requested(request) -> bool:
     bypass_key = getattr(settings, 'PLOT_CACHE_BYPASS_QUERY', 'fresh')
     if request.GET.get(bypass_key) != '1':
@@ -71,6 +125,35 @@ def _staff_fresh_requested(request) -> bool:
     return bool(user is not None and user.is_authenticated and user.is_staff)
 
 
+def _after_ingest(instance):
+    """Fold a new row into rollups, plot caches, current conditions and live streams; never fail the upload over it."""
+    after_ingest(instance.jd)
+
+
+def _queue_upload(rows, device, reservation, body_digest, batch=False):
+    """Hand validated readings to the ingest queue; `None` to write them synchronously instead."""
+    try:
+        mark_queued(reservation, body_digest)
+        entry_id = enqueue_readings(
+            rows,
+            device,
+            replay_key=reservation.key,
+            body_digest=body_digest,
+            batch=batch,
+        )
+    except Exception:
+        logger.exception('ingest_enqueue_failed device=%s rows=%s', getattr(device, 'device_id', None), len(rows))
+        return None
+    return Response(
+        {'queued': True, 'count': len(rows), 'entry': entry_id},
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+def _queued_retry_response():
+    return Response({'queued': True}, status=status.HTTP_202_ACCEPTED)
+
+
 class CreateDatasetView(generics.CreateAPIView):
     """Device HMAC (and optional legacy Basic) POST-only ingestion endpoint."""
 
@@ -102,31 +185,6 @@ class CreateDatasetView(generics.CreateAPIView):
             )
 
         if hmac_meta is not None:
-            try:
-                existing_pk = get_success(
-                    hmac_meta['device_id'],
-                    hmac_meta['key_id'],
-                    hmac_meta['nonce'],
-                    hmac_meta['body_digest'],
-                )
-            except ReplayConflict:
-                return Response(
-                    {'detail': 'Invalid upload credentials'},
-                    status=status.HTTP_401_UNAUTHORIZED,
-                )
-            except ReplayStoreUnavailable:
-                return Response(
-                    {'detail': 'Upload service temporarily unavailable'},
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
-                )
-            if existing_pk is not None:
-                instance = Dataset.objects.filter(pk=existing_pk).first()
-                if instance is not None:
-                    return Response(
-                        DatasetSerializer(instance).data,
-                        status=status.HTTP_200_OK,
-                    )
-
             try:
                 reservation = reserve_nonce(
                     hmac_meta['device_id'],
@@ -146,16 +204,9 @@ class CreateDatasetView(generics.CreateAPIView):
                 )
 
             if not reservation.created:
-                # Concurrent retry while pending — treat as conflict until success stored.
-                try:
-                    existing_pk = get_success(
-                        hmac_meta['device_id'],
-                        hmac_meta['key_id'],
-                        hmac_meta['nonce'],
-                        hmac_meta['body_digest'],
-                    )
-                except (ReplayConflict, ReplayStoreUnavailable):
-                    existing_pk = None
+                # Identical retry: answer with the stored row. While the first
+                # request is still pending, treat it as a conflict.
+                existing_pk = reservation.stored_pk()
                 if existing_pk is not None:
                     instance = Dataset.objects.filter(pk=existing_pk).first()
                     if instance is not None:
@@ -163,6 +214,8 @@ class CreateDatasetView(generics.CreateAPIView):
                             DatasetSerializer(instance).data,
                             status=status.HTTP_200_OK,
                         )
+                if reservation.is_queued():
+                    return _queued_retry_response()
                 return Response(
                     {'detail': 'Upload already in progress'},
                     status=status.HTTP_409_CONFLICT,
@@ -170,7 +223,17 @@ class CreateDatasetView(generics.CreateAPIView):
 
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
+            if ingest_queue_enabled():
+                queued = _queue_upload(
+                    [serializer.validated_data],
+                    device,
+                    reservation,
+                    hmac_meta['body_digest'],
+                )
+                if queued is not None:
+                    return queued
             instance = serializer.save(upload_device=device)
+            _after_ingest(instance)
             try:
                 mark_success(reservation, hmac_meta['body_digest'], instance.pk)
             except ReplayStoreUnavailable:
@@ -201,6 +264,143 @@ class CreateDatasetView(generics.CreateAPIView):
             )
         return super().create(request, *args, **kwargs)
 
+    def perform_create(self, serializer):
+        instance = serializer.save()
+        _after_ingest(instance)
+
+
+def _parse_ndjson_rows(body, max_rows):
+    """
+    Readings of an NDJSON batch body
+
+    Raises ``ValueError`` for bodies that are not one JSON object per
+    line, empty batches and batches with more than ``max_rows`` readings.
+    """
+    try:
+        text = bytes(body).decode('utf-8')
+    except UnicodeDecodeError:
+        raise ValueError('body must be UTF-8')
+    rows = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        if len(rows) >= max_rows:
+            raise ValueError(f'at most {max_rows} readings per batch')
+        try:
+            row = json.loads(line)
+        except ValueError:
+            raise ValueError(f'line {number} is not valid JSON')
+        if not isinstance(row, dict):
+            raise ValueError(f'line {number} is not a JSON object')
+        rows.append(row)
+    if not rows:
+        raise ValueError('batch contains no readings')
+    return rows
+
+
+class CreateDatasetBatchView(APIView):
+    """
+    HMAC-signed batch ingestion: one NDJSON reading per line
+
+    Devices replay buffered readings after an outage with one signed
+    request per batch instead of one per reading. The batch is validated
+    as a whole (``DatasetSerializer(many=True)``) and inserted in one
+    transaction, so it is stored completely or not at all. A retry with
+    the same nonce and body returns the stored primary keys.
+    """
+
+    authentication_classes = [DeviceHMACBatchAuthentication]
+    permission_classes = [IsAuthenticated, IsActiveUploadDevice]
+    throttle_classes = [UploadRateThrottle]
+
+    def post(self, request, *args, **kwargs):
+        hmac_meta = getattr(request, 'upload_hmac', None)
+        device = getattr(request, 'upload_device', None)
+        if hmac_meta is None or device is None:
+            return Response(
+                {'detail': 'Invalid upload credentials'},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        replay_args = (
+            hmac_meta['device_id'],
+            hmac_meta['key_id'],
+            hmac_meta['nonce'],
+            hmac_meta['body_digest'],
+        )
+
+        try:
+            reservation = reserve_nonce(*replay_args)
+        except ReplayConflict:
+            return Response(
+                {'detail': 'Invalid upload credentials'},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        except ReplayStoreUnavailable:
+            return Response(
+                {'detail': 'Upload service temporarily unavailable'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        if not reservation.created:
+            existing_pks = reservation.stored_pks()
+            if existing_pks is not None:
+                return Response(
+                    {'count': len(existing_pks), 'pks': existing_pks},
+                    status=status.HTTP_200_OK,
+                )
+            if reservation.is_queued():
+                return _queued_retry_response()
+            # Concurrent retry while pending — treat as conflict until success stored.
+            return Response(
+                {'detail': 'Upload already in progress'},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        max_rows = int(getattr(settings, 'UPLOAD_BATCH_MAX_ROWS', 500))
+        try:
+            rows = _parse_ndjson_rows(request.body, max_rows)
+        except ValueError as exc:
+            return Response(
+                {'detail': str(exc), 'code': 'invalid_batch'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        serializer = DatasetSerializer(data=rows, many=True)
+        serializer.is_valid(raise_exception=True)
+        if ingest_queue_enabled():
+            queued = _queue_upload(
+                serializer.validated_data,
+                device,
+                reservation,
+                hmac_meta['body_digest'],
+                batch=True,
+            )
+            if queued is not None:
+                return queued
+
+        objs = [
+            Dataset(upload_device=device, **row)
+            for row in serializer.validated_data
+        ]
+        with transaction.atomic():
+            created = Dataset.objects.bulk_create(objs)
+        pks = [obj.pk for obj in created]
+        jds = [obj.jd for obj in created]
+        after_ingest(min(jds), max(jds))
+        try:
+            mark_batch_success(reservation, hmac_meta['body_digest'], pks)
+        except ReplayStoreUnavailable:
+            logger.error(
+                'replay_mark_failed device=%s key_id=%s rows=%s',
+                hmac_meta['device_id'],
+                hmac_meta['key_id'],
+                len(pks),
+            )
+        logger.info('batch_upload device=%s rows=%s', hmac_meta['device_id'], len(pks))
+        return Response(
+            {'count': len(pks), 'pks': pks},
+            status=status.HTTP_201_CREATED,
+        )
+
 
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @authentication_classes([])
@@ -217,14 +417,26 @@ def dataset_detail_not_allowed(request, pk=None):
 @permission_classes([AllowAny])
 @throttle_classes([PlotRateThrottle])
 def additional_plots(request):
-    form = plot_form_from_query(_plot_query_params(request))
-    if not form.is_valid():
+    """Rendered additional plots; with ``since_jd`` only their new bins.
+
+    A ``since_jd`` request answers like ``plot-data`` for the additional
+    set, with the bins from the one containing ``since_jd`` on.
+    """
+    query = _plot_query_params(request)
+    form = plot_form_from_query(query)
+    try:
+        since_jd = _since_jd(query)
+    except ValueError:
+        form = None
+    if form is None or not form.is_valid():
         return Response(
             {'code': 'invalid_plot_params', 'detail': 'Invalid plot parameters'},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
     fresh = _staff_fresh_requested(request)
+    if since_jd is not None and not form.cleaned_data.get('downsample'):
+        return _plot_data_delta_response('additional', since_jd, fresh, form.cleaned_data)
     script, figures, plot_meta = additional_plots_components(
         fresh=fresh,
         **form.cleaned_data,
@@ -233,6 +445,7 @@ def additional_plots(request):
         'script': script,
         'figures': figures,
         'cache_hit': plot_meta.get('cache_hit', False),
+        'cache_state': plot_meta.get('cache_state'),
     }
     if figures.get('note'):
         payload['note'] = figures['note']
@@ -242,18 +455,89 @@ def additional_plots(request):
 @api_view(['GET'])
 @authentication_classes([])
 @permission_classes([AllowAny])
-def get_last_dataset(request):
-    dataset = (
-        Dataset.objects
-        .order_by('-added_on', '-jd', '-pk')
-        .first()
+@throttle_classes([PlotRateThrottle])
+def plot_data_view(request):
+    """Binned plot columns as base64 little-endian float64 buffers.
+
+    ``set`` selects the main (default) or additional plots. The dashboard
+    feeds the buffers into the ColumnDataSources of the rendered figures.
+    With ``since_jd`` (the ``cursor_jd`` of the previous response) only the
+    bins from the one containing it on are returned (``delta``), so polling
+    clients transfer the new bins instead of the whole range.
+    """
+    plot_set = request.GET.get('set', 'main')
+    query = _plot_query_params(request)
+    form = plot_form_from_query(query)
+    try:
+        since_jd = _since_jd(query)
+    except ValueError:
+        form = None
+    if plot_set not in PLOT_DATA_FIGURES or form is None or not form.is_valid():
+        return Response(
+            {'code': 'invalid_plot_params', 'detail': 'Invalid plot parameters'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    fresh = _staff_fresh_requested(request)
+    # Min/max and LTTB points are not bins: always the full range
+    if since_jd is not None and not form.cleaned_data.get('downsample'):
+        return _plot_data_delta_response(plot_set, since_jd, fresh, form.cleaned_data)
+    payload, plot_meta = plot_data(plot_set, fresh=fresh, **form.cleaned_data)
+    return Response({
+        **payload,
+        'set': plot_set,
+        'cache_hit': plot_meta.get('cache_hit', False),
+        'cache_state': plot_meta.get('cache_state'),
+    })
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+@throttle_classes([PlotRateThrottle])
+def live_stream(request):
+    """Server-Sent Events with the plot bins that close after page load.
+
+    Takes the dashboard plot query; ``Last-Event-ID`` (the last bin the
+    client has) resumes a reconnecting ``EventSource``.
+    """
+    if not live_stream_enabled():
+        return Response(
+            {'code': 'live_stream_disabled', 'detail': 'Live updates are disabled'},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+    form = plot_form_from_query(_plot_query_params(request))
+    if not form.is_valid():
+        return Response(
+            {'code': 'invalid_plot_params', 'detail': 'Invalid plot parameters'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    response = StreamingHttpResponse(
+        bin_stream(
+            form.cleaned_data['time_resolution'],
+            last_event_id=request.headers.get('Last-Event-ID'),
+        ),
+        content_type='text/event-stream',
     )
-    if dataset is None:
+    response['Cache-Control'] = 'no-cache'
+    # Do not let a reverse proxy buffer the events
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def get_last_dataset(request):
+    conditions = current_conditions()
+    if conditions is None:
         return Response(
             {'detail': 'No datasets available.'},
             status=status.HTTP_404_NOT_FOUND,
         )
-    return Response(DatasetSerializer(dataset).data)
+    return Response(conditions['reading'])
 
 
 def datetime_to_jd(dt):
@@ -279,6 +563,142 @@ def _download_error_response(exc):
     )
 
 
+CSV_FIELD_NAMES = [
+    'pk', 'jd', 'temperature', 'sky_temp', 'box_temp',
+    'pressure', 'humidity', 'illuminance', 'wind_speed',
+    'rain', 'is_raining', 'pm1_0', 'pm2_5', 'pm10', 'uv_index',
+    'note', 'merged', 'added_on', 'last_modified',
+]
+
+
+def _download_jd_range(query):
+    """``(start_jd, end_jd, errors)`` of a download query; ``errors`` of an invalid date range."""
+    if query.get('last_24h'):
+        end_date = timezone.now()
+        start_date = end_date - timedelta(hours=24)
+    elif 'start_date' in query and 'end_date' in query:
+        date_form = DateRangeForm(query)
+        if not date_form.is_valid():
+            return None, None, date_form.errors
+        start_date = date_form.cleaned_data['start_date']
+        end_date = datetime.combine(date_form.cleaned_data['end_date'], time.max)
+        end_date = timezone.make_aware(end_date)
+    else:
+        end_date = timezone.now()
+        start_date = end_date - timedelta(days=1)
+    return datetime_to_jd(start_date), datetime_to_jd(end_date), None
+
+
+def _download_etag(start_jd, end_jd, last_modified):
+    if last_modified is None:
+        return None
+    try:
+        return (
+            f'W/"{int(start_jd * 1e6)}-{int(end_jd * 1e6)}'
+            f'-{int(last_modified.timestamp())}"'
+        )
+    except Exception:
+        return None
+
+
+def _not_modified_response(request, etag, last_modified):
+    """304 response if the client's validators still match, else `None`."""
+    inm = request.META.get('HTTP_IF_NONE_MATCH')
+    ims = request.META.get('HTTP_IF_MODIFIED_SINCE')
+    if etag and inm and inm == etag:
+        not_mod = HttpResponseNotModified()
+        not_mod['ETag'] = etag
+        if last_modified:
+            not_mod['Last-Modified'] = http_date(last_modified.timestamp())
+        return not_mod
+    if last_modified and ims:
+        try:
+            ims_dt = parsedate_to_datetime(ims)
+            if ims_dt.tzinfo is None:
+                ims_dt = ims_dt.replace(tzinfo=dt_timezone.utc)
+            if last_modified <= ims_dt:
+                not_mod = HttpResponseNotModified()
+                if etag:
+                    not_mod['ETag'] = etag
+                not_mod['Last-Modified'] = http_date(last_modified.timestamp())
+                return not_mod
+        except Exception:
+            pass
+    return None
+
+
+def _wants_csv(request):
+    return (
+        request.GET.get('dl') == 'csv'
+        or 'text/csv' in request.META.get('HTTP_ACCEPT', '')
+    )
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_writer():
+    """``csv.writer`` whose ``writerow`` returns the formatted line."""
+    return csv.writer(_Echo())
+
+
+def csv_row(row):
+    """Normalize one ``values_list`` row for the CSV export."""
+    normalized = []
+    for value in row:
+        if value is None:
+            normalized.append('')
+            continue
+        if isinstance(value, float):
+            if value != value or value in (float('inf'), float('-inf')):
+                normalized.append('')
+            else:
+                normalized.append(value)
+        elif isinstance(value, str):
+            normalized.append(sanitize_csv_cell(value))
+        else:
+            # Datetimes and ints: stringify then sanitize if needed
+            if hasattr(value, 'isoformat'):
+                normalized.append(value.isoformat())
+            else:
+                normalized.append(sanitize_csv_cell(value))
+    return normalized
+
+
+def _csv_headers(response, request, etag, last_modified):
+    if request.GET.get('last_24h'):
+        filename = 'weather_last24h.csv'
+    elif 'start_date' in request.GET and 'end_date' in request.GET:
+        filename = (
+            f"weather_{request.GET.get('start_date')}_"
+            f"{request.GET.get('end_date')}.csv"
+        )
+    else:
+        filename = 'weather_data.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    _cache_headers(response, etag, last_modified)
+
+
+def _cache_headers(response, etag, last_modified):
+    response['Cache-Control'] = 'public, max-age=60'
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+
+
+def _json_download_limit_error():
+    return {
+        'status': 'error',
+        'message': (
+            f'JSON export limited to {MAX_JSON_DOWNLOAD_ROWS} rows. '
+            'Use dl=csv for full export.'
+        ),
+    }
+
+
 @api_view(['GET'])
 @authentication_classes([])
 @permission_classes([AllowAny])
@@ -290,127 +710,33 @@ def download_csv(request):
     Returns streamed CSV (preferred) or a limited JSON payload.
     """
     try:
-        if request.GET.get('last_24h'):
-            end_date = timezone.now()
-            start_date = end_date - timedelta(hours=24)
-            start_jd = datetime_to_jd(start_date)
-            end_jd = datetime_to_jd(end_date)
-        elif 'start_date' in request.GET and 'end_date' in request.GET:
-            date_form = DateRangeForm(request.GET)
-            if date_form.is_valid():
-                start_date = date_form.cleaned_data['start_date']
-                end_date = date_form.cleaned_data['end_date']
-                end_date = datetime.combine(end_date, time.max)
-                end_date = timezone.make_aware(end_date)
-                start_jd = datetime_to_jd(start_date)
-                end_jd = datetime_to_jd(end_date)
-            else:
-                return Response({
-                    'status': 'error',
-                    'errors': date_form.errors,
-                }, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            end_date = timezone.now()
-            start_date = end_date - timedelta(days=1)
-            start_jd = datetime_to_jd(start_date)
-            end_jd = datetime_to_jd(end_date)
+        start_jd, end_jd, errors = _download_jd_range(request.GET)
+        if errors is not None:
+            return Response({
+                'status': 'error',
+                'errors': errors,
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         start_time = datetime.now()
         qs = Dataset.objects.filter(jd__range=[start_jd, end_jd]).order_by('jd')
 
         latest = qs.order_by('-added_on').values('added_on').first()
         last_modified = latest['added_on'] if latest and latest['added_on'] else None
+        etag = _download_etag(start_jd, end_jd, last_modified)
+        not_modified = _not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
 
-        etag = None
-        if last_modified is not None:
-            try:
-                etag = (
-                    f'W/"{int(start_jd * 1e6)}-{int(end_jd * 1e6)}'
-                    f'-{int(last_modified.timestamp())}"'
-                )
-            except Exception:
-                etag = None
-
-        inm = request.META.get('HTTP_IF_NONE_MATCH')
-        ims = request.META.get('HTTP_IF_MODIFIED_SINCE')
-        if etag and inm and inm == etag:
-            not_mod = HttpResponseNotModified()
-            not_mod['ETag'] = etag
-            if last_modified:
-                not_mod['Last-Modified'] = http_date(last_modified.timestamp())
-            return not_mod
-        if last_modified and ims:
-            try:
-                ims_dt = parsedate_to_datetime(ims)
-                if ims_dt.tzinfo is None:
-                    ims_dt = ims_dt.replace(tzinfo=dt_timezone.utc)
-                if last_modified <= ims_dt:
-                    not_mod = HttpResponseNotModified()
-                    if etag:
-                        not_mod['ETag'] = etag
-                    not_mod['Last-Modified'] = http_date(last_modified.timestamp())
-                    return not_mod
-            except Exception:
-                pass
-
-        wants_csv = (
-            request.GET.get('dl') == 'csv'
-            or 'text/csv' in request.META.get('HTTP_ACCEPT', '')
-        )
-        if wants_csv:
-            field_names = [
-                'pk', 'jd', 'temperature', 'sky_temp', 'box_temp',
-                'pressure', 'humidity', 'illuminance', 'wind_speed',
-                'rain', 'is_raining', 'pm1_0', 'pm2_5', 'pm10', 'uv_index',
-                'note', 'merged', 'added_on', 'last_modified',
-            ]
-
-            class Echo:
-                def write(self, value):
-                    return value
-
-            echo = Echo()
-            writer = csv.writer(echo)
+        if _wants_csv(request):
+            writer = csv_writer()
 
             def row_iter():
-                yield writer.writerow(field_names)
-                for row in qs.values_list(*field_names).iterator(chunk_size=2000):
-                    normalized = []
-                    for value in row:
-                        if value is None:
-                            normalized.append('')
-                            continue
-                        if isinstance(value, float):
-                            if value != value or value in (float('inf'), float('-inf')):
-                                normalized.append('')
-                            else:
-                                normalized.append(value)
-                        elif isinstance(value, str):
-                            normalized.append(sanitize_csv_cell(value))
-                        else:
-                            # Datetimes and ints: stringify then sanitize if needed
-                            if hasattr(value, 'isoformat'):
-                                normalized.append(value.isoformat())
-                            else:
-                                normalized.append(sanitize_csv_cell(value))
-                    yield writer.writerow(normalized)
+                yield writer.writerow(CSV_FIELD_NAMES)
+                for row in qs.values_list(*CSV_FIELD_NAMES).iterator(chunk_size=2000):
+                    yield writer.writerow(csv_row(row))
 
             response = StreamingHttpResponse(row_iter(), content_type='text/csv')
-            if request.GET.get('last_24h'):
-                filename = 'weather_last24h.csv'
-            elif 'start_date' in request.GET and 'end_date' in request.GET:
-                filename = (
-                    f"weather_{request.GET.get('start_date')}_"
-                    f"{request.GET.get('end_date')}.csv"
-                )
-            else:
-                filename = 'weather_data.csv'
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            response['Cache-Control'] = 'public, max-age=60'
-            if etag:
-                response['ETag'] = etag
-            if last_modified:
-                response['Last-Modified'] = http_date(last_modified.timestamp())
+            _csv_headers(response, request, etag, last_modified)
             duration_ms = (datetime.now() - start_time).total_seconds() * 1000
             logger.info(
                 'download_csv csv range=[%s,%s] duration_ms=%.1f',
@@ -420,21 +746,11 @@ def download_csv(request):
 
         row_count = qs.count()
         if row_count > MAX_JSON_DOWNLOAD_ROWS:
-            return Response({
-                'status': 'error',
-                'message': (
-                    f'JSON export limited to {MAX_JSON_DOWNLOAD_ROWS} rows. '
-                    'Use dl=csv for full export.'
-                ),
-            }, status=status.HTTP_400_BAD_REQUEST)
+            return Response(_json_download_limit_error(), status=status.HTTP_400_BAD_REQUEST)
 
         serializer = DatasetSerializer(qs, many=True)
         resp = Response({'status': 'success', 'data': serializer.data})
-        resp['Cache-Control'] = 'public, max-age=60'
-        if etag:
-            resp['ETag'] = etag
-        if last_modified:
-            resp['Last-Modified'] = http_date(last_modified.timestamp())
+        _cache_headers(resp, etag, last_modified)
         duration_ms = (datetime.now() - start_time).total_seconds() * 1000
         logger.info(
             'download_csv json range=[%s,%s] rows=%s duration_ms=%.1f',
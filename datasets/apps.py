@@ -7,3 +7,5 @@ class DatasetsConfig(AppConfig):
 
     def ready(self):
         from weather_station import checks  # noqa: F401
+
+        from . import signals  # noqa: F401
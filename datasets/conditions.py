@@ -0,0 +1,286 @@
+"""
+Current-conditions snapshot for the dashboard header and ``last_dataset``.
+
+Every successful upload rebuilds the snapshot: the latest reading (as the
+API serializes it), the 2-minute wind average, the 30-minute rain sum, the
+dew point and the weather icon. It is stored under one cache key, so
+readers do a single cache get instead of the latest-row query and the
+aggregates. On a cache miss (cold cache, eviction, other write paths
+deleting it) the snapshot is rebuilt from the database.
+"""
+
+import logging
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Q, Sum
+
+from .api.serializers import DatasetSerializer
+from .ephemeris import is_daytime, moon_phase_angle, today_ephemeris
+from .models import Dataset
+
+logger = logging.getLogger('weather.conditions')
+
+WIND_ROTATIONS_TO_MPS = 0.14
+JD_TWO_MINUTES = 0.001388889
+JD_THIRTY_MINUTES = 30.0 / (24.0 * 60.0)
+
+CACHE_KEY = 'current_conditions:v1'
+
+#   Default icon without data or on errors
+DEFAULT_ICON = ('wi-day-sunny', 'Clear')
+
+
+def dew_point(temp_c, humidity):
+    """Dew point in °C (Magnus formula)."""
+    a, b = 17.62, 243.12
+    humidity = max(0.1, min(100.0, humidity))
+    gamma = (a * temp_c) / (b + temp_c) + np.log(humidity / 100.0)
+    return float((b * gamma) / (a - gamma))
+
+
+def map_moon_icon(angle_deg):
+    # 0=new, 90=first quarter, 180=full, 270=last quarter
+    if angle_deg < 22.5 or angle_deg >= 337.5:
+        return 'wi-moon-new'
+    if angle_deg < 67.5:
+        return 'wi-moon-waxing-crescent-3'
+    if angle_deg < 112.5:
+        return 'wi-moon-first-quarter'
+    if angle_deg < 157.5:
+        return 'wi-moon-waxing-gibbous-3'
+    if angle_deg < 202.5:
+        return 'wi-moon-full'
+    if angle_deg < 247.5:
+        return 'wi-moon-waning-gibbous-3'
+    if angle_deg < 292.5:
+        return 'wi-moon-third-quarter'
+    return 'wi-moon-waning-crescent-3'
+
+
+def select_icon(reading, rain_sum_30min, wind_mps, is_day, moon_phase=None):
+    """
+    Weather icon class and title for a reading
+
+    Parameters
+    ----------
+    reading             : `dict`
+        Latest reading (``temperature``, ``humidity``, ``sky_temp``,
+        ``is_raining``).
+
+    rain_sum_30min      : `float`
+        Rain of the last 30 minutes (raw collector depth).
+
+    wind_mps            : `float`
+        2-minute average wind speed in m/s.
+
+    is_day              : `bool`
+
+    moon_phase          : `float` or `None`, optional
+        Moon-sun separation in degrees; clear nights show the moon phase.
+
+    Returns
+    -------
+    icon                : `tuple` (`string`, `string`)
+    """
+    try:
+        temp_c = float(reading.get('temperature') or 0.0)
+        sky_c = reading.get('sky_temp')
+        if sky_c is not None:
+            try:
+                sky_c = float(sky_c)
+            except Exception:
+                sky_c = None
+        # Cloud proxy: ambient - sky (higher means clearer sky)
+        delta_t = None
+        if sky_c is not None:
+            delta_t = temp_c - sky_c
+
+        dp_c = dew_point(temp_c, float(reading.get('humidity') or 0.0))
+        is_raining_flag = int(reading.get('is_raining') or 0) == 1
+
+        # Precipitation type by temperature
+        def precip_icon_base():
+            if temp_c <= 0.5:
+                return 'snow'
+            if temp_c < 2.5:
+                return 'sleet'
+            return 'rain'
+
+        # Intensity
+        heavy_precip = rain_sum_30min >= 10.0  # heuristic on raw counts
+        windy = wind_mps >= 8.0
+
+        # Start with precipitation if detected
+        if is_raining_flag or rain_sum_30min > 0.0:
+            base = precip_icon_base()
+            if base == 'snow':
+                if windy:
+                    return ('wi-snow-wind', 'Snow with wind')
+                return ('wi-night-snow' if not is_day else 'wi-day-snow', 'Snow')
+            if base == 'sleet':
+                return (
+                    'wi-night-sleet' if not is_day else 'wi-day-sleet',
+                    'Sleet / freezing rain'
+                )
+            # rain
+            if windy:
+                return (
+                    'wi-night-alt-rain-wind' if not is_day else 'wi-day-rain-wind',
+                    'Rain with wind'
+                )
+            if heavy_precip:
+                return (
+                    'wi-night-storm-showers' if not is_day else 'wi-day-storm-showers',
+                    'Heavy rain'
+                )
+            return (
+                'wi-night-sprinkle' if not is_day else 'wi-day-sprinkle',
+                'Light rain / drizzle'
+            )
+
+        # Fog/Mist: temperature close to dew point and no recent rain
+        if (temp_c - dp_c) <= 1.5 and rain_sum_30min == 0.0:
+            return (
+                'wi-day-fog' if is_day else 'wi-night-fog',
+                'Fog'
+            )
+
+        # No precipitation: decide clouds via delta_t
+        if delta_t is None:
+            # Fallback to simple day/night clear
+            return (
+                'wi-night-clear' if not is_day else 'wi-day-sunny',
+                'Clear'
+            )
+
+        # Heuristic thresholds for cloud cover proxy
+        if delta_t >= 15.0:
+            if is_day:
+                return ('wi-day-sunny', 'Clear')
+            # Night: choose moon phase icon for clear sky
+            if moon_phase is None:
+                return ('wi-night-clear', 'Clear')
+            return (map_moon_icon(moon_phase), 'Clear')
+        if delta_t >= 12.0:
+            return (
+                'wi-night-alt-partly-cloudy' if not is_day else 'wi-day-sunny-overcast',
+                'Mostly clear'
+            )
+        if delta_t >= 6.0:
+            return (
+                'wi-night-alt-partly-cloudy' if not is_day else 'wi-day-cloudy',
+                'Partly cloudy'
+            )
+        if delta_t >= 3.0:
+            return ('wi-night-cloudy' if not is_day else 'wi-day-cloudy', 'Cloudy')
+        return ('wi-cloudy', 'Overcast')
+    except Exception:
+        return DEFAULT_ICON
+
+
+def _sky_state(now_ts):
+    """``(is_day, moon_phase)`` at UTC epoch ``now_ts`` (cached ephemeris)."""
+    try:
+        sun_moon, _ = today_ephemeris()
+        return is_daytime(sun_moon, now_ts), moon_phase_angle(sun_moon, now_ts)
+    except Exception:
+        logger.exception('ephemeris_lookup_failed')
+        return True, None
+
+
+def _with_icon(snapshot, is_day, moon_phase):
+    icon_class, icon_title = select_icon(
+        snapshot['reading'],
+        snapshot['rain_sum_30min'],
+        snapshot['wind_mps'],
+        is_day,
+        moon_phase,
+    )
+    return {
+        **snapshot,
+        'is_day': is_day,
+        'icon_class': icon_class,
+        'icon_title': icon_title,
+    }
+
+
+def build_snapshot():
+    """
+    Current conditions from the database
+
+    Returns
+    -------
+    snapshot            : `dict` or `None`
+        ``reading`` (``DatasetSerializer`` data of the latest row),
+        ``wind_mps``, ``rain_sum_30min``, ``dew_point``, ``is_day``,
+        ``icon_class``, ``icon_title`` and ``updated_at`` (epoch seconds);
+        `None` without data.
+    """
+    latest = Dataset.objects.order_by('-added_on', '-jd', '-pk').first()
+    if latest is None:
+        return None
+
+    stats = Dataset.objects.filter(
+        jd__range=[latest.jd - JD_THIRTY_MINUTES, latest.jd]
+    ).aggregate(
+        wind_avg=Avg(
+            'wind_speed',
+            filter=Q(jd__gte=latest.jd - JD_TWO_MINUTES),
+        ),
+        rain_sum=Sum('rain'),
+    )
+    reading = dict(DatasetSerializer(latest).data)
+    now_ts = time.time()
+    snapshot = {
+        'reading': reading,
+        'wind_mps': float(stats['wind_avg'] or 0.0) * WIND_ROTATIONS_TO_MPS,
+        'rain_sum_30min': float(stats['rain_sum'] or 0.0),
+        'dew_point': dew_point(
+            float(latest.temperature or 0.0),
+            float(latest.humidity or 0.0),
+        ),
+        'updated_at': now_ts,
+    }
+    return _with_icon(snapshot, *_sky_state(now_ts))
+
+
+def refresh_snapshot():
+    """Rebuild and store the snapshot; never raises (ingest path)."""
+    try:
+        snapshot = build_snapshot()
+        if snapshot is None:
+            cache.delete(CACHE_KEY)
+        else:
+            cache.set(
+                CACHE_KEY,
+                snapshot,
+                getattr(settings, 'CURRENT_CONDITIONS_TTL_SECONDS', 300),
+            )
+        return snapshot
+    except Exception:
+        logger.exception('conditions_refresh_failed')
+        return None
+
+
+def invalidate_snapshot():
+    """Drop the snapshot after rows changed outside of uploads (merge, admin)."""
+    cache.delete(CACHE_KEY)
+
+
+def current_conditions():
+    """
+    The current-conditions snapshot, rebuilt from the database on a miss
+
+    The stored icon is recomputed (no queries) when day and night changed
+    since the snapshot was taken.
+    """
+    snapshot = cache.get(CACHE_KEY)
+    if snapshot is None:
+        return refresh_snapshot()
+    is_day, moon_phase = _sky_state(time.time())
+    if is_day != snapshot.get('is_day'):
+        snapshot = _with_icon(snapshot, is_day, moon_phase)
+    return snapshot
@@ -0,0 +1,75 @@
+"""Write-side data version tokens per UTC day.
+
+Every code path that changes Dataset rows bumps the token of each UTC day
+it touched (uploads, the merge cron, admin edits). Cached plots and binned
+chunks key on the tokens of the days they cover, so validating a cache
+entry is a handful of cache reads instead of an aggregate over the rows.
+
+Tokens live in the default cache without expiry. A missing token (cold
+cache, eviction) is seeded from the clock, so it never repeats a value an
+older cache entry was keyed on.
+"""
+
+import logging
+import math
+import time
+
+from django.core.cache import cache
+
+from .rollups import ROLLUP_EPOCH_JD
+
+logger = logging.getLogger('weather.plots')
+
+
+def day_index(jd):
+    """UTC day number since the Unix epoch."""
+    return math.floor(float(jd) - ROLLUP_EPOCH_JD)
+
+
+def _version_key(day):
+    return f'data_version:{day}'
+
+
+def _days(start_jd, end_jd):
+    first, last = sorted((day_index(start_jd), day_index(end_jd)))
+    return range(first, last + 1)
+
+
+def _seed(key):
+    cache.add(key, time.time_ns(), timeout=None)
+    return cache.get(key)
+
+
+def data_versions(start_jd, end_jd):
+    """Tokens ``{day: token}`` of every UTC day overlapping the JD range."""
+    keys = {day: _version_key(day) for day in _days(start_jd, end_jd)}
+    found = cache.get_many(list(keys.values()))
+    versions = {}
+    for day, key in keys.items():
+        token = found.get(key)
+        if token is None:
+            token = _seed(key)
+        versions[day] = token
+    return versions
+
+
+def bump_data_version(start_jd, end_jd=None):
+    """Invalidate cached plot data for every UTC day in the JD range."""
+    if end_jd is None:
+        end_jd = start_jd
+    for day in _days(start_jd, end_jd):
+        key = _version_key(day)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Not seeded yet (or evicted): any fresh clock value is new.
+            if not cache.add(key, time.time_ns(), timeout=None):
+                cache.incr(key)
+
+
+def safe_bump_data_version(start_jd, end_jd=None):
+    """:func:`bump_data_version` that logs instead of raising (ingest path)."""
+    try:
+        bump_data_version(start_jd, end_jd)
+    except Exception:
+        logger.exception('data_version_bump_failed start_jd=%s end_jd=%s', start_jd, end_jd)
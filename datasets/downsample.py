@@ -0,0 +1,266 @@
+"""
+Shape-preserving downsampling of raw plot series to a fixed point budget.
+
+The plot range is split into equal-time buckets. A streaming pass over row
+blocks keeps, per bucket and column, the minimum and maximum sample and
+their times (sums and counts for summed or averaged columns). Memory is
+bounded by the bucket count and the work is linear in the number of rows,
+so no range is too long to plot.
+
+``minmax`` emits both extremes of every bucket in time order, so short
+spikes (wind gusts, rain bursts) survive at any range. ``lttb`` runs
+Largest-Triangle-Three-Buckets on those extremes (MinMaxLTTB) and keeps the
+visually most significant point per bucket.
+
+Values are placed on fixed slots of their bucket, so every column shares
+one x axis like time-binned plots. With about one bucket per pixel, a slot
+is within a pixel of the true sample time.
+"""
+
+import numpy as np
+
+MODES = ('minmax', 'lttb')
+
+#   Min/max pre-buckets per LTTB output bucket
+LTTB_PRESELECT = 4
+
+#   Aggregates reported per bucket instead of an envelope
+_TOTALS = ('sum', 'mean')
+
+
+def bucket_count(mode, points):
+    """Accumulator buckets for a point budget (two points per min/max bucket)."""
+    points = max(2, int(points))
+    if mode == 'minmax':
+        return points // 2
+    return points * LTTB_PRESELECT
+
+
+class BucketAccumulator:
+    """
+    Streaming per-bucket extremes and totals over blocks of samples
+
+    Parameters
+    ----------
+    start_jd, end_jd    : `float`
+        Range split into ``n_buckets`` equal buckets; samples outside are
+        clipped into the first or last bucket.
+
+    n_buckets           : `integer`
+
+    columns             : `dict` {`column`: `string`}
+        Aggregate per column as in ``datasets.binning``: ``'sum'`` and
+        ``'mean'`` columns keep totals, all others the min/max envelope.
+    """
+
+    def __init__(self, start_jd, end_jd, n_buckets, columns):
+        self.start_jd = float(start_jd)
+        self.end_jd = float(end_jd)
+        self.n_buckets = max(1, int(n_buckets))
+        self.width = max(self.end_jd - self.start_jd, 1e-9) / self.n_buckets
+        self.columns = dict(columns)
+        n = self.n_buckets
+        self.rows = np.zeros(n, dtype=np.int64)
+        self.state = {}
+        for name, how in self.columns.items():
+            if how in _TOTALS:
+                self.state[name] = {'sum': np.zeros(n), 'count': np.zeros(n)}
+            else:
+                self.state[name] = {
+                    'min_y': np.full(n, np.inf),
+                    'min_x': np.full(n, np.nan),
+                    'max_y': np.full(n, -np.inf),
+                    'max_x': np.full(n, np.nan),
+                }
+
+    def bucket_index(self, x):
+        index = np.floor((np.asarray(x, dtype=float) - self.start_jd) / self.width)
+        return np.clip(index, 0, self.n_buckets - 1).astype(np.int64)
+
+    def add(self, x, values, low=None, high=None, weights=None):
+        """
+        Fold a block of samples ``x`` with ``values`` {`column`: array} in
+
+        Rows that stand for several samples (merged rows) pass their
+        sample ``low``/``high`` for the envelope columns and their sample
+        counts as ``weights`` of the mean columns, all {`column`: array}.
+        """
+        x = np.asarray(x, dtype=float)
+        if x.size == 0:
+            return
+        index = self.bucket_index(x)
+        n = self.n_buckets
+        low, high, weights = low or {}, high or {}, weights or {}
+        self.rows += np.bincount(index, minlength=n)
+        for name, y in values.items():
+            y = np.asarray(y, dtype=float)
+            state = self.state[name]
+            if self.columns[name] in _TOTALS:
+                weight = np.asarray(weights.get(name, np.ones_like(y)), dtype=float)
+                ok = np.isfinite(y) & (weight > 0)
+                state['sum'] += np.bincount(index[ok], weights=y[ok] * weight[ok], minlength=n)
+                state['count'] += np.bincount(index[ok], weights=weight[ok], minlength=n)
+                continue
+            for extreme, better, key_y, key_x, samples in (
+                    (np.minimum, np.less, 'min_y', 'min_x', low.get(name, y)),
+                    (np.maximum, np.greater, 'max_y', 'max_x', high.get(name, y)),
+            ):
+                samples = np.asarray(samples, dtype=float)
+                ok = np.isfinite(samples)
+                i, xv, yv = index[ok], x[ok], samples[ok]
+                block_y = np.full(n, np.inf if extreme is np.minimum else -np.inf)
+                extreme.at(block_y, i, yv)
+                # Earliest sample that reaches the block extreme
+                hit = yv == block_y[i]
+                block_x = np.full(n, np.inf)
+                np.minimum.at(block_x, i[hit], xv[hit])
+                improve = better(block_y, state[key_y])
+                state[key_y][improve] = block_y[improve]
+                state[key_x][improve] = block_x[improve]
+
+    def _total(self, name, groups=1):
+        state = self.state[name]
+        total = state['sum'].reshape(-1, groups).sum(axis=1)
+        count = state['count'].reshape(-1, groups).sum(axis=1)
+        if self.columns[name] == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                total = total / count
+        return np.where(count > 0, total, np.nan)
+
+    def _extremes(self, name):
+        """``(x, y)`` of each bucket's min and max, shape (buckets, 2), in time order."""
+        state = self.state[name]
+        found = np.isfinite(state['min_x'])
+        min_first = ~(state['max_x'] < state['min_x'])
+        x = np.where(
+            min_first[:, None],
+            np.stack([state['min_x'], state['max_x']], axis=1),
+            np.stack([state['max_x'], state['min_x']], axis=1),
+        )
+        y = np.where(
+            min_first[:, None],
+            np.stack([state['min_y'], state['max_y']], axis=1),
+            np.stack([state['max_y'], state['min_y']], axis=1),
+        )
+        y[~found] = np.nan
+        x[~found] = np.nan
+        # A single sample is its own min and max (a merged row has both)
+        same = found & (state['min_x'] == state['max_x']) & (state['min_y'] == state['max_y'])
+        y[same, 1] = np.nan
+        x[same, 1] = np.nan
+        return x, y
+
+    def minmax(self):
+        """
+        Min/max envelope: two slots per bucket, at 1/4 and 3/4 of its width
+
+        Returns
+        -------
+        slot_jd             : `numpy.ndarray`
+
+        series              : `dict` {`column`: `numpy.ndarray`}
+        """
+        starts = self.start_jd + np.arange(self.n_buckets) * self.width
+        slot_jd = (starts[:, None] + self.width * np.array([0.25, 0.75])).ravel()
+        series = {}
+        for name, how in self.columns.items():
+            if how in _TOTALS:
+                values = np.full((self.n_buckets, 2), np.nan)
+                values[:, 0] = self._total(name)
+            else:
+                values = self._extremes(name)[1]
+            series[name] = values.ravel()
+        return self._drop_empty(slot_jd, series)
+
+    def lttb(self, groups=LTTB_PRESELECT):
+        """
+        MinMaxLTTB: one point per group of ``groups`` buckets, at its center
+
+        Each output bucket picks, among the min/max points of its
+        pre-buckets, the one spanning the largest triangle with the point
+        picked before it and the mean of the next non-empty bucket.
+        """
+        n_out = self.n_buckets // groups
+        used = n_out * groups
+        starts = self.start_jd + np.arange(n_out) * groups * self.width
+        slot_jd = starts + groups * self.width / 2.0
+        series = {}
+        envelope = []
+        for name, how in self.columns.items():
+            if how in _TOTALS:
+                series[name] = self._total(name, groups)
+            else:
+                envelope.append(name)
+        if envelope:
+            extremes = [self._extremes(name) for name in envelope]
+            cand_x = np.stack([x[:used].reshape(n_out, 2 * groups) for x, _ in extremes])
+            cand_y = np.stack([y[:used].reshape(n_out, 2 * groups) for _, y in extremes])
+            selected = _lttb_select(cand_x, cand_y)
+            for name, values in zip(envelope, selected):
+                series[name] = values
+        return self._drop_empty(slot_jd, {name: series[name] for name in self.columns})
+
+    @staticmethod
+    def _drop_empty(slot_jd, series):
+        if not series:
+            return slot_jd[:0], series
+        keep = np.zeros(slot_jd.size, dtype=bool)
+        for values in series.values():
+            keep |= np.isfinite(values)
+        return slot_jd[keep], {name: values[keep] for name, values in series.items()}
+
+
+def _lttb_select(cand_x, cand_y):
+    """
+    Largest-Triangle-Three-Buckets over candidate points per bucket
+
+    ``cand_x``/``cand_y`` have shape (columns, buckets, candidates), NaN
+    where a bucket has fewer candidates; all columns are processed together.
+    Returns the selected y per column and bucket (NaN for empty buckets).
+    The first non-empty bucket keeps its earliest point, the last one its
+    latest.
+    """
+    n_columns, n_out, _ = cand_x.shape
+    valid = np.isfinite(cand_y)
+    count = valid.sum(axis=2)
+    has_data = count > 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(valid, cand_x, 0.0).sum(axis=2) / count
+        mean_y = np.where(valid, cand_y, 0.0).sum(axis=2) / count
+
+    # Mean of the next non-empty bucket after each bucket (NaN if none)
+    own = np.where(has_data, np.arange(n_out), n_out)
+    following = np.minimum.accumulate(own[:, ::-1], axis=1)[:, ::-1]
+    next_index = np.concatenate(
+        [following[:, 1:], np.full((n_columns, 1), n_out)], axis=1,
+    )
+    rows = np.arange(n_columns)[:, None]
+    next_x = np.concatenate([mean_x, np.full((n_columns, 1), np.nan)], axis=1)[rows, next_index]
+    next_y = np.concatenate([mean_y, np.full((n_columns, 1), np.nan)], axis=1)[rows, next_index]
+
+    selected = np.full((n_columns, n_out), np.nan)
+    anchor_x = np.full(n_columns, np.nan)
+    anchor_y = np.full(n_columns, np.nan)
+    anchored = np.zeros(n_columns, dtype=bool)
+    columns = np.arange(n_columns)
+    with np.errstate(invalid='ignore'):
+        for j in np.flatnonzero(has_data.any(axis=0)):
+            has = has_data[:, j]
+            ok = valid[:, j]
+            xs, ys = cand_x[:, j], cand_y[:, j]
+            area = np.abs(
+                (anchor_x - next_x[:, j])[:, None] * (ys - anchor_y[:, None])
+                - (anchor_x[:, None] - xs) * (next_y[:, j] - anchor_y)[:, None]
+            )
+            pick = np.argmax(np.where(ok, area, -1.0), axis=1)
+            first = ~anchored
+            last = anchored & ~np.isfinite(next_x[:, j])
+            pick = np.where(first, np.argmin(np.where(ok, xs, np.inf), axis=1), pick)
+            pick = np.where(last, np.argmax(np.where(ok, xs, -np.inf), axis=1), pick)
+            picked_x = xs[columns, pick]
+            picked_y = ys[columns, pick]
+            selected[has, j] = picked_y[has]
+            anchor_x = np.where(has, picked_x, anchor_x)
+            anchor_y = np.where(has, picked_y, anchor_y)
+            anchored |= has
+    return selected
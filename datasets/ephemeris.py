@@ -0,0 +1,198 @@
+"""
+Sunrise, sunset and moon phase at the observatory, per local day.
+
+The values only depend on the date, so they are computed once per local
+day with astroplan/astropy and kept in the Django cache (shared by all
+workers) and in a small per-process memo. ``precompute`` fills the next
+days ahead of time (``manage.py warm_plot_cache`` calls it), so the
+dashboard only does dictionary lookups.
+
+Entries hold plain floats: sunrise and sunset as UTC epoch seconds, and
+the moon-sun separation at the start and end of the local day, which is
+interpolated for the current time.
+"""
+
+import logging
+from datetime import datetime, time as dtime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import astropy.coordinates as coord
+import astropy.units as u
+from astroplan import Observer
+from astropy.coordinates import get_body
+from astropy.time import Time
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('weather.ephemeris')
+
+#   Observatory location
+OST_LATITUDE = +52.409184
+OST_LONGITUDE = +12.973185
+OST_HEIGHT = 39
+
+#   Apparent horizon for sunrise/sunset (refraction and solar radius)
+SUN_HORIZON_DEG = -0.8333
+
+CACHE_KEY_PREFIX = 'ephemeris:v1'
+CACHE_TTL_SECONDS = 14 * 86400
+
+#   Days kept in the per-process memo
+_MEMO_SIZE = 32
+_memo = {}
+
+
+def display_timezone():
+    """``(name, ZoneInfo)`` of the display timezone; UTC on invalid names."""
+    name = getattr(settings, 'PLOT_DISPLAY_TIMEZONE', 'Europe/Berlin')
+    try:
+        return name, ZoneInfo(name)
+    except Exception:
+        return 'UTC', ZoneInfo('UTC')
+
+
+@lru_cache(maxsize=8)
+def observer(tz_name):
+    """The astroplan Observer of the observatory (built once per process)."""
+    location = coord.EarthLocation(
+        lat=OST_LATITUDE,
+        lon=OST_LONGITUDE,
+        height=OST_HEIGHT,
+    )
+    return Observer(location=location, name="OST", timezone=tz_name)
+
+
+def _moon_sun_separation(t):
+    return float(get_body('moon', t).separation(get_body('sun', t)).deg)
+
+
+def compute_day(day, tz_name):
+    """
+    Compute the ephemeris of one local day
+
+    Parameters
+    ----------
+    day                 : `datetime.date`
+        Local date in ``tz_name``.
+
+    tz_name             : `string`
+        IANA timezone name.
+
+    Returns
+    -------
+    entry               : `dict`
+        ``sunrise`` and ``sunset`` (UTC epoch seconds), ``day_start`` and
+        ``day_end`` (UTC epoch seconds of local midnight) and
+        ``moon_phase_start``/``moon_phase_end`` (moon-sun separation in
+        degrees at those times).
+    """
+    tz = ZoneInfo(tz_name)
+    day_start = datetime.combine(day, dtime.min, tzinfo=tz)
+    day_end = datetime.combine(day + timedelta(days=1), dtime.min, tzinfo=tz)
+    #   Sunrise and sunset nearest to local noon are the ones of this day
+    noon = Time(datetime.combine(day, dtime(12, 0), tzinfo=tz))
+    ost = observer(tz_name)
+    sunrise = ost.sun_rise_time(noon, horizon=SUN_HORIZON_DEG * u.deg, which='nearest')
+    sunset = ost.sun_set_time(noon, horizon=SUN_HORIZON_DEG * u.deg, which='nearest')
+    return {
+        'date': day.isoformat(),
+        'sunrise': float(sunrise.unix),
+        'sunset': float(sunset.unix),
+        'day_start': day_start.timestamp(),
+        'day_end': day_end.timestamp(),
+        'moon_phase_start': _moon_sun_separation(Time(day_start)),
+        'moon_phase_end': _moon_sun_separation(Time(day_end)),
+    }
+
+
+def cache_key(day, tz_name):
+    return f'{CACHE_KEY_PREFIX}:{tz_name}:{day.isoformat()}'
+
+
+def _remember(key, entry):
+    if len(_memo) >= _MEMO_SIZE:
+        _memo.clear()
+    _memo[key] = entry
+
+
+def clear_memo():
+    """Forget per-process entries and the Observer (the Django cache is kept)."""
+    _memo.clear()
+    observer.cache_clear()
+
+
+def day_ephemeris(day, tz_name):
+    """Ephemeris entry of a local day: process memo, then cache, then compute."""
+    key = cache_key(day, tz_name)
+    entry = _memo.get(key)
+    if entry is not None:
+        return entry
+    entry = cache.get(key)
+    if entry is None:
+        entry = compute_day(day, tz_name)
+        cache.set(key, entry, CACHE_TTL_SECONDS)
+        logger.info('ephemeris_computed tz=%s date=%s', tz_name, entry['date'])
+    _remember(key, entry)
+    return entry
+
+
+def today_ephemeris(now=None):
+    """
+    Ephemeris of the current local day in the display timezone
+
+    Parameters
+    ----------
+    now                 : `datetime.datetime` or `None`, optional
+        Aware reference time; defaults to the current time.
+
+    Returns
+    -------
+    entry               : `dict`
+        See ``compute_day``.
+
+    tz                  : `ZoneInfo`
+        Display timezone.
+    """
+    tz_name, tz = display_timezone()
+    now = datetime.now(tz) if now is None else now.astimezone(tz)
+    return day_ephemeris(now.date(), tz_name), tz
+
+
+def precompute(days=None, start=None):
+    """
+    Fill the cache for ``start`` (default: today) and the following days
+
+    Days already in the cache are not recomputed. Returns the number of
+    days checked.
+    """
+    if days is None:
+        days = getattr(settings, 'EPHEMERIS_PRECOMPUTE_DAYS', 7)
+    tz_name, tz = display_timezone()
+    if start is None:
+        start = datetime.now(tz).date()
+    count = max(0, int(days)) + 1
+    for offset in range(count):
+        day_ephemeris(start + timedelta(days=offset), tz_name)
+    return count
+
+
+def is_daytime(entry, timestamp):
+    """Whether UTC epoch ``timestamp`` is between the entry's sunrise and sunset."""
+    return entry['sunrise'] <= timestamp <= entry['sunset']
+
+
+def moon_phase_angle(entry, timestamp):
+    """Moon-sun separation in degrees at ``timestamp``, interpolated within the day."""
+    span = entry['day_end'] - entry['day_start']
+    fraction = min(1.0, max(0.0, (timestamp - entry['day_start']) / span))
+    return entry['moon_phase_start'] + fraction * (
+        entry['moon_phase_end'] - entry['moon_phase_start']
+    )
+
+
+def local_clock(timestamp, tz):
+    """``HH:MM`` of UTC epoch ``timestamp`` in ``tz``."""
+    local = datetime.fromtimestamp(timestamp, tz)
+    return f'{local.hour:02d}:{local.minute:02d}'
+
@@ -39,15 +39,19 @@ def plot_query_for_additional_plots(form):
 
     cleaned = form.cleaned_data
     if cleaned.get('start_dt') and cleaned.get('end_dt'):
-        return {
+        query = {
             'start_date': cleaned['start_date'].isoformat(),
             'end_date': cleaned['end_date'].isoformat(),
             'time_resolution': str(cleaned['time_resolution']),
         }
-    return {
-        'plot_range': str(cleaned['plot_range']),
-        'time_resolution': str(cleaned['time_resolution']),
-    }
+    else:
+        query = {
+            'plot_range': str(cleaned['plot_range']),
+            'time_resolution': str(cleaned['time_resolution']),
+        }
+    if cleaned.get('downsample'):
+        query['downsample'] = cleaned['downsample']
+    return query
 
 
 class ParameterPlotForm(forms.Form):
@@ -103,6 +107,21 @@ class ParameterPlotForm(forms.Form):
         },
         )
 
+    #   Shape-preserving downsampling of raw rows instead of time bins
+    downsample = forms.ChoiceField(
+        label='Downsampling',
+        required=False,
+        widget=forms.Select(),
+        choices=(
+            ('', 'Time bins'),
+            ('minmax', 'Min/max envelope'),
+            ('lttb', 'LTTB'),
+            ),
+        error_messages={
+            'invalid_choice': 'Select a valid downsampling mode.',
+        },
+        )
+
     #   Custom range (dates)
     start_date = forms.DateField(
         label='Start date',
@@ -166,6 +185,11 @@ class ParameterPlotForm(forms.Form):
             tr_seconds = float(tr_choice)
         except Exception:
             raise ValidationError('Invalid time resolution.')
+        cleaned['downsample'] = cleaned.get('downsample') or ''
+        if cleaned['downsample']:
+            # Min/max and LTTB reduce raw rows to a fixed point budget
+            cleaned['resolution_adjusted'] = False
+            return cleaned
         min_resolution = max(1.0, range_seconds / max_points)
 
         # Allowed resolutions from choices
@@ -4,15 +4,18 @@ from __future__ import annotations
 
 import hashlib
 import hmac
+import json
 import secrets
 import time
-from typing import Mapping, MutableMapping, Optional, Tuple
+from typing import Iterable, Mapping, MutableMapping, Optional, Tuple
 from urllib.parse import urlencode
 
 
 PROTOCOL = 'WEATHER-HMAC-V1'
 DEFAULT_PATH = '/weather_station/weather_api/datasets/'
 CONTENT_TYPE = 'application/x-www-form-urlencoded'
+BATCH_PATH = '/weather_station/weather_api/datasets/batch/'
+BATCH_CONTENT_TYPE = 'application/x-ndjson'
 
 
 def body_sha256_hex(body: bytes) -> str:
@@ -52,6 +55,7 @@ def sign_body(
     timestamp: Optional[str] = None,
     nonce: Optional[str] = None,
     path: str = DEFAULT_PATH,
+    content_type: str = CONTENT_TYPE,
 ) -> Tuple[bytes, MutableMapping[str, str]]:
     ts = timestamp if timestamp is not None else str(int(time.time()))
     nonce_hex = nonce if nonce is not None else secrets.token_hex(16)
@@ -62,10 +66,11 @@ def sign_body(
         nonce=nonce_hex,
         body=body,
         path=path,
+        content_type=content_type,
     )
     signature = hmac.new(secret, canonical.encode('utf-8'), hashlib.sha256).hexdigest()
     headers = {
-        'Content-Type': CONTENT_TYPE,
+        'Content-Type': content_type,
         'X-Weather-Device': device_id,
         'X-Weather-Key-Id': key_id,
         'X-Weather-Timestamp': ts,
@@ -80,6 +85,13 @@ def encode_form(data: Mapping) -> bytes:
     return urlencode(list(data.items()), doseq=False).encode('utf-8')
 
 
+def encode_ndjson(rows: Iterable[Mapping]) -> bytes:
+    # One compact JSON object per line (batch uploads to BATCH_PATH).
+    return ''.join(
+        json.dumps(dict(row), separators=(',', ':')) + '\n' for row in rows
+    ).encode('utf-8')
+
+
 def parse_secret_hex(secret_hex: str) -> bytes:
     cleaned = (secret_hex or '').strip().replace('\r', '').replace('\n', '')
     if len(cleaned) != 64:
@@ -0,0 +1,320 @@
+"""
+Upload side effects and the optional ingest queue.
+
+``after_ingest`` folds newly stored rows into rollups, plot caches, the
+current-conditions snapshot and live streams; every write path of uploads
+calls it once per insert.
+
+With ``UPLOAD_INGEST_MODE = 'queue'`` the upload views do not write to the
+database. Validated readings are appended to a Redis stream and answered
+with 202 right away; ``manage.py drain_ingest_queue`` reads the stream in
+a consumer group, inserts the readings with one ``bulk_create`` per batch
+and stores the created primary keys in the replay store, so identical
+retries get the same answers as with synchronous writes. Entries are only
+acknowledged after their rows are committed; entries of a writer that
+died are claimed again by the next one.
+
+Entries that cannot be inserted move to the dead-letter stream
+``<UPLOAD_INGEST_STREAM>:failed`` and their replay reservation is cleared,
+so a retry of the upload is queued again instead of waiting for the
+reservation to expire. ``drain_ingest_queue --requeue-failed`` moves them
+back once the cause is fixed; uploads stored meanwhile by a retry are
+skipped.
+"""
+
+import json
+import logging
+import os
+import socket
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from .api.replay import (
+    ReplayReservation,
+    ReplayStoreUnavailable,
+    clear_reservation,
+    lookup_reservation,
+    mark_batch_success,
+    mark_success,
+)
+from .conditions import refresh_snapshot
+from .data_versions import safe_bump_data_version
+from .live import publish_reading
+from .models import Dataset
+from .redis_client import redis_client
+from .rollups import refresh_rollups
+
+logger = logging.getLogger('weather.ingest')
+
+
+class IngestQueueUnavailable(Exception):
+    pass
+
+
+def after_ingest(start_jd, end_jd=None):
+    """Refresh everything derived from rows in ``[start_jd, end_jd]``; never raises."""
+    if end_jd is None:
+        end_jd = start_jd
+    try:
+        refresh_rollups(start_jd, end_jd)
+    except DatabaseError:
+        logger.exception('rollup_refresh_failed start_jd=%s end_jd=%s', start_jd, end_jd)
+    safe_bump_data_version(start_jd, end_jd)
+    refresh_snapshot()
+    publish_reading(end_jd)
+
+
+def ingest_queue_enabled():
+    return getattr(settings, 'UPLOAD_INGEST_MODE', 'sync') == 'queue'
+
+
+def _stream():
+    return getattr(settings, 'UPLOAD_INGEST_STREAM', 'weather:ingest')
+
+
+def _dead_letter_stream():
+    return _stream() + ':failed'
+
+
+def _group():
+    return getattr(settings, 'UPLOAD_INGEST_GROUP', 'ingest-writers')
+
+
+def default_consumer_name():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def enqueue_readings(rows, device, replay_key='', body_digest='', batch=False):
+    """
+    Append validated readings to the ingest stream
+
+    Parameters
+    ----------
+    rows                : `list` of `dict`
+        ``DatasetSerializer`` validated data.
+
+    device              : `UploadDevice` or `None`
+        Uploading device (stored as ``upload_device``).
+
+    replay_key, body_digest : `string`, optional
+        Replay store entry of the upload; the writer stores the created
+        primary key(s) under it.
+
+    batch               : `bool`, optional
+        Whether the upload came through the batch endpoint (``pks`` instead
+        of ``pk`` in the replay store).
+
+    Returns
+    -------
+    entry_id            : `string`
+        Stream entry id.
+    """
+    client = redis_client()
+    if client is None:
+        raise IngestQueueUnavailable('UPLOAD_INGEST_MODE=queue requires REDIS_URL')
+    fields = {
+        'rows': json.dumps(list(rows), separators=(',', ':')),
+        'device': '' if device is None else str(device.pk),
+        'replay_key': replay_key,
+        'body_digest': body_digest,
+        'batch': '1' if batch else '0',
+    }
+    entry_id = client.xadd(_stream(), fields)
+    return entry_id.decode('ascii') if isinstance(entry_id, bytes) else str(entry_id)
+
+
+def _decode_fields(fields):
+    return {
+        (k.decode('utf-8') if isinstance(k, bytes) else k):
+            (v.decode('utf-8') if isinstance(v, bytes) else v)
+        for k, v in fields.items()
+    }
+
+
+def _entry_objects(fields):
+    device_pk = fields.get('device') or None
+    return [
+        Dataset(upload_device_id=int(device_pk) if device_pk else None, **row)
+        for row in json.loads(fields['rows'])
+    ]
+
+
+def _insert(objs):
+    with transaction.atomic():
+        return Dataset.objects.bulk_create(objs)
+
+
+def _mark_stored(fields, created):
+    replay_key = fields.get('replay_key')
+    if not replay_key:
+        return
+    reservation = ReplayReservation(key=replay_key, created=True)
+    pks = [obj.pk for obj in created]
+    try:
+        if fields.get('batch') == '1':
+            mark_batch_success(reservation, fields.get('body_digest', ''), pks)
+        else:
+            mark_success(reservation, fields.get('body_digest', ''), pks[0])
+    except ReplayStoreUnavailable:
+        logger.error('replay_mark_failed replay_key=%s rows=%s', replay_key, len(pks))
+
+
+def _release(entry_id, fields):
+    replay_key = fields.get('replay_key')
+    if not replay_key:
+        return
+    try:
+        clear_reservation(replay_key)
+    except ReplayStoreUnavailable:
+        logger.error('replay_clear_failed entry=%s replay_key=%s', entry_id, replay_key)
+
+
+def write_entries(entries):
+    """
+    Insert the readings of queued entries
+
+    All entries go into one ``bulk_create``. If that fails, each entry is
+    inserted on its own so one bad entry does not block the others.
+    Entries whose upload is already stored (redelivery after a writer
+    crashed before acknowledging) are skipped.
+
+    Parameters
+    ----------
+    entries             : `list` of (`string`, `dict`)
+        Stream entry ids and their decoded fields.
+
+    Returns
+    -------
+    inserted            : `int`
+        Number of rows inserted.
+
+    failed              : `list` of (`string`, `dict`)
+        Entries that could not be inserted.
+    """
+    pending = []
+    failed = []
+    for entry_id, fields in entries:
+        replay_key = fields.get('replay_key')
+        if replay_key:
+            try:
+                stored = lookup_reservation(replay_key)
+            except ReplayStoreUnavailable:
+                stored = None
+            if stored is not None and (stored.stored_pk() is not None or stored.stored_pks() is not None):
+                continue
+        try:
+            pending.append((entry_id, fields, _entry_objects(fields)))
+        except (TypeError, ValueError, KeyError):
+            logger.exception('ingest_entry_invalid entry=%s', entry_id)
+            failed.append((entry_id, fields))
+
+    stored = []
+    try:
+        _insert([obj for _, _, objs in pending for obj in objs])
+        stored = pending
+    except DatabaseError:
+        logger.exception('ingest_batch_failed entries=%s', len(pending))
+        for entry_id, fields, objs in pending:
+            try:
+                _insert(objs)
+                stored.append((entry_id, fields, objs))
+            except DatabaseError:
+                logger.exception('ingest_entry_failed entry=%s', entry_id)
+                failed.append((entry_id, fields))
+
+    jds = []
+    for _, fields, objs in stored:
+        _mark_stored(fields, objs)
+        jds.extend(obj.jd for obj in objs)
+    if jds:
+        after_ingest(min(jds), max(jds))
+    return len(jds), failed
+
+
+def ensure_group(client):
+    import redis
+
+    try:
+        client.xgroup_create(_stream(), _group(), id='0', mkstream=True)
+    except redis.ResponseError as exc:
+        if 'BUSYGROUP' not in str(exc):
+            raise
+
+
+def drain_once(consumer, batch_size=None, block_ms=5000):
+    """
+    Read, insert and acknowledge one batch of stream entries
+
+    Returns the number of entries handled (0 after ``block_ms`` without
+    new entries).
+    """
+    client = redis_client()
+    if client is None:
+        raise IngestQueueUnavailable('drain_ingest_queue requires REDIS_URL')
+    if batch_size is None:
+        batch_size = int(getattr(settings, 'UPLOAD_INGEST_BATCH_SIZE', 500))
+    stream, group = _stream(), _group()
+    ensure_group(client)
+
+    # Entries left unacknowledged by a crashed writer come first
+    idle_ms = int(getattr(settings, 'UPLOAD_INGEST_CLAIM_IDLE_SECONDS', 60) * 1000)
+    claimed = client.xautoclaim(
+        stream, group, consumer, min_idle_time=idle_ms, start_id='0-0', count=batch_size,
+    )
+    messages = [(entry_id, fields) for entry_id, fields in claimed[1] if fields]
+    if not messages:
+        response = client.xreadgroup(
+            group, consumer, {stream: '>'}, count=batch_size, block=block_ms,
+        )
+        messages = [message for _, stream_messages in response or [] for message in stream_messages]
+    if not messages:
+        return 0
+
+    entries = [
+        (entry_id.decode('ascii') if isinstance(entry_id, bytes) else entry_id, _decode_fields(fields))
+        for entry_id, fields in messages
+    ]
+    inserted, failed = write_entries(entries)
+    for entry_id, fields in failed:
+        client.xadd(_dead_letter_stream(), {**fields, 'entry': entry_id})
+        _release(entry_id, fields)
+    ids = [entry_id for entry_id, _ in entries]
+    client.xack(stream, group, *ids)
+    client.xdel(stream, *ids)
+    logger.info(
+        'ingest_drained entries=%s rows=%s failed=%s',
+        len(entries),
+        inserted,
+        len(failed),
+    )
+    return len(entries)
+
+
+def requeue_failed(count=None):
+    """
+    Move dead-lettered entries back to the ingest stream
+
+    Parameters
+    ----------
+    count               : `int`, optional
+        Oldest entries to move (default: all).
+
+    Returns
+    -------
+    moved               : `int`
+        Number of entries moved.
+    """
+    client = redis_client()
+    if client is None:
+        raise IngestQueueUnavailable('drain_ingest_queue requires REDIS_URL')
+    stream, dead_letter = _stream(), _dead_letter_stream()
+    moved = 0
+    for entry_id, fields in client.xrange(dead_letter, count=count):
+        fields = _decode_fields(fields)
+        fields.pop('entry', None)
+        client.xadd(stream, fields)
+        client.xdel(dead_letter, entry_id)
+        moved += 1
+    logger.info('ingest_requeued entries=%s', moved)
+    return moved
@@ -0,0 +1,237 @@
+"""
+Live plot updates for the dashboard as Server-Sent Events.
+
+Uploads record the JD of the newest reading in the cache and announce it on
+a Redis pub/sub channel. Each open stream waits on that channel (or polls
+the cache without Redis, which then must be shared by all workers) and,
+once a reading lands in a later bin than its
+cursor, sends the newly closed bins at the viewer's time resolution. Bins
+are epoch-aligned like the chunk cache (``datasets.plot_chunks``), so the
+closed chunks are shared with plot renders and between viewers.
+
+Streams end after ``LIVE_STREAM_MAX_SECONDS``; ``EventSource`` reconnects
+with ``Last-Event-ID`` (the last bin sent), so no bin is lost in between.
+"""
+
+import json
+import logging
+import math
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .binning import bin_indices
+from .plot_cache import plot_cache_enabled
+from .plot_chunks import BIN_EPOCH_JD
+from .plots import (
+    MAIN_PLOT_IDENTIFIERS,
+    PLOT_DATA_FIGURES,
+    _additional_series,
+    _main_series,
+    aligned_frame,
+    jd_array_to_local_epoch_ms,
+)
+from .redis_client import redis_client
+
+logger = logging.getLogger('weather.live')
+
+LATEST_JD_KEY = 'live:latest_jd'
+
+#   Cache backends that do not reach the other worker processes
+_PROCESS_LOCAL_CACHES = frozenset({
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+})
+
+
+def live_updates_shared():
+    """Do uploads handled by one worker reach streams in the others?"""
+    if getattr(settings, 'REDIS_URL', ''):
+        return True
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    return backend not in _PROCESS_LOCAL_CACHES
+
+
+def live_stream_enabled():
+    """
+    ``LIVE_STREAM_ENABLED``, unless uploads cannot reach the streams
+
+    Without ``REDIS_URL`` the streams poll the default cache; a per-process
+    cache (LocMem) would hide uploads of other workers, so the dashboard
+    polls the plot data endpoint instead (see check ``weather.W001``).
+    """
+    if not getattr(settings, 'LIVE_STREAM_ENABLED', False):
+        return False
+    return live_updates_shared()
+
+
+def _channel():
+    return getattr(settings, 'LIVE_STREAM_CHANNEL', 'weather:live')
+
+
+def publish_reading(jd):
+    """Announce a new reading to open streams; never raises (ingest path)."""
+    try:
+        jd = float(jd)
+        latest = cache.get(LATEST_JD_KEY)
+        # Late uploads of older readings do not move the live edge back
+        if latest is None or jd > latest:
+            cache.set(LATEST_JD_KEY, jd, None)
+        client = redis_client()
+        if client is not None:
+            client.publish(_channel(), repr(jd))
+    except Exception:
+        logger.exception('live_publish_failed jd=%s', jd)
+
+
+def _json_values(values):
+    return [float(v) if math.isfinite(v) else None for v in np.asarray(values, dtype=float)]
+
+
+def closed_bins_payload(first_bin, last_bin, time_resolution):
+    """
+    Epoch-aligned bins ``first_bin`` … ``last_bin`` of the dashboard series
+
+    Returns
+    -------
+    payload             : `dict`
+        ``bins`` (first and last bin index), ``length`` (0 also if the
+        bins had too many raw rows) and per plot set
+        ``x`` (local wall-clock epoch ms, as the plot data API) and
+        ``columns`` {`column`: `list`} with `None` for missing values.
+    """
+    frame = aligned_frame(
+        first_bin,
+        last_bin,
+        time_resolution,
+        chunk_cache=plot_cache_enabled(time_resolution=time_resolution, fresh=False),
+    )
+    payload = {
+        'bins': [int(first_bin), int(last_bin)],
+        'length': int(frame.bin_jd.size),
+        'sets': {},
+    }
+    if frame.empty or frame.note is not None:
+        return payload
+    x = _json_values(jd_array_to_local_epoch_ms(frame.bin_jd))
+    for plot_set, series in (
+            ('main', _main_series(frame, MAIN_PLOT_IDENTIFIERS)),
+            ('additional', _additional_series(frame)),
+    ):
+        figures = PLOT_DATA_FIGURES[plot_set]
+        payload['sets'][plot_set] = {
+            'x': x,
+            'figures': {key: list(columns) for key, columns in figures.items()},
+            'columns': {
+                column: _json_values(series[column])
+                for columns in figures.values()
+                for column in columns
+            },
+        }
+    return payload
+
+
+def format_event(data, event=None, event_id=None):
+    """One SSE message (``data`` is JSON-encoded)."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event is not None:
+        lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+class _Wakeup:
+    """Wait for the next upload: Redis pub/sub message or a poll interval."""
+
+    def __init__(self):
+        self.pubsub = None
+        client = redis_client()
+        if client is not None:
+            try:
+                self.pubsub = client.pubsub(ignore_subscribe_messages=True)
+                self.pubsub.subscribe(_channel())
+            except Exception:
+                logger.exception('live_subscribe_failed')
+                self.pubsub = None
+
+    def wait(self, timeout):
+        if self.pubsub is None:
+            time.sleep(min(timeout, getattr(settings, 'LIVE_STREAM_POLL_SECONDS', 2.0)))
+            return
+        try:
+            self.pubsub.get_message(timeout=timeout)
+            # Drain a burst (batch replays) in one wake-up
+            while self.pubsub.get_message(timeout=0) is not None:
+                pass
+        except Exception:
+            logger.exception('live_wait_failed')
+            time.sleep(timeout)
+
+    def close(self):
+        if self.pubsub is not None:
+            try:
+                self.pubsub.close()
+            except Exception:
+                pass
+
+
+def bin_stream(time_resolution, last_event_id=None, now_jd=None):
+    """
+    SSE messages with the bins that close while the stream is open
+
+    Parameters
+    ----------
+    time_resolution     : `float`
+        Bin width in seconds (the viewer's cleaned plot resolution).
+
+    last_event_id       : `string` or `None`, optional
+        ``Last-Event-ID`` of a reconnecting client: the last bin it has.
+        Without it the stream starts at the open bin of ``now_jd``, the
+        last bin of a freshly rendered page.
+
+    now_jd              : `float` or `None`, optional
+        Current time; defaults to the clock.
+    """
+    time_resolution = float(time_resolution)
+    if now_jd is None:
+        now_jd = BIN_EPOCH_JD + time.time() / 86400.0
+    open_bin = int(bin_indices([now_jd], time_resolution, BIN_EPOCH_JD)[0])
+    cursor = open_bin
+    if last_event_id:
+        try:
+            max_catchup = int(getattr(settings, 'LIVE_STREAM_MAX_CATCHUP_BINS', 288))
+            cursor = max(int(last_event_id) + 1, open_bin - max_catchup)
+        except (TypeError, ValueError):
+            pass
+
+    max_seconds = float(getattr(settings, 'LIVE_STREAM_MAX_SECONDS', 300))
+    heartbeat = float(getattr(settings, 'LIVE_STREAM_HEARTBEAT_SECONDS', 15))
+    retry_ms = int(getattr(settings, 'LIVE_STREAM_RETRY_SECONDS', 5) * 1000)
+
+    yield f'retry: {retry_ms}\n\n'
+    wakeup = _Wakeup()
+    started = last_write = time.monotonic()
+    try:
+        while True:
+            latest_jd = cache.get(LATEST_JD_KEY)
+            if latest_jd is not None:
+                latest_bin = int(bin_indices([latest_jd], time_resolution, BIN_EPOCH_JD)[0])
+                if latest_bin > cursor:
+                    payload = closed_bins_payload(cursor, latest_bin - 1, time_resolution)
+                    cursor = latest_bin
+                    if payload['length']:
+                        yield format_event(payload, event='bins', event_id=latest_bin - 1)
+                        last_write = time.monotonic()
+            now = time.monotonic()
+            if now - started >= max_seconds:
+                return
+            if now - last_write >= heartbeat:
+                yield ': keepalive\n\n'
+                last_write = now
+            wakeup.wait(max(0.0, min(heartbeat, started + max_seconds - now)))
+    finally:
+        wakeup.close()
@@ -0,0 +1,100 @@
+"""
+Vectorized Julian date to local wall-clock conversion.
+
+UTC epoch milliseconds follow from the JD arithmetically. The display
+timezone's UTC offset is looked up in a table of its transitions (DST
+changes) over the covered days, so a whole series is converted with a
+``searchsorted`` instead of one ``datetime.astimezone`` per element.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+
+UNIX_EPOCH_JD = 2440587.5
+MS_PER_DAY = 86_400_000
+SECONDS_PER_DAY = 86_400
+
+
+def jd_to_epoch_ms(x_jd):
+    """UTC epoch milliseconds (`int64`) of Julian dates."""
+    x_jd = np.asarray(x_jd, dtype=float)
+    return np.rint((x_jd - UNIX_EPOCH_JD) * MS_PER_DAY).astype(np.int64)
+
+
+def _utc_offset_seconds(tz, timestamp):
+    return int(datetime.fromtimestamp(timestamp, tz).utcoffset().total_seconds())
+
+
+@lru_cache(maxsize=128)
+def offset_table(tz, first_day, last_day):
+    """
+    UTC offset transitions of ``tz`` between two UTC days since the epoch
+
+    Offsets are sampled once per day; a change between two samples is
+    located to the second by bisection. Zones change their offset at most
+    a few times a year, so one sample per day cannot miss a transition.
+
+    Returns
+    -------
+    starts_ms           : `numpy.ndarray`
+        UTC epoch ms from which each offset applies (ascending).
+
+    offsets_ms          : `numpy.ndarray`
+        UTC offset in ms; ``offsets_ms[0]`` also applies before the range.
+    """
+    previous = _utc_offset_seconds(tz, first_day * SECONDS_PER_DAY)
+    starts = [first_day * SECONDS_PER_DAY]
+    offsets = [previous]
+    for day in range(first_day + 1, last_day + 2):
+        offset = _utc_offset_seconds(tz, day * SECONDS_PER_DAY)
+        if offset == previous:
+            continue
+        low, high = (day - 1) * SECONDS_PER_DAY, day * SECONDS_PER_DAY
+        while high - low > 1:
+            middle = (low + high) // 2
+            if _utc_offset_seconds(tz, middle) == previous:
+                low = middle
+            else:
+                high = middle
+        starts.append(high)
+        offsets.append(offset)
+        previous = offset
+    return (
+        np.array(starts, dtype=np.int64) * 1000,
+        np.array(offsets, dtype=np.int64) * 1000,
+    )
+
+
+def jd_to_local_datetime64(x_jd, tz):
+    """
+    Naive local wall-clock ``datetime64[ms]`` of Julian dates in ``tz``
+
+    Parameters
+    ----------
+    x_jd                : `float` or array-like
+        Julian dates (UTC).
+
+    tz                  : `datetime.tzinfo`
+        Display timezone, e.g. a ``ZoneInfo``.
+
+    Returns
+    -------
+    local               : `numpy.ndarray` of `datetime64[ms]`
+    """
+    utc_ms = np.atleast_1d(jd_to_epoch_ms(x_jd)).ravel()
+    if utc_ms.size == 0:
+        return np.array([], dtype='datetime64[ms]')
+    first_day = int(utc_ms.min() // MS_PER_DAY)
+    last_day = int(utc_ms.max() // MS_PER_DAY)
+    starts_ms, offsets_ms = offset_table(tz, first_day, last_day)
+    index = np.searchsorted(starts_ms, utc_ms, side='right') - 1
+    local_ms = utc_ms + offsets_ms[np.clip(index, 0, None)]
+    return local_ms.astype('datetime64[ms]')
+
+
+def tz_abbrev_at_jd(jd, tz):
+    """Timezone abbreviation (CET, CEST, …) in effect at a Julian date."""
+    timestamp = (float(jd) - UNIX_EPOCH_JD) * SECONDS_PER_DAY
+    return datetime.fromtimestamp(timestamp, tz).tzname()
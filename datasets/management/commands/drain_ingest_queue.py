@@ -0,0 +1,87 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from datasets.ingest import IngestQueueUnavailable, default_consumer_name, drain_once, requeue_failed
+
+logger = logging.getLogger('weather.ingest')
+
+
+def _drain(consumer, **options):
+    #   Like a request: a connection lost to a database restart is replaced
+    #   instead of failing every later batch
+    close_old_connections()
+    try:
+        return drain_once(consumer, **options)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        'Write queued uploads (UPLOAD_INGEST_MODE=queue) to the database. '
+        'Reads the Redis ingest stream in a consumer group and inserts each '
+        'batch with one bulk_create. Runs until stopped unless --once is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain what is queued now, then exit',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Stream entries per insert (default: UPLOAD_INGEST_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--requeue-failed',
+            action='store_true',
+            help='Move entries of the dead-letter stream (<stream>:failed) '
+                 'back to the ingest stream, then exit',
+        )
+        parser.add_argument(
+            '--consumer',
+            default='',
+            help='Consumer name in the group (default: <hostname>-<pid>)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size is not None and batch_size <= 0:
+            raise CommandError('--batch-size must be positive')
+        consumer = options['consumer'] or default_consumer_name()
+
+        if options['requeue_failed']:
+            try:
+                moved = requeue_failed()
+            except IngestQueueUnavailable as exc:
+                raise CommandError(str(exc)) from exc
+            self.stdout.write(self.style.SUCCESS(f'Requeued {moved} failed upload(s)'))
+            return
+
+        if options['once']:
+            total = 0
+            try:
+                while True:
+                    handled = _drain(consumer, batch_size=batch_size, block_ms=None)
+                    if not handled:
+                        break
+                    total += handled
+            except IngestQueueUnavailable as exc:
+                raise CommandError(str(exc)) from exc
+            self.stdout.write(self.style.SUCCESS(f'Drained {total} queued upload(s)'))
+            return
+
+        while True:
+            try:
+                _drain(consumer, batch_size=batch_size)
+            except IngestQueueUnavailable as exc:
+                raise CommandError(str(exc)) from exc
+            except Exception:
+                logger.exception('ingest_drain_failed consumer=%s', consumer)
+                time.sleep(1.0)
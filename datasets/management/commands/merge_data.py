@@ -0,0 +1,126 @@
+from astropy.time import Time
+from django.core.management.base import BaseCommand, CommandError
+
+from datasets.conditions import invalidate_snapshot
+from datasets.merge import (
+    last_checkpoint_jd,
+    merge_chunks,
+    parallel_merge_available,
+    pending_chunks,
+    run_merge,
+    sql_merge_available,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Merge old raw rows into binned merged rows, one bin-aligned chunk '
+        'per transaction. Finished chunks are checkpointed and skipped by '
+        'later runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days-back',
+            type=float,
+            required=True,
+            help='Start of the merge window in days before now',
+        )
+        parser.add_argument(
+            '--span',
+            type=float,
+            required=True,
+            help='Length of the merge window in days',
+        )
+        parser.add_argument(
+            '--bin-size',
+            type=float,
+            default=600.0,
+            help='Bin width of the merged rows in seconds (default: 600)',
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=float,
+            default=1.0,
+            help='Days merged per transaction (default: 1)',
+        )
+        parser.add_argument(
+            '--engine',
+            choices=['auto', 'python', 'sql'],
+            default='auto',
+            help='sql: one set-based statement per chunk (PostgreSQL only); '
+                 'python: bin with NumPy; auto (default): sql on PostgreSQL',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Merge chunks in this many parallel processes (default: 1)',
+        )
+        parser.add_argument(
+            '--catch-up',
+            action='store_true',
+            help='Start at the last checkpoint of this bin size if that is earlier '
+                 '(merges windows missed while the cron did not run)',
+        )
+        parser.add_argument(
+            '--redo',
+            action='store_true',
+            help='Also merge checkpointed chunks (e.g. raw rows uploaded late)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Bin the rows without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        days_back = options['days_back']
+        span = options['span']
+        bin_size = options['bin_size']
+        if days_back < span:
+            raise CommandError(
+                'Provided times are inconsistent. The time span to merge is '
+                'greater than the time span to go back.'
+            )
+        if bin_size <= 0:
+            raise CommandError('--bin-size must be positive')
+        if options['chunk_days'] <= 0:
+            raise CommandError('--chunk-days must be positive')
+        if options['engine'] == 'sql' and not sql_merge_available():
+            raise CommandError('--engine sql requires PostgreSQL')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        if options['workers'] > 1 and not parallel_merge_available():
+            raise CommandError('--workers > 1 requires PostgreSQL')
+
+        jd_current = Time.now().jd
+        start_jd = jd_current - days_back
+        end_jd = start_jd + span
+        if options['catch_up']:
+            checkpoint_jd = last_checkpoint_jd(bin_size)
+            if checkpoint_jd is not None and checkpoint_jd < start_jd:
+                start_jd = checkpoint_jd
+
+        chunks = merge_chunks(start_jd, end_jd, bin_size, options['chunk_days'])
+        todo = chunks if options['redo'] else pending_chunks(chunks, bin_size)
+        rows_read = rows_written = locked = 0
+        for _, result in run_merge(
+                todo,
+                bin_size,
+                workers=options['workers'],
+                dry_run=options['dry_run'],
+                engine=options['engine'],
+        ):
+            locked += result.skipped
+            rows_read += result.rows_read
+            rows_written += result.rows_written
+        if rows_read and not options['dry_run']:
+            # The latest reading may have been merged away
+            invalidate_snapshot()
+
+        self.stdout.write(
+            f'Merged {rows_read} row(s) into {rows_written} in {len(todo) - locked} chunk(s), '
+            f'skipped {len(chunks) - len(todo)} checkpointed chunk(s)'
+            + (f' and {locked} chunk(s) held by another merge' if locked else '')
+        )
@@ -0,0 +1,119 @@
+from astropy.time import Time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+
+from datasets.conditions import invalidate_snapshot
+from datasets.merge import (
+    merge_chunks,
+    parallel_merge_available,
+    parse_retention_tiers,
+    pending_chunks,
+    retention_bands,
+    run_merge,
+    sql_merge_available,
+)
+from datasets.models import Dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Downsample stored data by age according to MERGE_RETENTION_TIERS '
+        '(e.g. raw for 3 days, 1 min bins up to 90 days, 10 min up to two '
+        'years, 1 h afterwards). Day chunks are merged once per tier; the '
+        'checkpoints record the tier each day has reached.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tier',
+            action='append',
+            dest='tiers',
+            help='AGE_DAYS:BIN_SECONDS, e.g. 90:600 '
+                 '(repeatable; default: MERGE_RETENTION_TIERS)',
+        )
+        parser.add_argument(
+            '--engine',
+            choices=['auto', 'python', 'sql'],
+            default='auto',
+            help='sql: one set-based statement per chunk (PostgreSQL only); '
+                 'python: bin with NumPy; auto (default): sql on PostgreSQL',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Merge chunks in this many parallel processes (default: 1)',
+        )
+        parser.add_argument(
+            '--max-chunks',
+            type=int,
+            default=0,
+            help='Stop after merging this many chunks (default: no limit)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the chunks that are due without merging them',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            tiers = parse_retention_tiers(
+                options['tiers'] or getattr(settings, 'MERGE_RETENTION_TIERS', []),
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if not tiers:
+            raise CommandError('No retention tiers configured (MERGE_RETENTION_TIERS)')
+        if options['engine'] == 'sql' and not sql_merge_available():
+            raise CommandError('--engine sql requires PostgreSQL')
+        if options['max_chunks'] < 0:
+            raise CommandError('--max-chunks must not be negative')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        if options['workers'] > 1 and not parallel_merge_available():
+            raise CommandError('--workers > 1 requires PostgreSQL')
+
+        first_jd = Dataset.objects.aggregate(first_jd=Min('jd'))['first_jd']
+        if first_jd is None:
+            self.stdout.write('No datasets to merge.')
+            return
+
+        finest = tiers[0][1]
+        budget = options['max_chunks'] or None
+        merged_chunks = rows_read = rows_written = 0
+        for bin_seconds, start_jd, end_jd in retention_bands(tiers, Time.now().jd, first_jd):
+            # Whole days only: a day is merged to a tier once
+            chunks = pending_chunks(
+                merge_chunks(start_jd, end_jd, bin_seconds, whole_chunks=True),
+                bin_seconds,
+            )
+            if budget is not None:
+                chunks = chunks[:budget - merged_chunks]
+            if options['dry_run']:
+                for chunk in chunks:
+                    self.stdout.write(
+                        f'{bin_seconds:g}s: [{chunk.start_jd:.5f}, {chunk.end_jd:.5f})'
+                    )
+                merged_chunks += len(chunks)
+                continue
+            for _, result in run_merge(
+                    chunks,
+                    bin_seconds,
+                    workers=options['workers'],
+                    engine=options['engine'],
+                    # Coarser tiers merge the rows of the finer ones
+                    include_merged=bin_seconds != finest,
+            ):
+                merged_chunks += not result.skipped
+                rows_read += result.rows_read
+                rows_written += result.rows_written
+        if rows_read:
+            # The latest reading may have been merged away
+            invalidate_snapshot()
+
+        verb = 'Due' if options['dry_run'] else 'Merged'
+        self.stdout.write(
+            f'{verb}: {merged_chunks} chunk(s), {rows_read} row(s) into {rows_written}'
+        )
@@ -0,0 +1,59 @@
+import math
+
+from astropy.time import Time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from datasets.models import Dataset
+from datasets.rollups import ROLLUP_EPOCH_JD, refresh_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the plot rollup tables (DatasetRollup) from Dataset rows. '
+        'Run once before enabling PLOT_ROLLUPS_ENABLED; uploads and the merge '
+        'cron keep them current afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=float,
+            default=0.0,
+            help='Only rebuild the most recent N days (default: full history)',
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=7,
+            help='Days of raw rows loaded per step (default: 7)',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be at least 1')
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative')
+
+        queryset = Dataset.objects.all()
+        if options['days']:
+            queryset = queryset.filter(jd__gte=Time.now().jd - options['days'])
+        bounds = queryset.aggregate(first_jd=Min('jd'), last_jd=Max('jd'))
+        if bounds['first_jd'] is None:
+            self.stdout.write('No datasets to roll up.')
+            return
+
+        # Chunks start on UTC day boundaries so no daily bin is split.
+        day = math.floor(bounds['first_jd'] - ROLLUP_EPOCH_JD)
+        last_day = math.floor(bounds['last_jd'] - ROLLUP_EPOCH_JD)
+        chunks = 0
+        while day <= last_day:
+            chunk_end = min(day + options['chunk_days'], last_day + 1)
+            refresh_rollups(
+                ROLLUP_EPOCH_JD + day,
+                # Last instant of the chunk's final day.
+                ROLLUP_EPOCH_JD + chunk_end - 1e-7,
+            )
+            day = chunk_end
+            chunks += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups in {chunks} chunk(s)'))
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 
+from datasets.api.credential_cache import invalidate_upload_credentials
 from datasets.models import UploadDevice, UploadSigningKey
 
 
@@ -32,6 +33,7 @@ class Command(BaseCommand):
             ).update(revoked_at=now, valid_until=now)
             if not updated:
                 raise CommandError('Key not found or already revoked')
+            invalidate_upload_credentials()
             self.stdout.write(self.style.SUCCESS(f'Revoked key {key_id}'))
             return
 
@@ -42,6 +44,7 @@ class Command(BaseCommand):
                 device=device,
                 revoked_at__isnull=True,
             ).update(revoked_at=now, valid_until=now)
+            invalidate_upload_credentials()
             self.stdout.write(self.style.SUCCESS(f'Deactivated device {device.device_id}'))
             return
 
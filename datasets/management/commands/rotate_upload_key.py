@@ -3,6 +3,7 @@ import secrets
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 
+from datasets.api.credential_cache import invalidate_upload_credentials
 from datasets.credentials import encrypt_secret, generate_hmac_secret
 from datasets.models import UploadDevice, UploadSigningKey
 
@@ -42,6 +43,7 @@ class Command(BaseCommand):
             ).update(revoked_at=timezone.now(), valid_until=timezone.now())
             if not updated:
                 self.stdout.write(self.style.WARNING(f'No active key {revoke_id} to revoke'))
+        invalidate_upload_credentials()
 
         self.stdout.write(self.style.SUCCESS(f'Rotated key for {device.device_id}'))
         self.stdout.write(f'device_id={device.device_id}')
@@ -0,0 +1,125 @@
+import logging
+import time
+
+from astropy.time import Time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from datasets import ephemeris
+from datasets.data_versions import data_versions
+from datasets.forms import plot_form_from_query
+from datasets.plots import additional_plots_components, default_plots
+
+logger = logging.getLogger('weather.plots')
+
+
+def _parse_preset(preset):
+    plot_range, sep, time_resolution = str(preset).partition(':')
+    if not sep:
+        raise CommandError(f'Invalid preset {preset!r}; expected RANGE:RESOLUTION, e.g. 0.5:300')
+    form = plot_form_from_query({
+        'plot_range': plot_range.strip(),
+        'time_resolution': time_resolution.strip(),
+    })
+    if not form.is_valid():
+        raise CommandError(f'Invalid preset {preset!r}: {form.errors.as_text()}')
+    # Same cleaned parameters as the dashboard, so cache keys match.
+    return form.cleaned_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the dashboard plots for the configured presets into the plot '
+        'cache and precompute the sunrise/sunset/moon phase of the coming '
+        'days. With --loop, keep running and re-render whenever new data '
+        'arrives or the entries are about to go stale.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--preset',
+            action='append',
+            default=[],
+            help='RANGE:RESOLUTION in days and seconds, e.g. 0.5:300 '
+                 '(repeatable; default: PLOT_WARM_PRESETS)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Run until stopped instead of warming once',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds between data checks with --loop (default: 5)',
+        )
+        parser.add_argument(
+            '--max-age',
+            type=float,
+            default=None,
+            help='Re-render after this many seconds even without new data '
+                 '(default: half of PLOT_CACHE_TTL_SECONDS)',
+        )
+
+    def handle(self, *args, **options):
+        presets = options['preset'] or getattr(
+            settings, 'PLOT_WARM_PRESETS', ['0.5:300'],
+        )
+        parameters = [(preset, _parse_preset(preset)) for preset in presets]
+        if options['interval'] <= 0:
+            raise CommandError('--interval must be positive')
+        max_age = options['max_age']
+        if max_age is None:
+            max_age = getattr(settings, 'PLOT_CACHE_TTL_SECONDS', 30) / 2.0
+
+        if not options['loop']:
+            self._warm(parameters)
+            self.stdout.write(self.style.SUCCESS(f'Warmed {len(parameters)} preset(s)'))
+            return
+
+        last_versions = None
+        last_warm = 0.0
+        while True:
+            # A connection lost to a database restart is replaced, not reused
+            close_old_connections()
+            now_jd = Time.now().jd
+            # New uploads land in the current UTC day.
+            versions = data_versions(now_jd, now_jd)
+            if versions != last_versions or time.monotonic() - last_warm >= max_age:
+                self._warm(parameters)
+                last_versions = versions
+                last_warm = time.monotonic()
+            time.sleep(options['interval'])
+
+    def _warm(self, parameters):
+        try:
+            # Cheap once the days are cached; picks up each new day
+            ephemeris.precompute()
+        except Exception:
+            logger.exception('ephemeris_warm_failed')
+        for preset, cleaned in parameters:
+            for name, render in (
+                    ('main', default_plots),
+                    ('additional', additional_plots_components),
+            ):
+                started = time.monotonic()
+                try:
+                    _, _, meta = render(refresh=True, **cleaned)
+                except Exception:
+                    logger.exception('plot_warm_failed preset=%s plots=%s', preset, name)
+                    continue
+                duration_ms = (time.monotonic() - started) * 1000
+                logger.info(
+                    'plot_warm preset=%s plots=%s cache_state=%s duration_ms=%.0f',
+                    preset,
+                    name,
+                    meta.get('cache_state'),
+                    duration_ms,
+                )
+                if not meta.get('cache_enabled'):
+                    self.stderr.write(
+                        f'Preset {preset}: resolution below PLOT_CACHE_MIN_RESOLUTION_SECONDS, '
+                        'nothing is cached'
+                    )
@@ -0,0 +1,496 @@
+"""
+Chunked merge of old raw rows into binned ``merged=True`` rows.
+
+``manage.py merge_data`` (and ``merge_data_cron.py``, which calls it)
+walks the merge window in chunks of whole bins, aligned to the Unix epoch
+like the plot rollups. Every chunk is read, binned and written in a
+transaction of its own and recorded in ``MergeCheckpoint`` in the same
+transaction, so memory and lock time depend on the chunk size instead of
+the window, an interrupted run continues with the first chunk it did not
+finish, and ``--catch-up`` merges the windows a stopped cron missed.
+Chunks are disjoint, so ``--workers`` merges several of them in parallel
+processes; advisory locks keep concurrent runs off the same days.
+"""
+
+import datetime
+import logging
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import django
+import numpy as np
+from astropy.time import Time
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .binning import SECONDS_PER_DAY, aggregate_bins, bin_width_days
+from .data_versions import bump_data_version
+from .merge_stats import MERGE_STATS, MERGE_STATS_COMBINE, raw_stats, row_stats
+from .models import Dataset, MergeCheckpoint
+from .plot_db import aggregate_expression, is_postgresql, quote_ident
+from .rollups import ROLLUP_EPOCH_JD, refresh_rollups
+
+logger = logging.getLogger('weather.merge')
+
+#   JD of bin 0 of every merge bin size (same epoch as the rollups)
+MERGE_EPOCH_JD = ROLLUP_EPOCH_JD
+
+#   Medians for sensor values, sum for rain, max for the rain flag
+MERGE_AGGREGATES = {
+    'temperature': 'median',
+    'pressure': 'median',
+    'humidity': 'median',
+    'illuminance': 'median',
+    'wind_speed': 'median',
+    'rain': 'sum',
+    'sky_temp': 'median',
+    'box_temp': 'median',
+    'is_raining': 'max',
+    'pm1_0': 'median',
+    'pm2_5': 'median',
+    'pm10': 'median',
+    'uv_index': 'median',
+}
+
+#   First key of the advisory locks of merge chunks (second: UTC day number)
+ADVISORY_LOCK_CLASS = 0x5753
+
+#   Integer model fields: medians are rounded, NaN becomes 0
+_INTEGER_COLUMNS = ('pm1_0', 'pm2_5', 'pm10', 'uv_index')
+
+
+@dataclass
+class MergeChunk:
+    start_jd: float
+    end_jd: float
+
+
+@dataclass
+class ChunkResult:
+    rows_read: int = 0
+    rows_written: int = 0
+    skipped: bool = False
+
+
+def merge_chunks(start_jd, end_jd, bin_seconds, chunk_days=1.0, whole_chunks=False):
+    """
+    Bin-aligned chunks covering the whole bins in ``[start_jd, end_jd)``
+
+    Chunks lie on a fixed grid of ``chunk_days`` (rounded to whole bins)
+    from the epoch, so every run cuts the same chunks. The first chunk
+    starts on the grid line before ``start_jd``; the last one ends on the
+    bin edge before ``end_jd``, so a bin is never split between two runs
+    and rows of the bin still open at ``end_jd`` wait for a later run.
+    With ``whole_chunks`` the last chunk ends on the grid line before
+    ``end_jd`` instead.
+    """
+    width = bin_width_days(bin_seconds)
+    bins_per_chunk = max(1, int(round(float(chunk_days) * SECONDS_PER_DAY / float(bin_seconds))))
+    first = math.floor((float(start_jd) - MERGE_EPOCH_JD) / width)
+    first -= first % bins_per_chunk
+    stop = math.floor((float(end_jd) - MERGE_EPOCH_JD) / width)
+    if whole_chunks:
+        stop -= stop % bins_per_chunk
+    return [
+        MergeChunk(
+            start_jd=MERGE_EPOCH_JD + index * width,
+            end_jd=MERGE_EPOCH_JD + min(index + bins_per_chunk, stop) * width,
+        )
+        for index in range(first, stop, bins_per_chunk)
+    ]
+
+
+def last_checkpoint_jd(bin_seconds):
+    """End of the latest merged chunk of a bin size (`None` before the first run)."""
+    checkpoint = (
+        MergeCheckpoint.objects.filter(bin_seconds=bin_seconds)
+        .order_by('-end_jd')
+        .first()
+    )
+    return checkpoint.end_jd if checkpoint is not None else None
+
+
+def pending_chunks(chunks, bin_seconds):
+    """
+    Chunks not yet merged to ``bin_seconds`` or a coarser bin size
+
+    A checkpoint covers a chunk only up to its ``end_jd``; a chunk whose
+    checkpoint ended early (on the window end of a run) is pending again.
+    """
+    if not chunks:
+        return []
+    done = {}
+    for start_jd, end_jd in MergeCheckpoint.objects.filter(
+            bin_seconds__gte=bin_seconds,
+            start_jd__gte=chunks[0].start_jd,
+            start_jd__lte=chunks[-1].start_jd,
+    ).values_list('start_jd', 'end_jd'):
+        done[start_jd] = max(end_jd, done.get(start_jd, -math.inf))
+    return [
+        chunk for chunk in chunks
+        if done.get(chunk.start_jd, -math.inf) < chunk.end_jd
+    ]
+
+
+def parse_retention_tiers(tiers):
+    """
+    ``(age_days, bin_seconds)`` of ``AGE_DAYS:BIN_SECONDS`` strings
+
+    Sorted by age. Every bin size must be a whole multiple of the previous
+    one and divide a day, so chunks of all tiers share the day grid.
+    Raises ``ValueError`` for an invalid policy.
+    """
+    parsed = []
+    for tier in tiers:
+        age, sep, bin_seconds = str(tier).partition(':')
+        if not sep:
+            raise ValueError(f'Invalid retention tier {tier!r}; expected AGE_DAYS:BIN_SECONDS, e.g. 3:60')
+        parsed.append((float(age), float(bin_seconds)))
+    parsed.sort()
+    previous = None
+    for age, bin_seconds in parsed:
+        if age < 0 or bin_seconds <= 0 or SECONDS_PER_DAY % bin_seconds:
+            raise ValueError(f'Invalid retention tier {age:g}:{bin_seconds:g}')
+        if previous is not None and (bin_seconds <= previous or bin_seconds % previous):
+            raise ValueError('Retention bin sizes must grow by whole multiples with age')
+        previous = bin_seconds
+    return parsed
+
+
+def retention_bands(tiers, jd_current, first_jd):
+    """
+    ``(bin_seconds, start_jd, end_jd)`` the data of each tier covers, coarsest first
+
+    A band ends where the next finer tier starts; the coarsest one starts
+    at the oldest row. Merging coarsest first moves old data straight to
+    its final bin size.
+    """
+    bands = []
+    end_jd = None
+    for age, bin_seconds in reversed(tiers):
+        band_end = jd_current - age
+        band_start = first_jd if end_jd is None else end_jd
+        if band_start < band_end:
+            bands.append((bin_seconds, band_start, band_end))
+        end_jd = band_end
+    return bands
+
+
+@contextmanager
+def chunk_lock(chunk):
+    """
+    PostgreSQL advisory locks on the UTC days of a chunk
+
+    Yields whether all of them were taken. Merges of overlapping rows
+    (parallel workers, the cron, a backfill with another chunk size) then
+    skip the chunk instead of merging it twice. Session-level locks, so
+    they also cover the reads of the python engine before its
+    transaction. Without PostgreSQL it always yields ``True``.
+    """
+    if not is_postgresql():
+        yield True
+        return
+    days = range(
+        math.floor(chunk.start_jd - MERGE_EPOCH_JD),
+        math.ceil(chunk.end_jd - MERGE_EPOCH_JD),
+    )
+    taken = []
+    try:
+        with connection.cursor() as cursor:
+            for day in days:
+                cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', [ADVISORY_LOCK_CLASS, day])
+                if not cursor.fetchone()[0]:
+                    break
+                taken.append(day)
+        yield len(taken) == len(days)
+    finally:
+        with connection.cursor() as cursor:
+            for day in taken:
+                cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [ADVISORY_LOCK_CLASS, day])
+
+
+def _optional_float(value, default=None):
+    return float(value) if not np.isnan(value) else default
+
+
+def _merge_stats(binned, i):
+    stats = {}
+    for column in MERGE_AGGREGATES:
+        entry = {stat: _optional_float(binned[f'{column}:{stat}'][i]) for stat in MERGE_STATS}
+        entry['count'] = int(entry['count'] or 0)
+        stats[column] = entry
+    return stats
+
+
+def _merged_datasets(bin_start_jd, binned, bin_seconds):
+    # Use bin midpoint for new records (start + bin_size/2)
+    new_time_jd = bin_start_jd + bin_width_days(bin_seconds) / 2.0
+    instances = []
+    for i, new_jd in enumerate(new_time_jd):
+        # Convert JD midpoint to aware datetime (UTC)
+        dt_naive = Time(new_jd, format='jd').to_datetime()
+        dt_aware = (
+            timezone.make_aware(dt_naive, timezone=datetime.timezone.utc)
+            if timezone.is_naive(dt_naive) else dt_naive
+        )
+        values = {
+            column: _optional_float(binned[column][i])
+            for column in MERGE_AGGREGATES
+            if column not in _INTEGER_COLUMNS
+        }
+        values['rain'] = _optional_float(binned['rain'][i], 0.0)
+        values['is_raining'] = int(_optional_float(binned['is_raining'][i], 0))
+        for column in _INTEGER_COLUMNS:
+            value = binned[column][i]
+            values[column] = int(np.rint(value)) if not np.isnan(value) else 0
+        instances.append(Dataset(
+            jd=float(new_jd),
+            merged=True,
+            added_on=dt_aware,
+            merge_stats=_merge_stats(binned, i),
+            **values,
+        ))
+    return instances
+
+
+def _source_rows(chunk, include_merged=False):
+    rows = Dataset.objects.filter(jd__gte=chunk.start_jd, jd__lt=chunk.end_jd)
+    return rows if include_merged else rows.filter(merged=False)
+
+
+def _bin_chunk(chunk, bin_seconds, include_merged=False):
+    """Merged rows of a chunk binned in Python, and the highest primary key read."""
+    rows = list(
+        _source_rows(chunk, include_merged)
+        .order_by('jd')
+        .values_list('pk', 'merge_stats', 'jd', *MERGE_AGGREGATES)
+    )
+    if not rows:
+        return [], 0, None
+    merge_stats = [row[1] for row in rows]
+    merged = any(merge_stats)
+    data = np.array([row[2:] for row in rows], dtype=float)
+    columns = {}
+    for index, (column, how) in enumerate(MERGE_AGGREGATES.items(), start=1):
+        columns[column] = (data[:, index], how)
+        #   Re-merged rows pass on the statistics of their samples
+        per_row = (
+            row_stats(data[:, index], merge_stats, column)
+            if merged else raw_stats(data[:, index])
+        )
+        for stat, combine in MERGE_STATS_COMBINE.items():
+            columns[f'{column}:{stat}'] = (per_row[stat], combine)
+    bin_start_jd, binned = aggregate_bins(
+        data[:, 0], columns, bin_seconds, origin_jd=MERGE_EPOCH_JD,
+    )
+    return _merged_datasets(bin_start_jd, binned, bin_seconds), len(rows), max(row[0] for row in rows)
+
+
+def _sql_merge_statement(include_merged=False):
+    """
+    One statement that deletes the rows of a chunk and inserts their bins
+
+    The ``DELETE … RETURNING`` feeds the ``INSERT … SELECT … GROUP BY``, so
+    exactly the deleted rows are merged, also while uploads continue. The
+    ``merge_stats`` of the new rows combine those of re-merged rows.
+    Parameters: start JD, end JD, origin, bin width (twice), origin plus
+    half a bin, Unix epoch JD.
+    """
+    table = quote_ident(Dataset._meta.db_table)
+    source = '' if include_merged else ' AND NOT merged'
+    columns = ', '.join(quote_ident(column) for column in MERGE_AGGREGATES)
+    aggregates = []
+    for column, how in MERGE_AGGREGATES.items():
+        expression = aggregate_expression(column, how)
+        if column in _INTEGER_COLUMNS or column == 'is_raining':
+            expression = f'round({expression})::integer'
+        aggregates.append(f'{expression} AS {quote_ident(column)}')
+    stats = ', '.join(
+        f"'{column}', jsonb_build_object("
+        + ', '.join(f"'{stat}', {aggregate_expression(column, stat)}" for stat in MERGE_STATS)
+        + ')'
+        for column in MERGE_AGGREGATES
+    )
+    aggregates.append(f'jsonb_build_object({stats}) AS merge_stats')
+    select_list = ', '.join(aggregates)
+    # Identifiers are allowlisted/quoted; JDs and bin width are bound parameters.
+    return (
+        'WITH raw AS ('  # nosec B608
+        f' DELETE FROM {table} WHERE jd >= %s AND jd < %s{source}'
+        f' RETURNING jd, {columns}, merge_stats'
+        '), binned AS ('
+        f' SELECT floor((jd - %s) / %s) * %s + %s AS jd, {select_list}'
+        ' FROM raw GROUP BY 1'
+        '), written AS ('
+        f' INSERT INTO {table} (jd, {columns}, merge_stats, note, merged, added_on, last_modified)'
+        f" SELECT jd, {columns}, merge_stats, '', true, to_timestamp((jd - %s) * 86400.0), now()"
+        ' FROM binned RETURNING 1'
+        ') SELECT (SELECT count(*) FROM raw), (SELECT count(*) FROM written)'
+    )
+
+
+def _merge_chunk_sql(chunk, bin_seconds, include_merged=False):
+    width = bin_width_days(bin_seconds)
+    with connection.cursor() as cursor:
+        cursor.execute(_sql_merge_statement(include_merged), [
+            float(chunk.start_jd),
+            float(chunk.end_jd),
+            MERGE_EPOCH_JD,
+            width,
+            width,
+            MERGE_EPOCH_JD + width / 2.0,
+            # Unix epoch, for the added_on timestamp
+            ROLLUP_EPOCH_JD,
+        ])
+        rows_read, rows_written = cursor.fetchone()
+    return ChunkResult(rows_read=int(rows_read), rows_written=int(rows_written))
+
+
+def sql_merge_available():
+    return is_postgresql()
+
+
+def parallel_merge_available():
+    # SQLite takes one writer at a time; workers would only wait for it.
+    return is_postgresql()
+
+
+def merge_chunk(chunk, bin_seconds, dry_run=False, engine='auto', include_merged=False):
+    """
+    Merge the raw rows of one chunk
+
+    Raw rows are replaced by one merged row per bin, the rollups of the
+    chunk are refreshed and the checkpoint is stored, all in one
+    transaction. A chunk whose rows another merge holds (see
+    ``chunk_lock``) is skipped. With ``include_merged``, rows merged to a finer bin size
+    before are merged again (medians of their medians, sums of their sums).
+
+    Parameters
+    ----------
+    chunk               : `MergeChunk`
+        Bin-aligned JD range ``[start_jd, end_jd)``.
+
+    bin_seconds         : `float`
+        Bin width in seconds.
+
+    dry_run             : `bool`, optional
+        Bin the rows without writing anything.
+        Default is ``False``.
+
+    engine              : `string`, optional
+        ``'sql'`` merges with one set-based statement on PostgreSQL (no
+        rows pass through Python), ``'python'`` reads the rows and bins
+        them with NumPy; then only rows up to the highest primary key read
+        are deleted, so rows uploaded meanwhile are kept. ``'auto'`` uses
+        ``'sql'`` on PostgreSQL.
+        Default is ``'auto'``.
+
+    include_merged      : `bool`, optional
+        Also merge rows with ``merged=True``.
+        Default is ``False``.
+
+    Returns
+    -------
+    result              : `ChunkResult`
+        ``skipped`` if another merge held the chunk.
+    """
+    if engine == 'auto':
+        engine = 'sql' if sql_merge_available() else 'python'
+    if engine == 'sql' and not sql_merge_available():
+        raise ValueError('The sql merge engine requires PostgreSQL')
+
+    started = time.monotonic()
+    with chunk_lock(chunk) as locked:
+        if not locked:
+            logger.info(
+                'merge_chunk_locked bin_s=%g start_jd=%.5f end_jd=%.5f',
+                bin_seconds, chunk.start_jd, chunk.end_jd,
+            )
+            return ChunkResult(skipped=True)
+        result = _merge_chunk_locked(chunk, bin_seconds, dry_run, engine, include_merged)
+    logger.info(
+        'merge_chunk bin_s=%g start_jd=%.5f end_jd=%.5f engine=%s rows_read=%s '
+        'rows_written=%s duration_ms=%.0f dry_run=%s',
+        bin_seconds,
+        chunk.start_jd,
+        chunk.end_jd,
+        engine,
+        result.rows_read,
+        result.rows_written,
+        (time.monotonic() - started) * 1000,
+        dry_run,
+    )
+    return result
+
+
+def _merge_chunk_locked(chunk, bin_seconds, dry_run, engine, include_merged):
+    if engine == 'python' or dry_run:
+        instances, rows_read, max_pk = _bin_chunk(chunk, bin_seconds, include_merged)
+        result = ChunkResult(rows_read=rows_read, rows_written=len(instances))
+        if dry_run:
+            return result
+
+    with transaction.atomic():
+        if engine == 'sql':
+            result = _merge_chunk_sql(chunk, bin_seconds, include_merged)
+        elif instances:
+            Dataset.objects.bulk_create(instances, batch_size=1000)
+            _source_rows(chunk, include_merged).filter(pk__lte=max_pk).delete()
+        if result.rows_read:
+            # Plot rollups must describe the merged rows from now on
+            refresh_rollups(chunk.start_jd, chunk.end_jd)
+        MergeCheckpoint.objects.update_or_create(
+            bin_seconds=bin_seconds,
+            start_jd=chunk.start_jd,
+            defaults={
+                'end_jd': chunk.end_jd,
+                'rows_read': result.rows_read,
+                'rows_written': result.rows_written,
+            },
+        )
+    if result.rows_read:
+        # Cached plots of the merged chunk are stale now
+        bump_data_version(chunk.start_jd, chunk.end_jd)
+    return result
+
+
+def run_merge(chunks, bin_seconds, workers=1, **options):
+    """
+    Merge chunks one by one or in ``workers`` processes
+
+    Every worker process has its own database connection and merges one
+    chunk at a time (see ``merge_chunk``; ``options`` are passed on).
+    Chunks are disjoint, so workers never touch the same rows.
+
+    Yields
+    ------
+    chunk, result       : `MergeChunk`, `ChunkResult`
+        In the order of ``chunks``.
+    """
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield chunk, merge_chunk(chunk, bin_seconds, **options)
+        return
+
+    # Children set up Django before the chunks are unpickled (importing
+    # this module needs the app registry) and open their own connections.
+    connections.close_all()
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+    ) as executor:
+        futures = [
+            executor.submit(merge_chunk, chunk, bin_seconds, **options)
+            for chunk in chunks
+        ]
+        try:
+            for chunk, future in zip(chunks, futures):
+                yield chunk, future.result()
+        finally:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,76 @@
+"""
+Statistics stored with merged rows (``Dataset.merge_stats``).
+
+A merged row holds the median of its bin in the data columns and
+``{column: {'min', 'max', 'sum', 'count'}}`` of the samples behind it in
+``merge_stats``. Readers that combine rows (rollups, plot binning, the
+min/max envelope) take a row's statistics from there; a raw row, or a row
+merged before the statistics existed, is one sample with its value.
+"""
+
+import numpy as np
+
+MERGE_STATS = ('min', 'max', 'sum', 'count')
+
+#   How each statistic of several rows combines into one
+MERGE_STATS_COMBINE = {
+    'min': 'min',
+    'max': 'max',
+    'sum': 'sum',
+    'count': 'sum',
+}
+
+
+def raw_stats(values):
+    """
+    Per-row min, max, sum and sample count of rows that are all raw
+
+    Same result as ``row_stats`` when no row carries ``merge_stats``, without
+    looking at the rows one by one.
+    """
+    values = np.asarray(values, dtype=float)
+    return {
+        'min': values.copy(),
+        'max': values.copy(),
+        'sum': values.copy(),
+        'count': (~np.isnan(values)).astype(float),
+    }
+
+
+def row_stats(values, merge_stats, column):
+    """
+    Per-row min, max, sum and sample count of a column
+
+    Parameters
+    ----------
+    values              : array-like
+        Column values of the rows.
+
+    merge_stats         : `list` of `dict` or `None`
+        ``merge_stats`` of the same rows.
+
+    column              : `string`
+
+    Returns
+    -------
+    stats               : `dict` {`stat`: `numpy.ndarray`}
+        Missing values are NaN; an invalid raw value counts 0 samples.
+    """
+    stats = raw_stats(values)
+    for i, entry in enumerate(merge_stats):
+        entry = (entry or {}).get(column)
+        if not entry:
+            continue
+        for stat in MERGE_STATS:
+            value = entry.get(stat)
+            stats[stat][i] = np.nan if value is None else float(value)
+    return stats
+
+
+def row_means(values, merge_stats, column):
+    """Per-row sample means of a column and their sample counts (the weights)."""
+    stats = row_stats(values, merge_stats, column)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = stats['sum'] / stats['count']
+    means[stats['count'] == 0] = np.nan
+    return means, stats['count']
@@ -0,0 +1,33 @@
+# Generated manually for multi-resolution plot rollups.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datasets', '0007_upload_device_hmac_jd'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tier_seconds', models.PositiveIntegerField()),
+                ('bin_index', models.BigIntegerField()),
+                ('bin_jd', models.FloatField()),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('stats', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='datasetrollup',
+            index=models.Index(fields=['tier_seconds', 'bin_jd'], name='datasets_da_tier_se_5f1673_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='datasetrollup',
+            constraint=models.UniqueConstraint(fields=('tier_seconds', 'bin_index'), name='rollup_tier_bin_unique'),
+        ),
+    ]
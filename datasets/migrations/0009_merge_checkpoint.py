@@ -0,0 +1,33 @@
+# Generated manually for the chunked data merge.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datasets', '0008_dataset_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MergeCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bin_seconds', models.FloatField()),
+                ('start_jd', models.FloatField()),
+                ('end_jd', models.FloatField()),
+                ('rows_read', models.PositiveIntegerField(default=0)),
+                ('rows_written', models.PositiveIntegerField(default=0)),
+                ('completed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='mergecheckpoint',
+            index=models.Index(fields=['bin_seconds', 'end_jd'], name='datasets_me_bin_sec_32aa4c_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='mergecheckpoint',
+            constraint=models.UniqueConstraint(fields=('bin_seconds', 'start_jd'), name='merge_checkpoint_chunk_unique'),
+        ),
+    ]
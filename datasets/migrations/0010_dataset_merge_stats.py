@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datasets', '0009_merge_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='merge_stats',
+            field=models.JSONField(blank=True, default=None, null=True),
+        ),
+    ]
@@ -65,6 +65,10 @@ class Dataset(models.Model):
     #   Merged data?
     merged = models.BooleanField(default=False)
 
+    #   Merged rows: {column: {'min', 'max', 'sum', 'count'}} of the merged
+    #   samples (null: raw row; see datasets.merge_stats)
+    merge_stats = models.JSONField(null=True, blank=True, default=None)
+
     #   Bookkeeping
     added_on = models.DateTimeField(auto_now_add=True)
     last_modified = models.DateTimeField(auto_now=True)
@@ -132,3 +136,75 @@ class UploadSigningKey(models.Model):
 
     def __str__(self):
         return self.key_id
+
+
+class DatasetRollup(models.Model):
+    """
+        Pre-aggregated Dataset statistics for one fixed-width time bin.
+        Maintained by ``datasets.rollups`` and read for long plot ranges.
+    """
+    #   Bin width in seconds (one of datasets.rollups.ROLLUP_TIERS)
+    tier_seconds = models.PositiveIntegerField()
+
+    #   Bin number counted from the Unix epoch in units of tier_seconds
+    bin_index = models.BigIntegerField()
+
+    #   Julian date of the bin start
+    bin_jd = models.FloatField()
+
+    #   Number of Dataset rows in the bin
+    row_count = models.PositiveIntegerField(default=0)
+
+    #   {column: {'median', 'min', 'max', 'sum', 'count'}} (null: no valid value)
+    stats = models.JSONField(default=dict)
+
+    #   Bookkeeping
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tier_seconds', 'bin_jd']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tier_seconds', 'bin_index'],
+                name='rollup_tier_bin_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.tier_seconds}s #{self.bin_index}'
+
+
+class MergeCheckpoint(models.Model):
+    """
+        One chunk of the data merge that is done (see ``datasets.merge``).
+        Written in the transaction that merges the chunk.
+    """
+    #   Merge bin width in seconds
+    bin_seconds = models.FloatField()
+
+    #   Julian dates of the chunk [start_jd, end_jd), on bin edges
+    start_jd = models.FloatField()
+    end_jd = models.FloatField()
+
+    #   Raw rows replaced and merged rows written
+    rows_read = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+
+    #   Bookkeeping
+    completed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bin_seconds', 'end_jd']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['bin_seconds', 'start_jd'],
+                name='merge_checkpoint_chunk_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.bin_seconds:g}s [{self.start_jd}, {self.end_jd})'
@@ -1,11 +1,27 @@
 import hashlib
 import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
 
 from django.conf import settings
 from django.core.cache import cache
-from django.db.models import Count, Max
 
-from .models import Dataset
+from .data_versions import data_versions
+
+logger = logging.getLogger('weather.plots')
+
+#   Per-process rebuild locks, used only when the shared cache is unreachable
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+@dataclass
+class RebuildLock:
+    key: str
+    local_lock: Optional[threading.Lock] = None
 
 
 def plot_cache_enabled(*, time_resolution, fresh: bool) -> bool:
@@ -22,11 +38,9 @@ def compute_range_days(plot_range, start_dt=None, end_dt=None):
 
 
 def data_fingerprint(start_jd, end_jd):
-    return Dataset.objects.filter(jd__range=[start_jd, end_jd]).aggregate(
-        max_added_on=Max('added_on'),
-        max_pk=Max('pk'),
-        row_count=Count('id'),
-    )
+    """Data version tokens of the UTC days in the JD window (no row scan)."""
+    versions = data_versions(start_jd, end_jd)
+    return [versions[day] for day in sorted(versions)]
 
 
 def build_cache_key(
@@ -38,9 +52,14 @@ def build_cache_key(
         end_dt,
         time_resolution,
         plot_set,
-        fingerprint,
         cache_namespace,
+        downsample='',
 ):
+    """Key for one plot parameter set.
+
+    The data fingerprint is stored inside the entry instead of the key, so
+    the previous render stays available as a stale fallback after new data.
+    """
     if start_dt is not None and end_dt is not None:
         range_part = {'start_jd': start_jd, 'end_jd': end_jd}
     else:
@@ -50,8 +69,8 @@ def build_cache_key(
         **range_part,
         'time_resolution': float(time_resolution),
         'plot_set': sorted(plot_set),
+        'downsample': downsample,
         'timezone': getattr(settings, 'PLOT_DISPLAY_TIMEZONE', 'Europe/Berlin'),
-        'fp': fingerprint,
     }
     digest = hashlib.sha256(
         json.dumps(payload, sort_keys=True, default=str).encode()
@@ -60,9 +79,78 @@ def build_cache_key(
 
 
 def get_cached_plots(cache_key):
-    return cache.get(cache_key)
+    """Cached entry ``{'script', 'div', 'fingerprint', 'stored_at'}`` or None."""
+    entry = cache.get(cache_key)
+    return entry if isinstance(entry, dict) else None
+
+
+def store_cached_plots(cache_key, script, div, fingerprint=None):
+    """Store a render; it is served fresh for the soft TTL, stale until the hard TTL."""
+    entry = {
+        'script': script,
+        'div': div,
+        'fingerprint': fingerprint,
+        'stored_at': time.time(),
+    }
+    cache.set(cache_key, entry, plot_cache_hard_ttl())
+
+
+def plot_cache_hard_ttl():
+    soft_ttl = getattr(settings, 'PLOT_CACHE_TTL_SECONDS', 30)
+    return max(soft_ttl, getattr(settings, 'PLOT_CACHE_HARD_TTL_SECONDS', 300))
+
+
+def cache_entry_state(entry, fingerprint):
+    """``'hit'`` for a current entry within the soft TTL, ``'stale'`` otherwise."""
+    if entry is None:
+        return None
+    soft_ttl = getattr(settings, 'PLOT_CACHE_TTL_SECONDS', 30)
+    age = time.time() - entry.get('stored_at', 0)
+    if entry.get('fingerprint') == fingerprint and age < soft_ttl:
+        return 'hit'
+    return 'stale'
+
+
+def acquire_rebuild_lock(cache_key):
+    """
+    Single-flight lock for rebuilding ``cache_key``; None if already held.
+
+    Uses an atomic ``cache.add`` (Redis ``SET NX``). If the cache backend
+    fails, falls back to a lock shared by the threads of this process.
+    """
+    lock_key = f'{cache_key}:lock'
+    timeout = getattr(settings, 'PLOT_CACHE_LOCK_SECONDS', 60)
+    try:
+        if cache.add(lock_key, 1, timeout):
+            return RebuildLock(key=lock_key)
+        return None
+    except Exception:
+        logger.warning('plot_cache_lock_unavailable key=%s', lock_key)
+    with _local_locks_guard:
+        local_lock = _local_locks.setdefault(lock_key, threading.Lock())
+    if local_lock.acquire(blocking=False):
+        return RebuildLock(key=lock_key, local_lock=local_lock)
+    return None
+
+
+def release_rebuild_lock(lock):
+    if lock.local_lock is not None:
+        lock.local_lock.release()
+        with _local_locks_guard:
+            _local_locks.pop(lock.key, None)
+        return
+    try:
+        cache.delete(lock.key)
+    except Exception:
+        logger.warning('plot_cache_unlock_failed key=%s', lock.key)
 
 
-def store_cached_plots(cache_key, script, div):
-    ttl = getattr(settings, 'PLOT_CACHE_TTL_SECONDS', 30)
-    cache.set(cache_key, (script, div), ttl)
+def wait_for_cached_plots(cache_key, fingerprint):
+    """Poll for another worker's rebuild; returns a current entry or None."""
+    deadline = time.monotonic() + getattr(settings, 'PLOT_CACHE_LOCK_WAIT_SECONDS', 5)
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = get_cached_plots(cache_key)
+        if cache_entry_state(entry, fingerprint) == 'hit':
+            return entry
+    return None
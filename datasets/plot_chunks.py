@@ -0,0 +1,170 @@
+"""Bin-aligned chunk cache for binned plot series.
+
+Plot bins are aligned to the Unix epoch in units of ``time_resolution`` and
+grouped into chunks of ``PLOT_CHUNK_BINS`` bins. A chunk whose last bin ended
+more than ``PLOT_CHUNK_SETTLE_SECONDS`` ago is closed: its binned arrays are
+cached once and reused by every later request covering it, so a request only
+re-bins the still-open tail of its range. Chunk keys include the data
+version tokens of the days they cover, so late uploads, merges and admin
+edits invalidate exactly the affected chunks.
+"""
+
+import hashlib
+import math
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .binning import bin_indices, bin_width_days
+from .data_versions import data_versions, day_index
+from .rollups import ROLLUP_EPOCH_JD
+
+#   Bin 0 of every plot resolution starts at the Unix epoch (like the rollups)
+BIN_EPOCH_JD = ROLLUP_EPOCH_JD
+
+
+def chunk_bins():
+    return max(1, int(getattr(settings, 'PLOT_CHUNK_BINS', 64)))
+
+
+def chunk_key(source, columns, time_resolution, chunk_index, versions=()):
+    """Cache key of one chunk; ``versions`` are the data version tokens of its days."""
+    digest = hashlib.sha256(
+        ('|'.join(columns) + '#' + ','.join(str(v) for v in versions)).encode()
+    ).hexdigest()[:24]
+    return f'plot_chunk:{source}:{float(time_resolution):g}:{chunk_index}:{digest}'
+
+
+def _empty(columns):
+    return np.array([], dtype=np.int64), {
+        column: np.array([], dtype=float) for column in columns
+    }
+
+
+def _select(bin_index, binned, columns, first_bin, last_bin):
+    keep = (bin_index >= first_bin) & (bin_index <= last_bin)
+    return bin_index[keep], {column: binned[column][keep] for column in columns}
+
+
+def _fetch_indexed(fetch, lo_jd, hi_jd, width, columns):
+    bin_jd, binned = fetch(lo_jd, hi_jd)
+    bin_index = np.rint(
+        (np.asarray(bin_jd, dtype=float) - BIN_EPOCH_JD) / width
+    ).astype(np.int64)
+    return bin_index, {
+        column: np.asarray(binned[column], dtype=float) for column in columns
+    }
+
+
+def _runs(indices):
+    """Group sorted integers into inclusive ``(first, last)`` runs."""
+    runs = []
+    for index in indices:
+        if runs and index == runs[-1][1] + 1:
+            runs[-1][1] = index
+        else:
+            runs.append([index, index])
+    return runs
+
+
+def aligned_bins(start_jd, end_jd, time_resolution, columns, fetch, *, source, now_jd):
+    """
+    Epoch-aligned binned series for ``[start_jd, end_jd]`` from cached chunks.
+
+    Parameters
+    ----------
+    start_jd, end_jd    : `float`
+        Requested range. The first bin starts at or before ``start_jd``.
+
+    time_resolution     : `float`
+        Bin width in seconds.
+
+    columns             : `list` of `str`
+        Series to return; part of the chunk cache key.
+
+    fetch               : `callable`
+        ``fetch(lo_jd, hi_jd)`` bins all rows in ``[lo_jd, hi_jd]`` with
+        ``origin_jd=BIN_EPOCH_JD`` and returns ``(bin_jd, {column: values})``.
+
+    source              : `str`
+        Name of the data source behind ``fetch`` (part of the cache key, so
+        rollup-based and exact bins are never mixed).
+
+    now_jd              : `float`
+        Current time; chunks ending after ``now_jd - settle`` stay open.
+
+    Returns
+    -------
+    bin_jd              : `numpy.ndarray`
+        Start JD of every non-empty bin (ascending).
+
+    binned              : `dict` {`column`: `numpy.ndarray`}
+    """
+    width = bin_width_days(time_resolution)
+    n_bins = chunk_bins()
+    first_bin, last_bin = (
+        int(i) for i in bin_indices([start_jd, end_jd], time_resolution, BIN_EPOCH_JD)
+    )
+    settle_days = getattr(settings, 'PLOT_CHUNK_SETTLE_SECONDS', 300) / 86400.0
+    settled_bin = int(bin_indices([now_jd - settle_days], time_resolution, BIN_EPOCH_JD)[0])
+
+    first_chunk = first_bin // n_bins
+    # Chunk k is closed once all of its bins end before the settled bin.
+    last_closed = min(last_bin // n_bins, settled_bin // n_bins - 1)
+
+    keys = {}
+    if last_closed >= first_chunk:
+        chunk_width = n_bins * width
+        versions = data_versions(
+            BIN_EPOCH_JD + first_chunk * chunk_width,
+            BIN_EPOCH_JD + (last_closed + 1) * chunk_width,
+        )
+        for k in range(first_chunk, last_closed + 1):
+            # UTC days overlapping [chunk start, chunk end)
+            first_day = day_index(BIN_EPOCH_JD + k * chunk_width)
+            last_day = math.ceil((k + 1) * chunk_width) - 1
+            keys[k] = chunk_key(
+                source,
+                columns,
+                time_resolution,
+                k,
+                [versions.get(day) for day in range(first_day, last_day + 1)],
+            )
+    found = cache.get_many(list(keys.values())) if keys else {}
+    missing = [k for k, key in keys.items() if key not in found]
+
+    to_store = {}
+    for run_first, run_last in _runs(missing):
+        bin_index, binned = _fetch_indexed(
+            fetch,
+            BIN_EPOCH_JD + run_first * n_bins * width,
+            BIN_EPOCH_JD + (run_last + 1) * n_bins * width,
+            width,
+            columns,
+        )
+        for k in range(run_first, run_last + 1):
+            to_store[keys[k]] = _select(
+                bin_index, binned, columns, k * n_bins, (k + 1) * n_bins - 1,
+            )
+    if to_store:
+        cache.set_many(to_store, getattr(settings, 'PLOT_CHUNK_TTL_SECONDS', 21600))
+        found.update(to_store)
+
+    parts = [found[keys[k]] for k in range(first_chunk, last_closed + 1)]
+    tail_first_bin = max(first_bin, (last_closed + 1) * n_bins)
+    if tail_first_bin <= last_bin:
+        parts.append(_fetch_indexed(
+            fetch, BIN_EPOCH_JD + tail_first_bin * width, end_jd, width, columns,
+        ))
+
+    if not parts:
+        bin_index, binned = _empty(columns)
+    else:
+        bin_index = np.concatenate([part[0] for part in parts])
+        binned = {
+            column: np.concatenate([part[1][column] for part in parts])
+            for column in columns
+        }
+    bin_index, binned = _select(bin_index, binned, columns, first_bin, last_bin)
+    return BIN_EPOCH_JD + bin_index * width, binned
@@ -5,7 +5,9 @@ from django.db import connection
 
 import numpy as np
 
+from .binning import aggregate_bins
 from .models import Dataset
+from .rollups import ROLLUP_TIERS, load_tier, tier_bin_jd
 
 MEDIAN_COLUMNS = frozenset({
     'temperature',
@@ -26,6 +28,17 @@ AVG_COLUMNS = frozenset({'is_raining'})
 ALLOWED_COLUMNS = MEDIAN_COLUMNS | SUM_COLUMNS | AVG_COLUMNS
 
 
+def column_aggregate(column):
+    """Aggregate name (see ``datasets.binning``) matching the SQL binning."""
+    if column in SUM_COLUMNS:
+        return 'sum'
+    if column in AVG_COLUMNS:
+        return 'mean'
+    if column in MEDIAN_COLUMNS:
+        return 'median'
+    raise ValueError(f'Unsupported plot column for binning: {column}')
+
+
 def _to_sql_float(value):
     """Cast astropy/numpy JD scalars to plain float for psycopg2."""
     return float(value)
@@ -48,7 +61,73 @@ def should_use_postgres_binning(plot_range, start_dt=None, end_dt=None):
     return range_days(plot_range, start_dt, end_dt) > min_days
 
 
-def _quote_ident(name):
+def rollup_tier_for(time_resolution):
+    """Coarsest rollup tier (seconds) not wider than ``time_resolution``."""
+    eligible = [tier for tier in ROLLUP_TIERS if tier <= float(time_resolution)]
+    return max(eligible) if eligible else None
+
+
+def should_use_rollups(plot_range, time_resolution, start_dt=None, end_dt=None):
+    if not getattr(settings, 'PLOT_ROLLUPS_ENABLED', False):
+        return False
+    if rollup_tier_for(time_resolution) is None:
+        return False
+    min_days = getattr(settings, 'PLOT_ROLLUP_MIN_DAYS', 1.0)
+    return range_days(plot_range, start_dt, end_dt) > min_days
+
+
+def fetch_rollup_rows(start_jd, end_jd, time_resolution, columns, origin_jd=None):
+    """Like :func:`fetch_binned_rows`, but re-binned from the rollup tables.
+
+    Medians of the requested bins are medians of the tier medians; sums and
+    the ``is_raining`` mean are exact.
+    """
+    if not columns:
+        return np.array([])
+    for column in columns:
+        column_aggregate(column)
+
+    tier = rollup_tier_for(time_resolution)
+    if tier is None:
+        raise ValueError('time_resolution is finer than the finest rollup tier')
+
+    start_jd = _to_sql_float(start_jd)
+    end_jd = _to_sql_float(end_jd)
+    bin_index, _, stats = load_tier(tier, start_jd=start_jd, end_jd=end_jd)
+    if bin_index.size == 0:
+        return np.array([])
+    tier_jd = tier_bin_jd(tier, bin_index)
+
+    series = {}
+    for column in columns:
+        how = column_aggregate(column)
+        if how == 'mean':
+            series[f'{column}:sum'] = (stats[(column, 'sum')], 'sum')
+            series[f'{column}:count'] = (stats[(column, 'count')], 'sum')
+        else:
+            series[column] = (stats[(column, how)], how)
+    # Place each tier bin by its midpoint so shared edges cannot round across.
+    bin_jd, binned = aggregate_bins(
+        tier_jd + 0.5 * tier / 86400.0,
+        series,
+        time_resolution,
+        origin_jd=start_jd if origin_jd is None else _to_sql_float(origin_jd),
+    )
+
+    result = [bin_jd]
+    for column in columns:
+        if column_aggregate(column) == 'mean':
+            count = binned[f'{column}:count']
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = binned[f'{column}:sum'] / count
+            mean[count == 0] = np.nan
+            result.append(mean)
+        else:
+            result.append(binned[column])
+    return np.column_stack(result)
+
+
+def quote_ident(name):
     """Quote a table/column name. Names are never taken from request input."""
     ops = getattr(connection, 'ops', None)
     quote = getattr(ops, 'quote_name', None)
@@ -59,40 +138,76 @@ def _quote_ident(name):
     return name
 
 
-def _agg_expression(column):
+def merged_stat_expression(column, stat):
+    """
+    SQL per-row statistic of an allowlisted column
+
+    ``stat`` (min, max, sum or count) comes from ``merge_stats`` on merged
+    rows; a raw row is one sample with its value.
+    """
     if column not in ALLOWED_COLUMNS:
         raise ValueError(f'Unsupported plot column for binning: {column}')
-    ident = _quote_ident(column)
-    if column in MEDIAN_COLUMNS:
-        if column in {'pm1_0', 'pm2_5', 'pm10', 'uv_index'}:
+    fallback = '1' if stat == 'count' else f'{quote_ident(column)}::double precision'
+    return f"COALESCE((merge_stats -> '{column}' ->> '{stat}')::double precision, {fallback})"
+
+
+def aggregate_expression(column, how=None):
+    """
+    SQL aggregate of an allowlisted column
+
+    ``how`` is one of the ``datasets.binning`` aggregates; it defaults to
+    the one of the plot binning (``column_aggregate``). Everything but the
+    median combines the ``merge_stats`` of merged rows, so means are
+    weighted by sample count and min/max span the merged samples.
+    """
+    if column not in ALLOWED_COLUMNS:
+        raise ValueError(f'Unsupported plot column for binning: {column}')
+    if how is None:
+        how = column_aggregate(column)
+    ident = quote_ident(column)
+    if how == 'median':
+        if column in {'pm1_0', 'pm2_5', 'pm10', 'uv_index', 'is_raining'}:
             return (
                 'percentile_cont(0.5) WITHIN GROUP '
                 f'(ORDER BY {ident}::double precision)'
             )
         return f'percentile_cont(0.5) WITHIN GROUP (ORDER BY {ident})'
-    if column in SUM_COLUMNS:
-        return f'SUM({ident})'
-    return f'AVG({ident}::double precision)'
-
-
-def fetch_binned_rows(start_jd, end_jd, time_resolution, columns):
-    """Return binned rows as a numpy array (bin_jd + requested columns)."""
+    if how == 'sum':
+        return f'SUM({merged_stat_expression(column, "sum")})'
+    if how == 'mean':
+        return (
+            f'SUM({merged_stat_expression(column, "sum")})'
+            f' / NULLIF(SUM({merged_stat_expression(column, "count")}), 0)'
+        )
+    if how in ('min', 'max'):
+        return f'{how.upper()}({merged_stat_expression(column, how)})'
+    if how == 'count':
+        return f'SUM({merged_stat_expression(column, "count")})'
+    raise ValueError(f'Unsupported aggregate for {column}: {how}')
+
+
+def fetch_binned_rows(start_jd, end_jd, time_resolution, columns, origin_jd=None):
+    """Return binned rows as a numpy array (bin_jd + requested columns).
+
+    Bins start at ``origin_jd`` (default: ``start_jd``) plus whole bin widths.
+    """
     if not columns:
         return np.array([])
 
     start_jd = _to_sql_float(start_jd)
     end_jd = _to_sql_float(end_jd)
+    origin_jd = start_jd if origin_jd is None else _to_sql_float(origin_jd)
     bin_width = float(time_resolution) / 86400.0
     if bin_width <= 0:
         raise ValueError('time_resolution must be positive')
 
-    table = _quote_ident(Dataset._meta.db_table)
+    table = quote_ident(Dataset._meta.db_table)
     select_parts = [
         '(floor((jd - %s) / %s) * %s + %s)::double precision AS bin_jd',
     ]
-    params = [start_jd, bin_width, bin_width, start_jd]
+    params = [origin_jd, bin_width, bin_width, origin_jd]
     for column in columns:
-        select_parts.append(f'{_agg_expression(column)} AS {_quote_ident(column)}')
+        select_parts.append(f'{aggregate_expression(column)} AS {quote_ident(column)}')
 
     # Identifiers are allowlisted/quoted; JD bounds and bin width are bound parameters.
     sql = (
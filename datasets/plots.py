@@ -1,10 +1,13 @@
+import base64
 import datetime
-from datetime import timezone as dt_timezone
+import itertools
+import logging
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from dataclasses import dataclass, field
+from typing import Optional
 from zoneinfo import ZoneInfo
 
-import astropy.units as u
 from astropy.time import Time
-from astropy.timeseries import TimeSeries, aggregate_downsample
 
 import numpy as np
 
@@ -14,16 +17,40 @@ from bokeh.embed import components
 from bokeh.resources import Resources
 from django.conf import settings
 
+from .binning import aggregate_bins, bin_indices, bin_width_days
+from .downsample import BucketAccumulator, bucket_count
+from .local_time import jd_to_local_datetime64, tz_abbrev_at_jd
+from .merge_stats import raw_stats, row_means, row_stats
 from .models import Dataset
-from .plot_db import fetch_binned_rows, should_use_postgres_binning
+from .plot_db import (
+    column_aggregate,
+    fetch_binned_rows,
+    fetch_rollup_rows,
+    should_use_postgres_binning,
+    should_use_rollups,
+)
+from .plot_chunks import BIN_EPOCH_JD, aligned_bins
 from .plot_cache import (
+    acquire_rebuild_lock,
     build_cache_key,
+    cache_entry_state,
     data_fingerprint,
     get_cached_plots,
     plot_cache_enabled,
+    release_rebuild_lock,
     store_cached_plots,
+    wait_for_cached_plots,
+)
+from .render_pool import (
+    RenderPoolBusy,
+    render_deadline,
+    render_pool_enabled,
+    render_timeout,
+    submit_render,
+    time_left,
 )
 
+logger = logging.getLogger('weather.plots')
 
 # Constants
 WIND_ROTATIONS_TO_MPS = 0.14
@@ -32,6 +59,11 @@ WIND_ROTATIONS_TO_MPS = 0.14
 RAIN_TO_MM_PER_M2_FACTOR = 0.07534
 RAIN_FLAG_THRESHOLD = 0.5
 MAX_PLOT_ROWS = 500_000
+#   Raw rows per block in the shape-preserving downsampling modes
+DOWNSAMPLE_BLOCK_ROWS = 50_000
+#   since_jd cursors within this distance below a bin edge belong to that bin
+_CURSOR_SLACK_DAYS = 1e-6
+RENDER_BUSY_NOTE = 'The plots are being rendered, please reload in a moment.'
 # Bokeh JS is loaded once from templates/bokeh.html (local static files).
 BOKEH_RESOURCES = Resources(mode='inline', components=[])
 
@@ -96,27 +128,39 @@ def _plot_axis_label_from_series(dts):
     return f'Time [{first}]'
 
 
-def jd_array_to_local_dt(x_jd):
-    """Convert Julian dates to naive local wall-clock datetimes for Bokeh.
+def jd_array_to_local_datetime64(x_jd):
+    """Convert Julian dates to naive local wall-clock ``datetime64[ms]`` for Bokeh.
 
     Uses ``PLOT_DISPLAY_TIMEZONE``. Bokeh serializes timezone-aware datetimes
     (via numpy) as true UTC epoch ms, while ``DatetimeTickFormatter`` labels
     ticks in UTC. Passing civil time as *naive* datetimes makes tick labels
-    match local time, including DST transitions.
+    match local time, including DST transitions. Vectorized via the offset
+    table in ``datasets.local_time``.
     """
-    x_arr = np.atleast_1d(x_jd)
-    if x_arr.size == 0:
-        return np.array([], dtype=object)
-    datetimes = Time(x_arr, format='jd').datetime
-    if isinstance(datetimes, datetime.datetime):
-        datetimes = [datetimes]
-    else:
-        datetimes = np.atleast_1d(datetimes).ravel()
+    return jd_to_local_datetime64(x_jd, plot_display_tz())
+
+
+def jd_array_to_local_dt(x_jd):
+    """Naive local wall-clock ``datetime`` objects (see ``jd_array_to_local_datetime64``)."""
+    return jd_array_to_local_datetime64(x_jd).astype(object)
+
+
+def jd_array_to_local_epoch_ms(x_jd):
+    """Local wall-clock times as float milliseconds, Bokeh's datetime axis unit."""
+    return jd_array_to_local_datetime64(x_jd).astype(np.int64).astype(float)
+
+
+def _series_axis_label(x_jd):
+    """X-axis label of a JD series; ``Time [CET/CEST]`` if it spans a DST change."""
+    if x_jd is None or np.size(x_jd) == 0:
+        return _plot_axis_label_from_series(None)
+    x_jd = np.atleast_1d(x_jd)
     tz = plot_display_tz()
-    return np.array([
-        dt.replace(tzinfo=dt_timezone.utc).astimezone(tz).replace(tzinfo=None)
-        for dt in datetimes
-    ])
+    first = tz_abbrev_at_jd(x_jd[0], tz) or plot_display_timezone_name()
+    last = tz_abbrev_at_jd(x_jd[-1], tz) or plot_display_timezone_name()
+    if first != last:
+        return f'Time [{first}/{last}]'
+    return f'Time [{first}]'
 
 
 def _datetime_ticker():
@@ -210,6 +254,341 @@ def _jd_range(plot_range=1., start_dt=None, end_dt=None):
     return float(jd_current - float(plot_range)), float(jd_current)
 
 
+class _TooManyRows(Exception):
+    """Raw plot query exceeded ``MAX_PLOT_ROWS``."""
+
+    def __init__(self, row_count):
+        super().__init__(row_count)
+        self.row_count = row_count
+
+
+#   Series computed from two stored columns. Time bins subtract the binned
+#   medians on every source (raw rows, SQL, rollups), so closed chunks are
+#   interchangeable; the downsampling envelope uses per-sample differences.
+DERIVED_COLUMNS = {
+    'temp_sky_diff': ('temperature', 'sky_temp'),
+}
+
+
+def _stored_columns(columns):
+    """Model fields behind ``columns`` (derived columns expand to their inputs)."""
+    stored = []
+    for column in columns:
+        for name in DERIVED_COLUMNS.get(column, (column,)):
+            if name not in stored:
+                stored.append(name)
+    return stored
+
+
+def plot_downsample_points():
+    return max(2, int(getattr(settings, 'PLOT_DOWNSAMPLE_POINTS', 2000)))
+
+
+def _weighted_means(binned, names):
+    """Replace the ``name:sum``/``name:count`` bins of mean columns by the mean."""
+    for name in names:
+        count = binned.pop(f'{name}:count')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = binned.pop(f'{name}:sum') / count
+        mean[count == 0] = np.nan
+        binned[name] = mean
+    return binned
+
+
+def _downsampled_bins(columns, *, start_jd, end_jd, mode):
+    """
+        Reduce raw rows to the point budget with a shape-preserving mode.
+
+        Rows are streamed in blocks of ``DOWNSAMPLE_BLOCK_ROWS`` through a
+        ``datasets.downsample.BucketAccumulator``, so there is no row limit.
+        Merged rows add the min/max of their samples to the envelope and
+        weigh means by their sample count. Same return value as
+        ``_plot_bins``; ``mode`` is ``'minmax'`` or ``'lttb'``.
+    """
+    stored = _stored_columns(columns)
+    aggregates = {name: column_aggregate(name) for name in stored}
+    aggregates.update({
+        column: 'median' for column in DERIVED_COLUMNS if column in columns
+    })
+    accumulator = BucketAccumulator(
+        start_jd,
+        end_jd,
+        bucket_count(mode, plot_downsample_points()),
+        aggregates,
+    )
+    rows = (
+        Dataset.objects.filter(jd__range=[start_jd, end_jd])
+        .order_by('jd')
+        .values_list('jd', 'merge_stats', *stored)
+        .iterator(chunk_size=DOWNSAMPLE_BLOCK_ROWS)
+    )
+    while True:
+        block = list(itertools.islice(rows, DOWNSAMPLE_BLOCK_ROWS))
+        if not block:
+            break
+        merge_stats = [row[1] for row in block]
+        data = np.array([(row[0],) + row[2:] for row in block], dtype=float)
+        values = {name: data[:, i + 1] for i, name in enumerate(stored)}
+        for column, (left, right) in DERIVED_COLUMNS.items():
+            if column in columns:
+                values[column] = values[left] - values[right]
+        low, high, weights = {}, {}, {}
+        if any(merge_stats):
+            for name in stored:
+                if aggregates[name] == 'mean':
+                    values[name], weights[name] = row_means(values[name], merge_stats, name)
+                elif aggregates[name] != 'sum':
+                    per_row = row_stats(values[name], merge_stats, name)
+                    low[name], high[name] = per_row['min'], per_row['max']
+        accumulator.add(data[:, 0], values, low=low, high=high, weights=weights)
+
+    if mode == 'minmax':
+        slot_jd, series = accumulator.minmax()
+    else:
+        slot_jd, series = accumulator.lttb()
+    return slot_jd, {column: series[column] for column in columns}
+
+
+def _plot_bins(
+        columns,
+        *,
+        start_jd,
+        end_jd,
+        plot_range,
+        time_resolution,
+        start_dt=None,
+        end_dt=None,
+        chunk_cache=False,
+):
+    """
+        Bin plot series from the rollups, PostgreSQL or raw rows.
+
+        Bins are aligned to the epoch (``BIN_EPOCH_JD``), so full payloads
+        and deltas share one grid; with ``chunk_cache`` closed chunks come
+        from the cache (see ``datasets.plot_chunks``).
+
+        Returns
+        -------
+        bin_jd              : `numpy.ndarray`
+
+        binned              : `dict` {`column`: `numpy.ndarray`}
+
+        Raises ``_TooManyRows`` if raw rows exceed ``MAX_PLOT_ROWS``.
+    """
+    stored = _stored_columns(columns)
+
+    def from_binned_rows(data):
+        if data.size == 0:
+            return np.array([]), {column: np.array([]) for column in columns}
+        binned = {name: data[:, i + 1] for i, name in enumerate(stored)}
+        for column, (left, right) in DERIVED_COLUMNS.items():
+            if column in columns:
+                binned[column] = binned[left] - binned[right]
+        return data[:, 0], binned
+
+    if should_use_rollups(plot_range, time_resolution, start_dt, end_dt):
+        source = 'rollup'
+
+        def fetch(lo_jd, hi_jd, origin_jd):
+            return from_binned_rows(fetch_rollup_rows(
+                lo_jd, hi_jd, time_resolution, stored, origin_jd=origin_jd,
+            ))
+    elif should_use_postgres_binning(plot_range, start_dt, end_dt):
+        source = 'exact'
+
+        def fetch(lo_jd, hi_jd, origin_jd):
+            return from_binned_rows(fetch_binned_rows(
+                lo_jd, hi_jd, time_resolution, stored, origin_jd=origin_jd,
+            ))
+    else:
+        # Same medians/sums/means and derived differences as the SQL
+        # binning, so chunks share its key.
+        source = 'exact'
+
+        def fetch(lo_jd, hi_jd, origin_jd):
+            rows = list(
+                Dataset.objects.filter(jd__range=[lo_jd, hi_jd])
+                .order_by('jd')
+                .values_list('jd', 'merge_stats', *stored)[:MAX_PLOT_ROWS + 1]
+            )
+            if len(rows) > MAX_PLOT_ROWS:
+                raise _TooManyRows(len(rows))
+            if not rows:
+                return np.array([]), {column: np.array([]) for column in columns}
+            merge_stats = [row[1] for row in rows]
+            merged = any(merge_stats)
+            data = np.array([(row[0],) + row[2:] for row in rows], dtype=float)
+            values = {name: data[:, i + 1] for i, name in enumerate(stored)}
+            series = {}
+            means = []
+            for name in stored:
+                how = column_aggregate(name)
+                if how == 'mean':
+                    # Weighted by the sample counts of merged rows
+                    per_row = (
+                        row_stats(values[name], merge_stats, name)
+                        if merged else raw_stats(values[name])
+                    )
+                    series[f'{name}:sum'] = (per_row['sum'], 'sum')
+                    series[f'{name}:count'] = (per_row['count'], 'sum')
+                    means.append(name)
+                else:
+                    series[name] = (values[name], how)
+            bin_jd, binned = aggregate_bins(data[:, 0], series, time_resolution, origin_jd=origin_jd)
+            binned = _weighted_means(binned, means)
+            for column, (left, right) in DERIVED_COLUMNS.items():
+                if column in columns:
+                    binned[column] = binned[left] - binned[right]
+            return bin_jd, binned
+
+    if chunk_cache:
+        return aligned_bins(
+            start_jd,
+            end_jd,
+            time_resolution,
+            list(columns),
+            lambda lo_jd, hi_jd: fetch(lo_jd, hi_jd, BIN_EPOCH_JD),
+            source=source,
+            now_jd=Time(datetime.datetime.now(datetime.timezone.utc)).jd,
+        )
+    return fetch(start_jd, end_jd, BIN_EPOCH_JD)
+
+
+@dataclass
+class BinnedFrame:
+    """
+    Every plot series binned once, on one common bin axis
+
+    ``values`` holds one row per column, ``valid`` the matching finite-value
+    mask. A ``note`` replaces the data if the range had too many raw rows.
+    """
+    bin_jd: np.ndarray
+    columns: tuple
+    values: np.ndarray
+    note: Optional[str] = None
+    valid: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        self.valid = np.isfinite(self.values)
+
+    def __getitem__(self, column):
+        return self.values[self.columns.index(column)]
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def get(self, column, default=None):
+        return self[column] if column in self.columns else default
+
+    def is_valid(self, column):
+        return self.valid[self.columns.index(column)]
+
+    @property
+    def empty(self):
+        return self.bin_jd.size == 0
+
+
+def binned_frame(
+        plot_range=1.,
+        time_resolution=120.,
+        start_dt=None,
+        end_dt=None,
+        chunk_cache=False,
+        columns=None,
+        downsample='',
+):
+    """
+        Bin ``FRAME_COLUMNS`` (or ``columns``) for the plot range in one pass.
+
+        Main plots, additional plots and the plot data API all read this
+        frame. With ``chunk_cache`` they share the cached chunks, too, since
+        the column set (part of the chunk key) is the same.
+
+        ``downsample`` (``'minmax'`` or ``'lttb'``) replaces time bins with
+        ``PLOT_DOWNSAMPLE_POINTS`` shape-preserving points from raw rows.
+
+        Returns
+        -------
+        frame               : `BinnedFrame`
+    """
+    columns = tuple(FRAME_COLUMNS if columns is None else columns)
+    start_jd, end_jd = _jd_range(plot_range, start_dt, end_dt)
+    if downsample:
+        bin_jd, binned = _downsampled_bins(
+            list(columns), start_jd=start_jd, end_jd=end_jd, mode=downsample,
+        )
+        return _frame_from_bins(bin_jd, binned, columns)
+    try:
+        bin_jd, binned = _plot_bins(
+            list(columns),
+            start_jd=start_jd,
+            end_jd=end_jd,
+            plot_range=plot_range,
+            time_resolution=time_resolution,
+            start_dt=start_dt,
+            end_dt=end_dt,
+            chunk_cache=chunk_cache,
+        )
+    except _TooManyRows as exc:
+        return BinnedFrame(
+            bin_jd=np.array([]),
+            columns=columns,
+            values=np.empty((len(columns), 0)),
+            note=_plots_too_large_note(exc.row_count),
+        )
+    return _frame_from_bins(bin_jd, binned, columns)
+
+
+def _frame_from_bins(bin_jd, binned, columns):
+    values = np.empty((len(columns), len(bin_jd)))
+    for i, column in enumerate(columns):
+        values[i] = binned[column]
+    return BinnedFrame(bin_jd=np.asarray(bin_jd, dtype=float), columns=columns, values=values)
+
+
+def aligned_frame(first_bin, last_bin, time_resolution, plot_range=None, chunk_cache=False):
+    """
+        Bin ``FRAME_COLUMNS`` for epoch-aligned bins ``first_bin`` … ``last_bin``.
+
+        Bin ``i`` starts at ``BIN_EPOCH_JD + i * time_resolution`` (the grid
+        of the chunk cache), so bins line up across requests. ``plot_range``
+        (days) selects the data source like the full plot range does; it
+        defaults to the span of the bins.
+
+        Returns
+        -------
+        frame               : `BinnedFrame`
+    """
+    width = bin_width_days(time_resolution)
+    start_jd = BIN_EPOCH_JD + first_bin * width
+    end_jd = BIN_EPOCH_JD + (last_bin + 1) * width
+    columns = FRAME_COLUMNS
+    try:
+        bin_jd, binned = _plot_bins(
+            list(columns),
+            start_jd=start_jd,
+            end_jd=end_jd,
+            plot_range=end_jd - start_jd if plot_range is None else plot_range,
+            time_resolution=time_resolution,
+            chunk_cache=chunk_cache,
+        )
+    except _TooManyRows as exc:
+        return BinnedFrame(
+            bin_jd=np.array([]),
+            columns=columns,
+            values=np.empty((len(columns), 0)),
+            note=_plots_too_large_note(exc.row_count),
+        )
+    bin_jd = np.asarray(bin_jd, dtype=float)
+    index = np.rint((bin_jd - BIN_EPOCH_JD) / width).astype(np.int64)
+    keep = (index >= first_bin) & (index <= last_bin)
+    return _frame_from_bins(
+        bin_jd[keep],
+        {column: np.asarray(binned[column], dtype=float)[keep] for column in columns},
+        columns,
+    )
+
+
 MAIN_PLOT_IDENTIFIERS = [
     'temperature',
     'pressure',
@@ -226,17 +605,178 @@ ADDITIONAL_PLOT_IDENTIFIERS = [
     'uv_index',
 ]
 
+#   Columns binned for a plot range: main series, the rain sensor flag,
+#   additional series and the derived ambient - sky difference
+FRAME_COLUMNS = (
+    *MAIN_PLOT_IDENTIFIERS,
+    'is_raining',
+    *[column for column in ADDITIONAL_PG_COLUMNS if column not in MAIN_PLOT_IDENTIFIERS],
+    'temp_sky_diff',
+)
+
+#   Columns of the named ColumnDataSource behind each figure (besides 'x').
+#   The plot data API ships the same columns, so the dashboard can swap new
+#   data into the rendered figures without rebuilding them.
+PLOT_DATA_FIGURES = {
+    'main': {
+        'temperature': ('temperature',),
+        'pressure': ('pressure',),
+        'humidity': ('humidity',),
+        'illuminance': ('illuminance',),
+        'wind_speed': ('wind_speed',),
+        'rain': ('rain', 'rain_drizzle'),
+    },
+    'additional': {
+        'temp_combined': ('temperature', 'sky_temp', 'box_temp', 'dew_point'),
+        'temp_sky_diff': ('temp_sky_diff',),
+        'air_quality': ('pm1_0', 'pm2_5', 'pm10'),
+        'uv_index': ('uv_index',),
+    },
+}
+
+
+def plot_source_name(plot_set, figure_key):
+    """Name of the ColumnDataSource of one figure (looked up by dashboard.js)."""
+    return f'plot-data:{plot_set}:{figure_key}'
+
+
+def _plot_source(plot_set, figure_key, x_ms, series):
+    columns = PLOT_DATA_FIGURES[plot_set].get(figure_key, (figure_key,))
+    data = {'x': x_ms}
+    data.update({column: series[column] for column in columns})
+    return mpl.ColumnDataSource(data=data, name=plot_source_name(plot_set, figure_key))
+
+
+def _main_series(frame, y_identifier_list):
+    """Main plot columns of a `BinnedFrame` in display units (rain in mm/m², wind in m/s)."""
+    series = {}
+    for y_identifier in y_identifier_list:
+        y_data = frame[y_identifier]
+        if y_identifier == 'rain':
+            # Convert rain to mm/m^2
+            y_data = y_data * RAIN_TO_MM_PER_M2_FACTOR
+            # Drizzle: drop sensor flag (≥ threshold) AND no summed rain amount
+            drizzle_mask = np.zeros(y_data.shape, dtype=bool)
+            if 'is_raining' in frame:
+                flagged = frame.is_valid('is_raining')
+                drizzle_mask[flagged] = frame['is_raining'][flagged] >= RAIN_FLAG_THRESHOLD
+            drizzle_mask &= frame.is_valid('rain') & (y_data <= 0.0)
+            series['rain_drizzle'] = np.where(drizzle_mask, y_data, np.nan)
+        elif y_identifier == 'wind_speed':
+            #   Wind gust: convert rotation to m/s
+            y_data = y_data * WIND_ROTATIONS_TO_MPS
+        series[y_identifier] = y_data
+    return series
+
+
+def _dew_point(temperature, humidity):
+    """Dew point in °C (Magnus formula over water)."""
+    a = 17.62
+    b = 243.12
+    humi_safe = np.clip(humidity, 0.1, 100.0)
+    gamma = (a * temperature) / (b + temperature) + np.log(humi_safe / 100.0)
+    return (b * gamma) / (a - gamma)
+
+
+def _additional_series(frame):
+    """Additional plot columns of a `BinnedFrame`, including the derived dew point."""
+    series = {
+        column: frame[column]
+        for column in (*ADDITIONAL_PG_COLUMNS, 'temp_sky_diff')
+    }
+    series['dew_point'] = _dew_point(frame['temperature'], frame['humidity'])
+    return series
+
+
+def _bokeh_components(figs):
+    """Script and div dict of a figure dict; a ``'note'`` entry is passed through."""
+    note = figs.pop('note', None)
+    # wrap_script=False so templates/JS can attach a CSP nonce.
+    # Bokeh JS is loaded from templates/bokeh.html (local static files).
+    # Empty DB / note-only responses have no Bokeh models — skip components().
+    if figs:
+        script, div = components(figs, wrap_script=False)
+    else:
+        script, div = '', {}
+    if note is not None:
+        div['note'] = note
+    return script, div
+
+
+def _render_plot_set(cache_namespace, plot_kwargs):
+    """
+    Build and render the plot set of a cache namespace
+
+    Module level (not a closure) so the render pool can run it in a child
+    process.
+    """
+    if cache_namespace == 'main':
+        return _bokeh_components(main_plots('jd', MAIN_PLOT_IDENTIFIERS, **plot_kwargs))
+    if cache_namespace == 'additional':
+        return _bokeh_components(additional_plots(**plot_kwargs))
+    if cache_namespace.startswith('data:'):
+        return '', plot_data_payload(cache_namespace[len('data:'):], **plot_kwargs)
+    raise ValueError(f'Unknown plot cache namespace {cache_namespace!r}')
+
+
+def _render_busy_result(cache_namespace):
+    """Note-only result while no render worker is free and nothing is cached."""
+    if cache_namespace.startswith('data:'):
+        return '', {**_empty_payload(), 'note': RENDER_BUSY_NOTE}
+    return '', {'note': RENDER_BUSY_NOTE}
+
+
+def _render_in_pool(cache_namespace, plot_kwargs, *, lock, cache_key, fingerprint, wait):
+    """
+    Render in the process pool; ``None`` if no result arrived in time
+
+    The rebuild lock is released (and a late result still cached) when
+    the child process finishes, so a timed-out render is not started a
+    second time by the next request.
+    """
+    # One deadline for the wait for a free child and for the result
+    deadline = render_deadline()
+    try:
+        future = submit_render(
+            _render_plot_set, cache_namespace, plot_kwargs, wait=wait, deadline=deadline,
+        )
+    except RenderPoolBusy:
+        if lock is not None:
+            release_rebuild_lock(lock)
+        return None
+
+    def finish(done):
+        try:
+            if cache_key is not None and not done.cancelled() and done.exception() is None:
+                script, div = done.result()
+                store_cached_plots(cache_key, script, div, fingerprint)
+        except Exception:
+            logger.exception('plot_render_store_failed namespace=%s', cache_namespace)
+        finally:
+            if lock is not None:
+                release_rebuild_lock(lock)
+
+    future.add_done_callback(finish)
+    try:
+        return future.result(timeout=time_left(deadline))
+    except FuturesTimeoutError:
+        logger.warning(
+            'plot_render_timeout namespace=%s timeout_s=%s', cache_namespace, render_timeout(),
+        )
+        return None
+
 
 def _render_with_cache(
         *,
         cache_namespace,
         plot_identifiers,
-        build_figures,
         fresh=False,
+        refresh=False,
         plot_range=1.,
         time_resolution=120.,
         start_dt=None,
         end_dt=None,
+        downsample='',
         **kwargs,
 ):
     start_jd, end_jd = _jd_range(plot_range, start_dt, end_dt)
@@ -244,15 +784,25 @@ def _render_with_cache(
         time_resolution=time_resolution,
         fresh=fresh,
     )
-    meta = {'cache_hit': False, 'cache_enabled': use_cache}
+    meta = {
+        'cache_hit': False,
+        'cache_enabled': use_cache,
+        'cache_state': 'miss' if use_cache else 'bypass',
+    }
 
     plot_kwargs = {
         'plot_range': plot_range,
         'time_resolution': time_resolution,
         'start_dt': start_dt,
         'end_dt': end_dt,
+        'downsample': downsample,
+        # Closed time bins are reused across renders even when the
+        # rendered plots below have to be rebuilt.
+        'chunk_cache': use_cache,
     }
 
+    lock = None
+    cache_key = fingerprint = cached = None
     if use_cache:
         fingerprint = data_fingerprint(start_jd, end_jd)
         cache_key = build_cache_key(
@@ -263,28 +813,54 @@ def _render_with_cache(
             end_dt=end_dt,
             time_resolution=time_resolution,
             plot_set=plot_identifiers,
-            fingerprint=fingerprint,
             cache_namespace=cache_namespace,
+            downsample=downsample,
         )
         cached = get_cached_plots(cache_key)
+        state = cache_entry_state(cached, fingerprint)
+        # ``refresh`` (pre-warmer) re-renders even a current entry.
+        if state == 'hit' and not refresh:
+            meta.update(cache_hit=True, cache_state='hit')
+            return cached['script'], cached['div'], meta
+
+        # Single flight: one worker rebuilds, the others serve the old render.
+        lock = acquire_rebuild_lock(cache_key)
+        if lock is None:
+            if cached is None:
+                cached = wait_for_cached_plots(cache_key, fingerprint)
+                state = 'hit' if cached is not None else None
+            if cached is not None:
+                meta.update(cache_hit=True, cache_state=state)
+                return cached['script'], cached['div'], meta
+
+    # The pre-warmer is no request: it renders in its own process.
+    if render_pool_enabled() and not refresh:
+        # Busy pool: answer from the stale entry instead of queueing.
+        result = _render_in_pool(
+            cache_namespace,
+            plot_kwargs,
+            lock=lock,
+            cache_key=cache_key,
+            fingerprint=fingerprint,
+            wait=cached is None,
+        )
+        if result is not None:
+            return result[0], result[1], meta
         if cached is not None:
-            meta['cache_hit'] = True
-            return cached[0], cached[1], meta
+            meta.update(cache_hit=True, cache_state='stale')
+            return cached['script'], cached['div'], meta
+        meta['cache_state'] = 'busy'
+        script, div = _render_busy_result(cache_namespace)
+        return script, div, meta
 
-    figs = build_figures(**plot_kwargs)
-    note = figs.pop('note', None)
-    # wrap_script=False so templates/JS can attach a CSP nonce.
-    # Bokeh JS is loaded from templates/bokeh.html (local static files).
-    # Empty DB / note-only responses have no Bokeh models — skip components().
-    if figs:
-        script, div = components(figs, wrap_script=False)
-    else:
-        script, div = '', {}
-    if note is not None:
-        div['note'] = note
+    try:
+        script, div = _render_plot_set(cache_namespace, plot_kwargs)
 
-    if use_cache:
-        store_cached_plots(cache_key, script, div)
+        if use_cache:
+            store_cached_plots(cache_key, script, div, fingerprint)
+    finally:
+        if lock is not None:
+            release_rebuild_lock(lock)
 
     return script, div, meta
 
@@ -295,6 +871,9 @@ def main_plots(
         time_resolution=120.,
         start_dt=None,
         end_dt=None,
+        chunk_cache=False,
+        downsample='',
+        frame=None,
         **_unused,
     ):
     """
@@ -317,52 +896,41 @@ def main_plots(
             accordingly.
             Default is ``60``.
 
+        chunk_cache         : `boolean`, optional
+            Reuse cached, epoch-aligned chunks of closed bins.
+            Default is ``False``.
+
+        downsample          : `string`, optional
+            ``'minmax'`` or ``'lttb'`` to plot shape-preserving points
+            from raw rows instead of time bins.
+            Default is ``''``.
+
+        frame               : `BinnedFrame`, optional
+            Already binned series; binned from the range if not given.
+            Default is ``None``.
+
         Returns
         -------
         fig_dict            : `dictionary` {`y_identifier`:`bokeh.plotting.figure`}
             Figure dictionary
     """
-    start_jd, end_jd = _jd_range(plot_range, start_dt, end_dt)
-
-    #   Get requested range of data (include is_raining once if rain is requested)
-    include_flags = 'rain' in y_identifier_list
-    base_fields = [x_identifier, *y_identifier_list]
-    if include_flags:
-        base_fields.append('is_raining')
-
-    pre_binned = False
-    if should_use_postgres_binning(plot_range, start_dt, end_dt):
-        pg_columns = list(y_identifier_list)
-        if include_flags and 'is_raining' not in pg_columns:
-            pg_columns.append('is_raining')
-        data = fetch_binned_rows(start_jd, end_jd, time_resolution, pg_columns)
-        pre_binned = data.size > 0
-    else:
-        rows = list(
-            Dataset.objects.filter(jd__range=[start_jd, end_jd])
-            .order_by('jd')
-            .values_list(*base_fields)[:MAX_PLOT_ROWS + 1]
+    if frame is None:
+        frame = binned_frame(
+            plot_range=plot_range,
+            time_resolution=time_resolution,
+            start_dt=start_dt,
+            end_dt=end_dt,
+            chunk_cache=chunk_cache,
+            downsample=downsample,
         )
-        if len(rows) > MAX_PLOT_ROWS:
-            fig_dict = {
-                y_identifier: _empty_plot(y_identifier, x_identifier)
-                for y_identifier in y_identifier_list
-            }
-            fig_dict['note'] = _plots_too_large_note(len(rows))
-            return fig_dict
-        data = np.array(rows) if rows else np.array([])
-
-    #   Verify that data was returned
-    if data.size == 0:
-        no_data = True
-        x_data_original = None
-        flag_series_raw = None
-    else:
-        no_data = False
-        x_data_original = data[:, 0]
-        flag_series_raw = None
-        if include_flags:
-            flag_series_raw = data[:, len(y_identifier_list) + 1]
+    if frame.note is not None:
+        fig_dict = {
+            y_identifier: _empty_plot(y_identifier, x_identifier)
+            for y_identifier in y_identifier_list
+        }
+        fig_dict['note'] = frame.note
+        return fig_dict
+    bin_jd = frame.bin_jd
 
     #   Set Y range - use extrema or data range
     # y_range_extrema = {
@@ -377,90 +945,19 @@ def main_plots(
     #   Figure dictionary
     fig_dict = {}
 
-    #   Make time series
-    for i, y_identifier in enumerate(y_identifier_list):
-        if no_data:
-            x_data = y_data = data
-        else:
-            time_series = TimeSeries(
-                time=Time(x_data_original, format='jd'),
-                data={'data': data[:, i + 1]}
-            )
-
-            #   Binned time series (skip Python downsample when PostgreSQL already binned)
-            if pre_binned:
-                x_data = x_data_original
-                y_data = data[:, i + 1]
-                if y_identifier == 'rain':
-                    y_data = y_data * RAIN_TO_MM_PER_M2_FACTOR
-                    flag_data = flag_series_raw
-                elif y_identifier == 'wind_speed':
-                    y_data = y_data * WIND_ROTATIONS_TO_MPS
-            elif len(time_series) > 1:
-                if y_identifier == 'rain':
-                    # Use already-fetched aligned data and downsample in-memory (single DB query overall)
-                    y_series_raw = data[:, i + 1]
-                    ts_rain = TimeSeries(
-                        time=Time(x_data_original, format='jd'),
-                        data={'rain': y_series_raw}
-                    )
-                    # Flag series may be None on legacy schemas
-                    if flag_series_raw is not None:
-                        ts_flag = TimeSeries(
-                            time=Time(x_data_original, format='jd'),
-                            data={'is_raining': flag_series_raw}
-                        )
-                    else:
-                        ts_flag = None
-
-                    ts_rain_sum = aggregate_downsample(
-                        ts_rain,
-                        time_bin_size=float(time_resolution) * u.s,
-                        aggregate_func=np.nansum,
-                    )
-                    x_data = ts_rain_sum['time_bin_start'].value
-                    y_data = ts_rain_sum['rain'].value
-
-                    if ts_flag is not None:
-                        ts_flag_mean = aggregate_downsample(
-                            ts_flag,
-                            time_bin_size=float(time_resolution) * u.s,
-                            aggregate_func=np.nanmean,
-                        )
-                        flag_data = ts_flag_mean['is_raining'].value
-                    else:
-                        flag_data = np.zeros_like(y_data)
-
-                    # Convert rain to mm/m^2 (see note below)
-                    y_data = y_data * RAIN_TO_MM_PER_M2_FACTOR
-
-                    # Apply mask
-                    mask_local = np.invert(y_data.mask) if hasattr(y_data, 'mask') else np.ones_like(y_data, dtype=bool)
-                    if hasattr(flag_data, 'mask'):
-                        mask_local = mask_local & np.invert(flag_data.mask)
-                    x_data = x_data[mask_local]
-                    y_data = y_data[mask_local]
-                    flag_data = flag_data[mask_local]
-                else:
-                    time_series_average = aggregate_downsample(
-                        time_series,
-                        time_bin_size=float(time_resolution) * u.s,
-                        aggregate_func=np.nanmedian,
-                    )
-                    x_data = time_series_average['time_bin_start'].value
-
-                    y_data = time_series_average['data'].value
+    series = _main_series(frame, y_identifier_list)
+    if x_identifier == 'jd':
+        #   Local wall-clock epoch ms (see ``jd_array_to_local_datetime64``)
+        x_data = jd_array_to_local_epoch_ms(bin_jd)
+        x_label = _series_axis_label(bin_jd)
+    else:
+        x_data = bin_jd
+        x_label = 'Date'
 
-                #   Wind gust: convert rotation to m/s
-                if y_identifier == 'wind_speed':
-                    y_data = y_data * WIND_ROTATIONS_TO_MPS
-                # Robust mask handling (works for masked and plain ndarrays)
-                mask = np.invert(y_data.mask) if hasattr(y_data, 'mask') else np.ones_like(y_data, dtype=bool)
-                x_data = x_data[mask]
-                y_data = y_data[mask]
-            else:
-                x_data = x_data_original
-                y_data = data[:, i + 1]
+    #   Make time series
+    for y_identifier in y_identifier_list:
+        y_data = series[y_identifier]
+        source = _plot_source('main', y_identifier, x_data, series)
 
         #   Tools attached to the figure
         tools = [
@@ -495,37 +992,26 @@ def main_plots(
             # y_range=y_range,
         )
 
-        #   Convert JD to datetime object and set x-axis ticker/formatter
+        #   Set datetime x-axis ticker/formatter
         if x_identifier == 'jd':
-            x_data = jd_array_to_local_dt(x_data)
-            x_label = _plot_axis_label_from_series(x_data)
             _configure_datetime_xaxis(fig, axis_label=x_label)
-        else:
-            x_label = 'Date'
 
         #   Plot data
         if y_identifier in ['temperature', 'pressure', 'humidity']:
             fig.line(
-                x_data,
-                y_data,
+                'x',
+                y_identifier,
+                source=source,
                 line_width=2,
                 color="powderblue",
             )
 
-        if y_identifier == 'rain' and 'flag_data' in locals():
-            # Split points by rain drop sensor flag (≥ threshold) AND only mark when summed rain == 0 (drizzle)
-            try:
-                flagged_raw = flag_data.astype(float) >= RAIN_FLAG_THRESHOLD
-            except Exception:
-                flagged_raw = np.zeros_like(y_data, dtype=bool)
-
-            # Only highlight bins with drop sensor ≥ threshold and no measured rain amount
-            drizzle_mask = flagged_raw & (y_data <= 0.0)
-
+        if y_identifier == 'rain' and bin_jd.size:
             # Base rain points (all), styled in subtle blue
             cr_no = fig.scatter(
-                x_data,
-                y_data,
+                'x',
+                'rain',
+                source=source,
                 color='powderblue',
                 fill_alpha=0.3,
                 line_alpha=0.3,
@@ -537,11 +1023,13 @@ def main_plots(
                 legend_label='Rain'
             )
 
-            # Drizzle overlay (subtle blue accent), only if any
-            if np.any(drizzle_mask):
+            # Drizzle overlay (subtle blue accent), only if any; NaN
+            # marks bins without drizzle, so new data can reuse the source.
+            if np.any(np.isfinite(series['rain_drizzle'])):
                 cr_yes = fig.scatter(
-                    x_data[drizzle_mask],
-                    y_data[drizzle_mask],
+                    'x',
+                    'rain_drizzle',
+                    source=source,
                     color='#B2B0E8',  
                     fill_alpha=0.7,
                     line_alpha=0.7,
@@ -570,8 +1058,9 @@ def main_plots(
             cr = cr_no
         else:
             cr = fig.scatter(
-                x_data,
-                y_data,
+                'x',
+                y_identifier,
+                source=source,
                 color='powderblue',
                 fill_alpha=0.3,
                 line_alpha=0.3,
@@ -636,73 +1125,45 @@ def main_plots(
     return fig_dict
 
 
-def additional_plots(plot_range=1., time_resolution=120., start_dt=None, end_dt=None):
+def additional_plots(
+        plot_range=1.,
+        time_resolution=120.,
+        start_dt=None,
+        end_dt=None,
+        chunk_cache=False,
+        downsample='',
+        frame=None,
+):
     """
         Create additional plots that are hidden by default on the dashboard.
 
         - Combined temperature plot: ambient, sky_temp, box_temp
         - Temperature difference plot: (ambient - sky_temp)
-    """
-    start_jd, end_jd = _jd_range(plot_range, start_dt, end_dt)
 
-    pre_binned = False
-    if should_use_postgres_binning(plot_range, start_dt, end_dt):
-        data = fetch_binned_rows(
-            start_jd, end_jd, time_resolution, ADDITIONAL_PG_COLUMNS,
-        )
-        pre_binned = data.size > 0
-    else:
-        rows = list(
-            Dataset.objects.filter(jd__range=[start_jd, end_jd])
-            .order_by('jd')
-            .values_list(
-                'jd', *ADDITIONAL_PG_COLUMNS,
-            )[:MAX_PLOT_ROWS + 1]
+        ``frame`` is an already binned `BinnedFrame`; by default the range
+        is binned here (``downsample`` as in ``main_plots``).
+    """
+    if frame is None:
+        frame = binned_frame(
+            plot_range=plot_range,
+            time_resolution=time_resolution,
+            start_dt=start_dt,
+            end_dt=end_dt,
+            chunk_cache=chunk_cache,
+            downsample=downsample,
         )
-        figs = {}
-        if len(rows) > MAX_PLOT_ROWS:
-            figs['note'] = _plots_too_large_note(len(rows))
-            return figs
-        data = np.array(rows) if rows else np.array([])
-
     figs = {}
-    if data.size == 0:
+    if frame.note is not None:
+        figs['note'] = frame.note
         return figs
 
-    jd_vals = data[:, 0]
-    temp_vals = data[:, 1]
-    humi_vals = data[:, 2]
-    sky_vals = data[:, 3]
-    box_vals = data[:, 4]
-
-    #   Helper to bin a single series
-    def bin_series(x_jd, y_values, agg_func):
-        if pre_binned:
-            return x_jd, y_values
-        ts = TimeSeries(time=Time(x_jd, format='jd'), data={'data': y_values})
-        if len(ts) > 1:
-            ts_binned = aggregate_downsample(
-                ts,
-                time_bin_size=float(time_resolution) * u.s,
-                aggregate_func=agg_func,
-            )
-            x_binned = ts_binned['time_bin_start'].value
-            y_binned = ts_binned['data'].value
-            mask = np.invert(y_binned.mask)
-            return x_binned[mask], y_binned[mask]
-        return x_jd, y_values
-
-    #   Bin series (median for temps)
-    x_t, y_temp = bin_series(jd_vals, temp_vals, np.nanmedian)
-    x_h, y_humi = bin_series(jd_vals, humi_vals, np.nanmedian)
-    x_s, y_sky = bin_series(jd_vals, sky_vals, np.nanmedian)
-    x_b, y_box = bin_series(jd_vals, box_vals, np.nanmedian)
-
-    #   Convert x to localized datetimes for plotting
-    x_t_dt = jd_array_to_local_dt(x_t)
-    x_h_dt = jd_array_to_local_dt(x_h)
-    x_s_dt = jd_array_to_local_dt(x_s)
-    x_b_dt = jd_array_to_local_dt(x_b)
+    if frame.empty:
+        return figs
+
+    x_binned = frame.bin_jd
+    series = _additional_series(frame)
+    x_ms = jd_array_to_local_epoch_ms(x_binned)
+    x_label = _series_axis_label(x_binned)
 
     #   Combined temperature plot
     tools = [
@@ -717,30 +1178,14 @@ def additional_plots(plot_range=1., time_resolution=120., start_dt=None, end_dt=
     sky_color = "#FF7043"      # orange
     box_color = "#BDBDBD"      # grey (less prominent)
 
-    fig_temp.line(x_t_dt, y_temp, line_width=2, color=ambient_color, legend_label='Ambient')
-    fig_temp.line(x_s_dt, y_sky, line_width=2, color=sky_color, legend_label='Sky')
-    fig_temp.line(x_b_dt, y_box, line_width=1, color=box_color, alpha=0.8, legend_label='Box')
-
-    #   Dew point (computed from temperature and humidity)
-    def align_series(x1, y1, x2, y2):
-        if len(x1) == len(x2) and np.allclose(x1, x2, equal_nan=False):
-            return x1, y1, y2
-        common, idx1, idx2 = np.intersect1d(x1, x2, assume_unique=False, return_indices=True)
-        return common, y1[idx1], y2[idx2]
-
-    x_common, temp_common, humi_common = align_series(x_t, y_temp, x_h, y_humi)
-    if len(x_common):
-        # Magnus formula (over water)
-        a = 17.62
-        b = 243.12
-        humi_safe = np.clip(humi_common, 0.1, 100.0)
-        gamma = (a * temp_common) / (b + temp_common) + np.log(humi_safe / 100.0)
-        dew_point = (b * gamma) / (a - gamma)
-        x_dp_dt = jd_array_to_local_dt(x_common)
-        fig_temp.line(x_dp_dt, dew_point, line_width=2, color="#80DEEA", line_dash="dashed", legend_label='Dew point')
+    source = _plot_source('additional', 'temp_combined', x_ms, series)
+    fig_temp.line('x', 'temperature', source=source, line_width=2, color=ambient_color, legend_label='Ambient')
+    fig_temp.line('x', 'sky_temp', source=source, line_width=2, color=sky_color, legend_label='Sky')
+    fig_temp.line('x', 'box_temp', source=source, line_width=1, color=box_color, alpha=0.8, legend_label='Box')
+    fig_temp.line('x', 'dew_point', source=source, line_width=2, color="#80DEEA", line_dash="dashed", legend_label='Dew point')
 
     #   Axis/formatting
-    _configure_datetime_xaxis(fig_temp, axis_label=_plot_axis_label_from_series(x_t_dt))
+    _configure_datetime_xaxis(fig_temp, axis_label=x_label)
     fig_temp.yaxis.axis_label = 'Temperature [°C]'
     fig_temp.toolbar.active_drag = None
     fig_temp.toolbar.logo = None
@@ -772,14 +1217,12 @@ def additional_plots(plot_range=1., time_resolution=120., start_dt=None, end_dt=
     figs['temp_combined'] = fig_temp
 
     #   Difference plot (ambient - sky)
-    x_d, y_d = bin_series(jd_vals, (temp_vals - sky_vals), np.nanmedian)
-    x_d_dt = jd_array_to_local_dt(x_d)
-
     fig_diff = bpl.figure(
         sizing_mode='scale_width', aspect_ratio=2, tools=tools,
     )
-    fig_diff.line(x_d_dt, y_d, line_width=2, color="#66BB6A")
-    _configure_datetime_xaxis(fig_diff, axis_label=_plot_axis_label_from_series(x_d_dt))
+    source = _plot_source('additional', 'temp_sky_diff', x_ms, series)
+    fig_diff.line('x', 'temp_sky_diff', source=source, line_width=2, color="#66BB6A")
+    _configure_datetime_xaxis(fig_diff, axis_label=x_label)
     fig_diff.yaxis.axis_label = 'Ambient - Sky [°C]'
     fig_diff.toolbar.active_drag = None
     fig_diff.toolbar.logo = None
@@ -803,20 +1246,7 @@ def additional_plots(plot_range=1., time_resolution=120., start_dt=None, end_dt=
 
     figs['temp_sky_diff'] = fig_diff
 
-    if data.size:
-        jd_aq = data[:, 0]
-        pm1_vals = data[:, 5]
-        pm25_vals = data[:, 6]
-        pm10_vals = data[:, 7]
-
-        x_1, y_pm1 = bin_series(jd_aq, pm1_vals, np.nanmedian)
-        x_25, y_pm25 = bin_series(jd_aq, pm25_vals, np.nanmedian)
-        x_10, y_pm10 = bin_series(jd_aq, pm10_vals, np.nanmedian)
-
-        x_1_dt = jd_array_to_local_dt(x_1)
-        x_25_dt = jd_array_to_local_dt(x_25)
-        x_10_dt = jd_array_to_local_dt(x_10)
-
+    if x_binned.size:
         tools_aq = [mpl.PanTool(), mpl.WheelZoomTool(), mpl.BoxZoomTool(), mpl.ResetTool()]
         fig_aq = bpl.figure(
             sizing_mode='scale_width', aspect_ratio=2, tools=tools_aq,
@@ -826,12 +1256,13 @@ def additional_plots(plot_range=1., time_resolution=120., start_dt=None, end_dt=
         pm25_color = "#FFB74D"   # orange
         pm10_color = "#4DD0E1"   # teal
 
-        fig_aq.line(x_1_dt, y_pm1, line_width=2, color=pm1_color, legend_label='PM1.0 [ug/m3]')
-        fig_aq.line(x_25_dt, y_pm25, line_width=2, color=pm25_color, legend_label='PM2.5 [ug/m3]')
-        fig_aq.line(x_10_dt, y_pm10, line_width=2, color=pm10_color, legend_label='PM10 [ug/m3]')
+        source = _plot_source('additional', 'air_quality', x_ms, series)
+        fig_aq.line('x', 'pm1_0', source=source, line_width=2, color=pm1_color, legend_label='PM1.0 [ug/m3]')
+        fig_aq.line('x', 'pm2_5', source=source, line_width=2, color=pm25_color, legend_label='PM2.5 [ug/m3]')
+        fig_aq.line('x', 'pm10', source=source, line_width=2, color=pm10_color, legend_label='PM10 [ug/m3]')
 
         # Formatting
-        _configure_datetime_xaxis(fig_aq, axis_label=_plot_axis_label_from_series(x_1_dt))
+        _configure_datetime_xaxis(fig_aq, axis_label=x_label)
         if fig_aq.yaxis:
             fig_aq.yaxis[0].axis_label = 'Particulate Matter [ug/m3]'
         fig_aq.toolbar.active_drag = None
@@ -862,15 +1293,12 @@ def additional_plots(plot_range=1., time_resolution=120., start_dt=None, end_dt=
 
         figs['air_quality'] = fig_aq
 
-        uv_vals = data[:, 8]
-        x_uv, y_uv = bin_series(jd_aq, uv_vals, np.nanmedian)
-        x_uv_dt = jd_array_to_local_dt(x_uv)
-
         fig_uv = bpl.figure(
             sizing_mode='scale_width', aspect_ratio=2, tools=tools_aq,
         )
-        fig_uv.line(x_uv_dt, y_uv, line_width=2, color="#FFD54F", legend_label='UV Index')
-        _configure_datetime_xaxis(fig_uv, axis_label=_plot_axis_label_from_series(x_uv_dt))
+        source = _plot_source('additional', 'uv_index', x_ms, series)
+        fig_uv.line('x', 'uv_index', source=source, line_width=2, color="#FFD54F", legend_label='UV Index')
+        _configure_datetime_xaxis(fig_uv, axis_label=x_label)
         if fig_uv.yaxis:
             fig_uv.yaxis[0].axis_label = 'UV Index'
         fig_uv.toolbar.active_drag = None
@@ -904,33 +1332,189 @@ def additional_plots(plot_range=1., time_resolution=120., start_dt=None, end_dt=
     return figs
 
 
-def default_plots(*, fresh=False, **kwargs):
+def default_plots(*, fresh=False, refresh=False, **kwargs):
     """
     Render main dashboard plots (Bokeh script + div dict).
 
-    Additional plots are loaded lazily via the API endpoint.
+    Additional plots are loaded lazily via the API endpoint. ``refresh``
+    re-renders and stores the cache entry even if it is still fresh.
     """
-    def build_figures(**plot_kwargs):
-        return main_plots('jd', MAIN_PLOT_IDENTIFIERS, **plot_kwargs)
-
     return _render_with_cache(
         cache_namespace='main',
         plot_identifiers=MAIN_PLOT_IDENTIFIERS,
-        build_figures=build_figures,
         fresh=fresh,
+        refresh=refresh,
         **kwargs,
     )
 
 
-def additional_plots_components(*, fresh=False, **kwargs):
+def additional_plots_components(*, fresh=False, refresh=False, **kwargs):
     """Render additional dashboard plots (lazy-loaded in the UI)."""
-    def build_figures(**plot_kwargs):
-        return additional_plots(**plot_kwargs)
-
     return _render_with_cache(
         cache_namespace='additional',
         plot_identifiers=ADDITIONAL_PLOT_IDENTIFIERS,
-        build_figures=build_figures,
         fresh=fresh,
+        refresh=refresh,
+        **kwargs,
+    )
+
+
+def _encode_float64(values):
+    """Base64 of the little-endian float64 bytes (``Float64Array`` in the browser)."""
+    return base64.b64encode(
+        np.ascontiguousarray(values, dtype='<f8').tobytes()
+    ).decode('ascii')
+
+
+def _empty_payload():
+    return {
+        'encoding': 'base64',
+        'dtype': '<f8',
+        'length': 0,
+        'x': '',
+        'x_axis_label': _series_axis_label(None),
+        'columns': {},
+        'figures': {},
+        'cursor_jd': None,
+    }
+
+
+def _frame_payload(plot_set, frame):
+    """Plot data payload of one plot set from a `BinnedFrame`."""
+    payload = _empty_payload()
+    if frame.note is not None:
+        payload['note'] = frame.note
+        return payload
+    if frame.empty:
+        return payload
+
+    if plot_set == 'main':
+        series = _main_series(frame, MAIN_PLOT_IDENTIFIERS)
+    else:
+        series = _additional_series(frame)
+    figures = {
+        figure_key: list(columns)
+        for figure_key, columns in PLOT_DATA_FIGURES[plot_set].items()
+    }
+    payload.update(
+        length=int(frame.bin_jd.size),
+        x=_encode_float64(jd_array_to_local_epoch_ms(frame.bin_jd)),
+        x_axis_label=_series_axis_label(frame.bin_jd),
+        columns={
+            column: _encode_float64(series[column])
+            for columns in figures.values()
+            for column in columns
+        },
+        figures=figures,
+        cursor_jd=float(frame.bin_jd[-1]),
+    )
+    return payload
+
+
+def plot_data_payload(
+        plot_set,
+        plot_range=1.,
+        time_resolution=120.,
+        start_dt=None,
+        end_dt=None,
+        chunk_cache=False,
+        downsample='',
+):
+    """
+        Binned plot columns of one plot set as base64 float64 buffers
+
+        Parameters
+        ----------
+        plot_set            : `string`
+            ``'main'`` or ``'additional'`` (a key of ``PLOT_DATA_FIGURES``).
+
+        Returns
+        -------
+        payload             : `dictionary`
+            ``x`` (local wall-clock epoch ms, see ``jd_array_to_local_datetime64``),
+            ``columns`` {`column`: `string`} and ``figures``
+            {`figure`: `list` of `column`}, the ColumnDataSource columns per
+            figure. ``cursor_jd`` is the start JD of the last (open) bin, the
+            ``since_jd`` of the next delta request. ``note`` is set instead of
+            data if the range has too many raw rows.
+    """
+    frame = binned_frame(
+        plot_range=plot_range,
+        time_resolution=time_resolution,
+        start_dt=start_dt,
+        end_dt=end_dt,
+        chunk_cache=chunk_cache,
+        downsample=downsample,
+    )
+    return _frame_payload(plot_set, frame)
+
+
+def plot_data_delta(
+        plot_set,
+        since_jd,
+        plot_range=1.,
+        time_resolution=120.,
+        start_dt=None,
+        end_dt=None,
+        chunk_cache=False,
+        **_unused,
+):
+    """
+        Bins of one plot set from the bin containing ``since_jd`` on
+
+        The first bin replaces the client's open trailing bin, the others
+        closed after it. Bins are epoch-aligned (see ``aligned_frame``);
+        ``since_jd`` is clamped to the plot range.
+
+        Returns
+        -------
+        payload             : `dictionary`
+            Like ``plot_data_payload``, plus ``since_jd``. ``cursor_jd`` stays
+            at the requested bin when no new data arrived.
+    """
+    if plot_set not in PLOT_DATA_FIGURES:
+        raise ValueError(f'Unknown plot set {plot_set!r}')
+    start_jd, end_jd = _jd_range(plot_range, start_dt, end_dt)
+    since_jd = min(max(float(since_jd), start_jd), end_jd)
+    #   A cursor is a bin start; the slack keeps float rounding of
+    #   origin + index * width from flooring it into the previous bin.
+    first_bin, last_bin = (
+        int(i) for i in bin_indices(
+            [since_jd + _CURSOR_SLACK_DAYS, end_jd], time_resolution, BIN_EPOCH_JD,
+        )
+    )
+    frame = aligned_frame(
+        first_bin,
+        last_bin,
+        time_resolution,
+        plot_range=(end_jd - start_jd),
+        chunk_cache=chunk_cache,
+    )
+    payload = _frame_payload(plot_set, frame)
+    payload['since_jd'] = since_jd
+    if payload['cursor_jd'] is None:
+        payload['cursor_jd'] = BIN_EPOCH_JD + first_bin * bin_width_days(time_resolution)
+    return payload
+
+
+def plot_data(plot_set, *, fresh=False, refresh=False, **kwargs):
+    """
+    Binned data of the main or additional plots, without Bokeh documents.
+
+    Returns ``(payload, meta)``; cached like the rendered plots (own
+    namespace), with the same chunk cache underneath.
+    """
+    if plot_set not in PLOT_DATA_FIGURES:
+        raise ValueError(f'Unknown plot set {plot_set!r}')
+    identifiers = (
+        MAIN_PLOT_IDENTIFIERS if plot_set == 'main' else ADDITIONAL_PLOT_IDENTIFIERS
+    )
+
+    _, payload, meta = _render_with_cache(
+        cache_namespace=f'data:{plot_set}',
+        plot_identifiers=identifiers,
+        fresh=fresh,
+        refresh=refresh,
         **kwargs,
     )
+    return payload, meta
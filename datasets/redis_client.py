@@ -0,0 +1,27 @@
+"""Shared Redis connection (``REDIS_URL``) for pub/sub and the replay store."""
+
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger('weather.redis')
+
+
+@lru_cache(maxsize=1)
+def _redis_client(url):
+    import redis
+
+    return redis.Redis.from_url(url)
+
+
+def redis_client():
+    """Redis client, or `None` without ``REDIS_URL``."""
+    url = getattr(settings, 'REDIS_URL', '')
+    if not url:
+        return None
+    try:
+        return _redis_client(url)
+    except Exception:
+        logger.exception('redis_unavailable')
+        return None
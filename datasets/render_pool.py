@@ -0,0 +1,154 @@
+"""
+Process pool for plot rendering.
+
+Building the Bokeh figures of a long range is pure CPU (NumPy binning,
+astropy time conversion, Bokeh serialization) and took whole seconds in
+the request thread. With ``PLOT_RENDER_WORKERS > 0`` every web worker
+hands renders to a small pool of its own child processes instead and
+waits at most ``PLOT_RENDER_TIMEOUT_SECONDS`` for them; the request thread
+only pickles the parameters and the finished script/div strings.
+
+The pool takes one render per child process. When all of them are busy,
+``submit_render`` raises ``RenderPoolBusy`` right away (``wait=False``) so
+the caller can answer from the stale cache entry, or waits for a free
+child up to the timeout when there is nothing to fall back to.
+``PLOT_RENDER_WORKERS = 0`` (default) renders in the request thread.
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+logger = logging.getLogger('weather.plots')
+
+_executor = None
+_slots = None
+_guard = threading.Lock()
+
+
+class RenderPoolBusy(Exception):
+    pass
+
+
+def render_pool_workers():
+    return max(int(getattr(settings, 'PLOT_RENDER_WORKERS', 0)), 0)
+
+
+def render_pool_enabled():
+    return render_pool_workers() > 0
+
+
+def render_timeout():
+    return float(getattr(settings, 'PLOT_RENDER_TIMEOUT_SECONDS', 30))
+
+
+def render_deadline():
+    """``time.monotonic()`` value by which a render started now must be done."""
+    return time.monotonic() + render_timeout()
+
+
+def time_left(deadline):
+    return max(deadline - time.monotonic(), 0.0)
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def _run(fn, args):
+    from django.db import close_old_connections
+
+    #   Like a request: honour CONN_MAX_AGE and drop broken connections
+    close_old_connections()
+    try:
+        return fn(*args)
+    finally:
+        close_old_connections()
+
+
+def _new_executor(workers):
+    # spawn, not fork: children must not share the parent's database
+    # and cache connections.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
+
+
+def _pool():
+    global _executor, _slots
+    with _guard:
+        if _executor is None:
+            workers = render_pool_workers()
+            _executor = _new_executor(workers)
+            _slots = threading.BoundedSemaphore(workers)
+            logger.info('render_pool_started workers=%s', workers)
+        return _executor, _slots
+
+
+def shutdown_render_pool():
+    """Stop the child processes; the next render starts a new pool."""
+    global _executor, _slots
+    with _guard:
+        executor, _executor, _slots = _executor, None, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def submit_render(fn, *args, wait=False, deadline=None):
+    """
+    Run ``fn(*args)`` in the render pool
+
+    Parameters
+    ----------
+    fn                  : `callable`
+        Module-level function (pickled by reference).
+
+    wait                : `bool`, optional
+        Wait until ``deadline`` for a free child process instead of
+        failing right away.
+        Default is ``False``.
+
+    deadline            : `float`, optional
+        ``time.monotonic()`` value, shared with the wait for the result
+        so both together stay within ``PLOT_RENDER_TIMEOUT_SECONDS``.
+        Default is ``render_deadline()``.
+
+    Returns
+    -------
+    future              : `concurrent.futures.Future`
+        The child's slot is given back when the future completes, also
+        when the caller stopped waiting for it.
+
+    Raises
+    ------
+    RenderPoolBusy
+        All child processes are rendering.
+    """
+    executor, slots = _pool()
+    if deadline is None:
+        deadline = render_deadline()
+    acquired = slots.acquire(timeout=time_left(deadline)) if wait else slots.acquire(blocking=False)
+    if not acquired:
+        logger.info('render_pool_busy fn=%s', getattr(fn, '__name__', fn))
+        raise RenderPoolBusy('all plot render workers are busy')
+    try:
+        future = executor.submit(_run, fn, args)
+    except BrokenProcessPool:
+        # A child died (OOM killer, segfault): start over with a new pool.
+        slots.release()
+        logger.error('render_pool_broken restarting')
+        shutdown_render_pool()
+        executor, slots = _pool()
+        slots.acquire()
+        future = executor.submit(_run, fn, args)
+    future.add_done_callback(lambda _: slots.release())
+    return future
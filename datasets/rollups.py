@@ -0,0 +1,212 @@
+"""Multi-resolution rollups of Dataset rows for long-range plots.
+
+Every tier stores the per-bin median, min, max, sum and count of each data
+column. The finest tier is aggregated from raw rows, every coarser tier from
+the tier below it (so coarse medians are medians of the finer bin medians).
+Bins are aligned to the Unix epoch and never depend on the plot range.
+"""
+
+import numpy as np
+from django.db import transaction
+
+from .binning import SECONDS_PER_DAY, aggregate_by_index, bin_indices
+from .merge_stats import MERGE_STATS_COMBINE, raw_stats, row_stats
+from .models import Dataset, DatasetRollup
+
+#   Bin widths in seconds, finest first; each tier divides the next one.
+ROLLUP_TIERS = (60, 600, 3600, 86400)
+
+#   JD of 1970-01-01T00:00 UTC (bin 0 of every tier)
+ROLLUP_EPOCH_JD = 2440587.5
+
+ROLLUP_COLUMNS = (
+    'temperature',
+    'pressure',
+    'humidity',
+    'illuminance',
+    'wind_speed',
+    'sky_temp',
+    'box_temp',
+    'rain',
+    'is_raining',
+    'pm1_0',
+    'pm2_5',
+    'pm10',
+    'uv_index',
+)
+
+ROLLUP_STATS = ('median', 'min', 'max', 'sum', 'count')
+
+#   How each statistic of a finer tier combines into the coarser tier
+_COMBINE = {
+    'median': 'median',
+    'min': 'min',
+    'max': 'max',
+    'sum': 'sum',
+    'count': 'sum',
+}
+
+#   Raw rows within this distance of a bin edge are still fetched so that the
+#   floor() assignment (not the SQL range) decides their bin.
+_EDGE_SLACK_DAYS = 1e-6
+
+
+def tier_width_days(tier_seconds):
+    return float(tier_seconds) / SECONDS_PER_DAY
+
+
+def tier_bin_range(tier_seconds, start_jd, end_jd):
+    """First and last bin index of a tier overlapping ``[start_jd, end_jd]``."""
+    first, last = bin_indices(
+        [float(start_jd), float(end_jd)], tier_seconds, ROLLUP_EPOCH_JD,
+    )
+    return int(first), int(last)
+
+
+def tier_bin_jd(tier_seconds, bin_index):
+    return ROLLUP_EPOCH_JD + np.asarray(bin_index) * tier_width_days(tier_seconds)
+
+
+def _stat_key(column, stat):
+    return f'{column}:{stat}'
+
+
+def _aggregate_raw(tier_seconds, first, last):
+    width = tier_width_days(tier_seconds)
+    lo_jd = ROLLUP_EPOCH_JD + first * width - _EDGE_SLACK_DAYS
+    hi_jd = ROLLUP_EPOCH_JD + (last + 1) * width + _EDGE_SLACK_DAYS
+    rows = list(
+        Dataset.objects.filter(jd__gte=lo_jd, jd__lt=hi_jd)
+        .order_by('jd')
+        .values_list('jd', 'merge_stats', *ROLLUP_COLUMNS)
+    )
+    merge_stats = [row[1] for row in rows]
+    data = (
+        np.array([(row[0],) + row[2:] for row in rows], dtype=float)
+        if rows else np.empty((0, len(ROLLUP_COLUMNS) + 1))
+    )
+
+    idx = bin_indices(data[:, 0], tier_seconds, ROLLUP_EPOCH_JD)
+    keep = (idx >= first) & (idx <= last)
+    kept_stats = [entry for entry, kept in zip(merge_stats, keep) if kept]
+    merged = any(kept_stats)
+    columns = {}
+    for i, column in enumerate(ROLLUP_COLUMNS):
+        values = data[keep, i + 1]
+        columns[_stat_key(column, 'median')] = (values, 'median')
+        #   Merged rows contribute the min/max/sum/count of their samples
+        per_row = row_stats(values, kept_stats, column) if merged else raw_stats(values)
+        for stat, how in MERGE_STATS_COMBINE.items():
+            columns[_stat_key(column, stat)] = (per_row[stat], how)
+    columns['row_count'] = (np.ones(int(keep.sum())), 'sum')
+    return aggregate_by_index(idx[keep], columns)
+
+
+def load_tier(tier_seconds, start_jd=None, end_jd=None, first=None, last=None):
+    """
+    Load stored rollup bins of one tier as arrays.
+
+    Bins are selected by start JD (``start_jd``/``end_jd``) or by bin index
+    (``first``/``last``), both inclusive.
+
+    Returns
+    -------
+    bin_index       : `numpy.ndarray`
+    row_count       : `numpy.ndarray`
+    stats           : `dict` {(`column`, `stat`): `numpy.ndarray`}
+        Missing values are NaN.
+    """
+    queryset = DatasetRollup.objects.filter(tier_seconds=tier_seconds)
+    if start_jd is not None:
+        queryset = queryset.filter(bin_jd__gte=float(start_jd))
+    if end_jd is not None:
+        queryset = queryset.filter(bin_jd__lte=float(end_jd))
+    if first is not None:
+        queryset = queryset.filter(bin_index__gte=first)
+    if last is not None:
+        queryset = queryset.filter(bin_index__lte=last)
+    rows = list(queryset.order_by('bin_index').values_list('bin_index', 'row_count', 'stats'))
+
+    bin_index = np.array([row[0] for row in rows], dtype=np.int64)
+    row_count = np.array([row[1] for row in rows], dtype=float)
+    stats = {}
+    for column in ROLLUP_COLUMNS:
+        for stat in ROLLUP_STATS:
+            stats[(column, stat)] = np.array(
+                [row[2].get(column, {}).get(stat) for row in rows],
+                dtype=float,
+            )
+    return bin_index, row_count, stats
+
+
+def _aggregate_child_tier(child_seconds, tier_seconds, first, last):
+    ratio = tier_seconds // child_seconds
+    child_index, child_rows, child_stats = load_tier(
+        child_seconds,
+        first=first * ratio,
+        last=(last + 1) * ratio - 1,
+    )
+    columns = {
+        _stat_key(column, stat): (child_stats[(column, stat)], _COMBINE[stat])
+        for column in ROLLUP_COLUMNS
+        for stat in ROLLUP_STATS
+    }
+    columns['row_count'] = (child_rows, 'sum')
+    # Integer floor division keeps child bins exactly inside their parent.
+    return aggregate_by_index(child_index // ratio, columns)
+
+
+def _as_json_number(value):
+    return None if np.isnan(value) else float(value)
+
+
+def _replace_bins(tier_seconds, first, last, bin_index, aggregated):
+    DatasetRollup.objects.filter(
+        tier_seconds=tier_seconds,
+        bin_index__gte=first,
+        bin_index__lte=last,
+    ).delete()
+    bin_jd = tier_bin_jd(tier_seconds, bin_index)
+    instances = []
+    for i, index in enumerate(bin_index):
+        stats = {
+            column: {
+                stat: _as_json_number(aggregated[_stat_key(column, stat)][i])
+                for stat in ROLLUP_STATS
+            }
+            for column in ROLLUP_COLUMNS
+        }
+        instances.append(DatasetRollup(
+            tier_seconds=tier_seconds,
+            bin_index=int(index),
+            bin_jd=float(bin_jd[i]),
+            row_count=int(aggregated['row_count'][i]),
+            stats=stats,
+        ))
+    DatasetRollup.objects.bulk_create(instances, batch_size=1000)
+
+
+def refresh_rollups(start_jd, end_jd):
+    """
+    Recompute every rollup bin overlapping ``[start_jd, end_jd]``.
+
+    Call after Dataset rows in that JD range were added, changed or
+    deleted. Bins that no longer hold data are removed.
+    """
+    start_jd = float(start_jd)
+    end_jd = float(end_jd)
+    if end_jd < start_jd:
+        start_jd, end_jd = end_jd, start_jd
+
+    with transaction.atomic():
+        child_seconds = None
+        for tier_seconds in ROLLUP_TIERS:
+            first, last = tier_bin_range(tier_seconds, start_jd, end_jd)
+            if child_seconds is None:
+                bin_index, aggregated = _aggregate_raw(tier_seconds, first, last)
+            else:
+                bin_index, aggregated = _aggregate_child_tier(
+                    child_seconds, tier_seconds, first, last,
+                )
+            _replace_bins(tier_seconds, first, last, bin_index, aggregated)
+            child_seconds = tier_seconds
@@ -0,0 +1,35 @@
+"""Signal receivers of the datasets app (connected in ``DatasetsConfig.ready``)."""
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .api.credential_cache import invalidate_upload_credentials
+from .models import UploadDevice
+
+
+@receiver(post_init, sender=settings.AUTH_USER_MODEL)
+def _user_loaded(sender, instance, **kwargs):
+    #   Read from __dict__: a deferred is_active must not cost a query
+    instance._loaded_is_active = instance.__dict__.get('is_active')
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def _service_user_saved(sender, instance, created, update_fields=None, **kwargs):
+    #   Deactivating a device's service user blocks its uploads right away,
+    #   not after UPLOAD_CREDENTIAL_CACHE_TTL_SECONDS. Other saves (logins,
+    #   password changes, profile edits) skip the device lookup.
+    loaded = getattr(instance, '_loaded_is_active', None)
+    instance._loaded_is_active = instance.__dict__.get('is_active')
+    if created or (update_fields is not None and 'is_active' not in update_fields):
+        return
+    if loaded is not None and loaded == instance._loaded_is_active:
+        return
+    if UploadDevice.objects.filter(service_user_id=instance.pk).exists():
+        invalidate_upload_credentials()
+
+
+@receiver(post_delete, sender=UploadDevice)
+def _upload_device_deleted(sender, instance, **kwargs):
+    #   Also when the device goes with its deleted service user
+    invalidate_upload_credentials()
@@ -1,25 +1,34 @@
 import base64
+import json
+import math
+import os
 from datetime import date, timedelta
-from unittest.mock import patch
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import MagicMock, patch
+from zoneinfo import ZoneInfo
 
 from astropy.time import Time
 from django.contrib.auth.models import User
 from django.core.cache import cache
-from django.test import Client, TestCase, override_settings
+from django.test import AsyncRequestFactory, Client, TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from . import conditions, ephemeris, live
+from .data_versions import bump_data_version
 from .models import Dataset
 from .plot_cache import plot_cache_enabled
-from .plot_db import fetch_binned_rows, should_use_postgres_binning
+from .plot_db import fetch_binned_rows, is_postgresql, should_use_postgres_binning
 from .plots import default_plots
 
 
 @override_settings(UPLOAD_AUTH_MODE='dual')
 class DatasetAPITests(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(
             username='data_upload_user',
             password='test-password',
@@ -150,8 +159,9 @@ class DatasetAPITests(TestCase):
 class DashboardTests(TestCase):
     def setUp(self):
         cache.clear()
+        ephemeris.clear_memo()
 
-    @patch('datasets.views.Observer')
+    @patch('datasets.ephemeris.Observer')
     def test_dashboard_no_data(self, mock_observer_cls):
         observer = mock_observer_cls.return_value
         observer.sun_rise_time.return_value = Time('2026-04-16 04:30:00')
@@ -163,7 +173,7 @@ class DashboardTests(TestCase):
         self.assertContains(response, 'wi-day-sunny')
         self.assertContains(response, 'Expand to load additional plots')
 
-    @patch('datasets.views.Observer')
+    @patch('datasets.ephemeris.Observer')
     def test_dashboard_fresh_query_ignored_for_anonymous(self, mock_observer_cls):
         observer = mock_observer_cls.return_value
         observer.sun_rise_time.return_value = Time('2026-04-16 04:30:00')
@@ -178,7 +188,7 @@ class DashboardTests(TestCase):
             self.assertEqual(mocked.call_count, 1)
             self.assertFalse(mocked.call_args_list[0].kwargs.get('fresh'))
 
-    @patch('datasets.views.Observer')
+    @patch('datasets.ephemeris.Observer')
     def test_dashboard_clean_url_exposes_plot_defaults(self, mock_observer_cls):
         observer = mock_observer_cls.return_value
         observer.sun_rise_time.return_value = Time('2026-04-16 04:30:00')
@@ -244,7 +254,7 @@ class DashboardTests(TestCase):
         })
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-    @patch('datasets.views.Observer')
+    @patch('datasets.ephemeris.Observer')
     def test_additional_plots_endpoint(self, mock_observer_cls):
         observer = mock_observer_cls.return_value
         observer.sun_rise_time.return_value = Time('2026-04-16 04:30:00')
@@ -282,6 +292,128 @@ class DashboardTests(TestCase):
             div_id = div_html.split('id="', 1)[1].split('"', 1)[0]
             self.assertIn(div_id, response.data['script'])
 
+    def test_plot_data_endpoint_returns_float64_buffers(self):
+        import numpy as np
+
+        from .plots import jd_array_to_local_epoch_ms, plot_source_name
+
+        jd = Time.now().jd - 0.01
+        Dataset.objects.create(
+            jd=jd,
+            temperature=10.5,
+            pressure=1010.0,
+            humidity=50.0,
+            illuminance=100.0,
+            wind_speed=10.0,
+            rain=0.0,
+            is_raining=1,
+        )
+        response = APIClient().get(reverse('datasets-api:plot-data'), {
+            'plot_range': '0.5',
+            'time_resolution': '300',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data
+        self.assertEqual(data['set'], 'main')
+        self.assertEqual(data['length'], 1)
+
+        def decode(encoded):
+            return np.frombuffer(base64.b64decode(encoded), dtype='<f8')
+
+        # Bin start in local wall-clock ms, like the rendered figures
+        x = decode(data['x'])
+        self.assertEqual(len(x), 1)
+        self.assertLessEqual(x[0], jd_array_to_local_epoch_ms([jd])[0])
+        self.assertEqual(list(decode(data['columns']['temperature'])), [10.5])
+        self.assertAlmostEqual(decode(data['columns']['wind_speed'])[0], 1.4)
+        self.assertEqual(list(decode(data['columns']['rain_drizzle'])), [0.0])
+        self.assertEqual(data['figures']['rain'], ['rain', 'rain_drizzle'])
+
+        # The rendered figures carry sources with the same names and columns
+        script, _, _ = default_plots(fresh=True, plot_range=0.5, time_resolution='300')
+        self.assertIn(plot_source_name('main', 'temperature'), script)
+
+        response = APIClient().get(reverse('datasets-api:plot-data'), {
+            'set': 'additional',
+            'plot_range': '0.5',
+            'time_resolution': '300',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('dew_point', response.data['columns'])
+
+    def test_plot_data_since_jd_returns_only_new_bins(self):
+        import numpy as np
+
+        from .plot_chunks import BIN_EPOCH_JD
+
+        def bin_start(index):
+            return BIN_EPOCH_JD + index * 300 / 86400.0
+
+        now_bin = int((Time.now().jd - BIN_EPOCH_JD) * 86400 // 300)
+        for index, temperature in ((now_bin - 6, 5.0), (now_bin - 2, 8.0)):
+            Dataset.objects.create(jd=bin_start(index) + 0.0001, temperature=temperature, pressure=1010.0)
+        query = {'plot_range': '0.5', 'time_resolution': '300'}
+        full = APIClient().get(reverse('datasets-api:plot-data'), query).data
+        self.assertEqual(full['length'], 2)
+        self.assertAlmostEqual(full['cursor_jd'], bin_start(now_bin - 2), places=6)
+
+        # The open bin gets more data and the next bin starts
+        Dataset.objects.create(jd=bin_start(now_bin - 2) + 0.0002, temperature=10.0, pressure=1010.0)
+        Dataset.objects.create(jd=bin_start(now_bin - 1) + 0.0001, temperature=12.0, pressure=1010.0)
+        response = APIClient().get(
+            reverse('datasets-api:plot-data'), {**query, 'since_jd': full['cursor_jd']},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        delta = response.data
+        self.assertTrue(delta['delta'])
+        self.assertEqual(delta['length'], 2)
+        temperature = np.frombuffer(base64.b64decode(delta['columns']['temperature']), dtype='<f8')
+        self.assertEqual(list(temperature), [9.0, 12.0])
+        self.assertAlmostEqual(delta['cursor_jd'], bin_start(now_bin - 1), places=6)
+
+        additional = APIClient().get(
+            reverse('datasets-api:additional-plots'), {**query, 'since_jd': delta['cursor_jd']},
+        ).data
+        self.assertEqual(additional['set'], 'additional')
+        self.assertEqual(additional['length'], 1)
+        self.assertNotIn('script', additional)
+
+    def test_uncached_plot_data_shares_the_delta_grid(self):
+        import numpy as np
+
+        from .plot_chunks import BIN_EPOCH_JD
+        from .plots import plot_data_delta, plot_data_payload
+
+        now = Time.now().jd
+        for offset in (0.01, 0.005, 0.001):
+            Dataset.objects.create(jd=now - offset, temperature=5.0, pressure=1010.0)
+
+        def x(payload):
+            return np.frombuffer(base64.b64decode(payload['x']), dtype='<f8')
+
+        # Below PLOT_CACHE_MIN_RESOLUTION_SECONDS (or fresh=1): no chunk cache
+        full = plot_data_payload('main', plot_range=0.5, time_resolution=30, chunk_cache=False)
+        bins = (full['cursor_jd'] - BIN_EPOCH_JD) * 86400 / 30
+        self.assertAlmostEqual(bins, round(bins), places=3)
+        delta = plot_data_delta('main', full['cursor_jd'], plot_range=0.5, time_resolution=30)
+        self.assertEqual(x(delta)[0], x(full)[-1])
+
+    def test_plot_data_rejects_invalid_since_jd(self):
+        response = APIClient().get(reverse('datasets-api:plot-data'), {
+            'plot_range': '0.5',
+            'time_resolution': '300',
+            'since_jd': 'nan',
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_plot_data_endpoint_rejects_unknown_set(self):
+        response = APIClient().get(reverse('datasets-api:plot-data'), {
+            'set': 'everything',
+            'plot_range': '0.5',
+            'time_resolution': '300',
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class PlotDbTests(TestCase):
     def test_should_use_postgres_binning_sqlite(self):
@@ -331,6 +463,442 @@ class PlotDbTests(TestCase):
         self.assertNotEqual(type(sql_params[0]).__module__, 'numpy')
 
 
+class BinningTests(TestCase):
+    def test_aggregate_bins_matches_astropy_downsample(self):
+        import astropy.units as u
+        import numpy as np
+        from astropy.timeseries import TimeSeries, aggregate_downsample
+
+        from .binning import aggregate_bins
+
+        rng = np.random.default_rng(7)
+        seconds = np.arange(400) * 30.0 + rng.uniform(-5.0, 5.0, 400)
+        jd = 2460000.5 + seconds / 86400.0
+        values = rng.normal(10.0, 3.0, 400)
+        values[::17] = np.nan
+
+        bin_jd, binned = aggregate_bins(
+            jd,
+            {
+                'median': (values, 'median'),
+                'sum': (values, 'sum'),
+                'mean': (values, 'mean'),
+                'max': (values, 'max'),
+            },
+            300,
+        )
+        for how, func in (
+                ('median', np.nanmedian),
+                ('sum', np.nansum),
+                ('mean', np.nanmean),
+                ('max', np.nanmax),
+        ):
+            reference = aggregate_downsample(
+                TimeSeries(time=Time(jd, format='jd'), data={'data': values}),
+                time_bin_size=300 * u.s,
+                aggregate_func=func,
+            )
+            keep = np.invert(reference['data'].mask)
+            np.testing.assert_allclose(
+                bin_jd, reference['time_bin_start'].value[keep], rtol=0, atol=1e-8,
+            )
+            np.testing.assert_allclose(
+                binned[how], reference['data'].value[keep], equal_nan=True,
+            )
+
+    def test_aggregate_bins_unsorted_input_and_all_nan_bins(self):
+        import numpy as np
+
+        from .binning import aggregate_bins
+
+        step = 60.0 / 86400.0
+        jd = np.array([3.5, 0, 1.5, 2.5, 0.5]) * step + 2460000.5
+        values = np.array([4.0, np.nan, 2.0, 3.0, None], dtype=float)
+        bin_jd, binned = aggregate_bins(
+            jd,
+            {'median': (values, 'median'), 'sum': (values, 'sum')},
+            60,
+        )
+        np.testing.assert_allclose(bin_jd, np.array([0, 1, 2, 3]) * step + 2460000.5)
+        np.testing.assert_allclose(binned['median'], [np.nan, 2.0, 3.0, 4.0], equal_nan=True)
+        np.testing.assert_allclose(binned['sum'], [0.0, 2.0, 3.0, 4.0])
+
+    def test_aggregate_bins_empty_and_unknown_aggregate(self):
+        from .binning import aggregate_bins
+
+        bin_jd, binned = aggregate_bins([], {'temperature': ([], 'median')}, 60)
+        self.assertEqual(len(bin_jd), 0)
+        self.assertEqual(len(binned['temperature']), 0)
+        with self.assertRaises(ValueError):
+            aggregate_bins([2460000.5], {'temperature': ([1.0], 'mode')}, 60)
+
+
+class RollupTests(TestCase):
+    def _create_rows(self, start_jd, count, step_seconds=60.0):
+        for i in range(count):
+            Dataset.objects.create(
+                jd=start_jd + i * step_seconds / 86400.0,
+                temperature=float(i),
+                pressure=1013.0,
+                humidity=50.0,
+                illuminance=100.0,
+                wind_speed=1.0,
+                rain=1.25 if i % 10 == 0 else 0.0,
+                is_raining=i % 2,
+            )
+
+    def test_refresh_rollups_tiers_and_fetch(self):
+        from .models import DatasetRollup
+        from .plot_db import fetch_rollup_rows
+        from .rollups import ROLLUP_EPOCH_JD, refresh_rollups
+
+        # Two full hours of 1-minute samples, 15 s after an hour boundary.
+        start = ROLLUP_EPOCH_JD + 20000 + 15.0 / 86400.0
+        self._create_rows(start, 120)
+        # Raw rows only: no per-row look at merge_stats
+        with patch('datasets.rollups.row_stats', side_effect=AssertionError):
+            refresh_rollups(start, start + 119 * 60.0 / 86400.0)
+
+        self.assertEqual(DatasetRollup.objects.filter(tier_seconds=60).count(), 120)
+        self.assertEqual(DatasetRollup.objects.filter(tier_seconds=600).count(), 12)
+        self.assertEqual(DatasetRollup.objects.filter(tier_seconds=3600).count(), 2)
+        day = DatasetRollup.objects.get(tier_seconds=86400)
+        self.assertEqual(day.row_count, 120)
+        self.assertEqual(day.stats['temperature']['min'], 0.0)
+        self.assertEqual(day.stats['temperature']['max'], 119.0)
+        self.assertAlmostEqual(day.stats['rain']['sum'], 12 * 1.25)
+
+        rows = fetch_rollup_rows(
+            ROLLUP_EPOCH_JD + 20000,
+            ROLLUP_EPOCH_JD + 20000 + 2.0 / 24.0,
+            3600,
+            ['temperature', 'rain', 'is_raining'],
+        )
+        self.assertEqual(rows.shape, (2, 4))
+        self.assertAlmostEqual(rows[0, 2], 6 * 1.25)
+        self.assertAlmostEqual(rows[1, 3], 0.5)
+
+        # Rows removed later disappear from the rollups on refresh.
+        Dataset.objects.all().delete()
+        refresh_rollups(start, start + 119 * 60.0 / 86400.0)
+        self.assertFalse(DatasetRollup.objects.exists())
+
+    def test_admin_bulk_delete_refreshes_rollups_once(self):
+        from django.contrib import admin
+
+        from .admin import DatasetAdmin
+        from .models import DatasetRollup
+        from .rollups import ROLLUP_EPOCH_JD, refresh_rollups
+
+        start = ROLLUP_EPOCH_JD + 20000 + 15.0 / 86400.0
+        self._create_rows(start, 120)
+        refresh_rollups(start, start + 119 * 60.0 / 86400.0)
+
+        model_admin = DatasetAdmin(Dataset, admin.site)
+        with patch('datasets.admin.refresh_rollups', wraps=refresh_rollups) as mocked:
+            model_admin.delete_queryset(None, Dataset.objects.filter(jd__lt=start + 1.0 / 24.0))
+        mocked.assert_called_once()
+        self.assertEqual(mocked.call_args.args, (start, start + 59 * 60.0 / 86400.0))
+        self.assertEqual(DatasetRollup.objects.filter(tier_seconds=60).count(), 60)
+
+    @override_settings(UPLOAD_AUTH_MODE='dual')
+    def test_upload_refreshes_rollups(self):
+        from .models import DatasetRollup
+        from .rollups import ROLLUP_TIERS
+
+        User.objects.create_user(username='data_upload_user', password='test-password')
+        token = base64.b64encode(b'data_upload_user:test-password').decode('ascii')
+        response = APIClient().post(
+            reverse('datasets-api:dataset-create'),
+            {
+                'jd': Time.now().jd,
+                'temperature': 12.5,
+                'pressure': 1013.0,
+                'humidity': 55.0,
+                'illuminance': 1000.0,
+                'wind_speed': 3.0,
+                'sky_temp': 10.0,
+                'box_temp': 15.0,
+                'rain': 0.0,
+                'is_raining': 0,
+            },
+            format='json',
+            HTTP_AUTHORIZATION=f'Basic {token}',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(DatasetRollup.objects.values_list('tier_seconds', flat=True)),
+            list(ROLLUP_TIERS),
+        )
+        self.assertEqual(
+            DatasetRollup.objects.get(tier_seconds=60).stats['temperature']['median'],
+            12.5,
+        )
+
+    def test_derived_column_matches_across_binning_sources(self):
+        import numpy as np
+
+        from .plot_db import fetch_rollup_rows
+        from .plots import _plot_bins
+        from .rollups import ROLLUP_EPOCH_JD, refresh_rollups
+
+        start = ROLLUP_EPOCH_JD + 20000
+        for i in range(120):
+            # Median of the differences != difference of the medians
+            Dataset.objects.create(
+                jd=start + (15.0 + 60.0 * i) / 86400.0,
+                temperature=float(i % 10),
+                sky_temp=(i % 10) ** 2 / 10.0,
+                pressure=1013.0,
+                humidity=50.0,
+            )
+        refresh_rollups(start, start + 2.0 / 24.0)
+
+        columns = ['temperature', 'sky_temp', 'temp_sky_diff']
+        options = {'start_jd': start, 'end_jd': start + 2.0 / 24.0, 'plot_range': 2, 'time_resolution': 600}
+        raw_jd, raw = _plot_bins(columns, **options)
+        with override_settings(PLOT_ROLLUPS_ENABLED=True), \
+                patch('datasets.plots.fetch_rollup_rows', wraps=fetch_rollup_rows) as mocked:
+            rollup_jd, rollup = _plot_bins(columns, **options)
+        self.assertTrue(mocked.called)
+        np.testing.assert_allclose(rollup_jd, raw_jd)
+        for column in columns:
+            np.testing.assert_allclose(rollup[column], raw[column])
+        np.testing.assert_allclose(raw['temp_sky_diff'], raw['temperature'] - raw['sky_temp'])
+
+    @override_settings(PLOT_ROLLUPS_ENABLED=True)
+    def test_long_range_plots_read_rebuilt_rollups(self):
+        from django.core.management import call_command
+
+        from .models import DatasetRollup
+        from .plot_db import fetch_rollup_rows, rollup_tier_for
+
+        self._create_rows(Time.now().jd - 2.0, 30, step_seconds=3600.0)
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(DatasetRollup.objects.filter(tier_seconds=3600).count(), 30)
+
+        self.assertIsNone(rollup_tier_for(30))
+        self.assertEqual(rollup_tier_for(1800), 600)
+        self.assertEqual(rollup_tier_for(7200), 3600)
+        with patch('datasets.plots.fetch_rollup_rows', wraps=fetch_rollup_rows) as mocked:
+            default_plots(fresh=True, plot_range=7, time_resolution=7200)
+        self.assertTrue(mocked.called)
+
+
+class MergeTests(TestCase):
+    def _create_rows(self, start_jd, count, step_seconds=600.0):
+        for i in range(count):
+            Dataset.objects.create(
+                jd=start_jd + i * step_seconds / 86400.0,
+                temperature=float(i % 6),
+                pressure=1013.0,
+                humidity=50.0,
+                rain=1.25 if i % 3 == 0 else 0.0,
+            )
+
+    def test_merge_data_merges_in_checkpointed_chunks(self):
+        from django.core.management import call_command
+
+        from .merge import MERGE_EPOCH_JD
+        from .models import MergeCheckpoint
+
+        self._create_rows(Time.now().jd - 3.5, 288)
+        rain_before = sum(Dataset.objects.values_list('rain', flat=True))
+        options = {'days_back': 4, 'span': 3, 'bin_size': 3600, 'stdout': StringIO()}
+        call_command('merge_data', **options)
+
+        self.assertFalse(Dataset.objects.filter(merged=False).exists())
+        merged = list(Dataset.objects.order_by('jd'))
+        self.assertIn(len(merged), (48, 49))
+        for row in merged:
+            # Epoch-aligned bins, new rows on the bin midpoints
+            self.assertAlmostEqual(((row.jd - MERGE_EPOCH_JD) * 24) % 1, 0.5, places=6)
+        self.assertAlmostEqual(sum(row.rain for row in merged), rain_before)
+        # Day chunks of the window, the first one starting at 0 UTC
+        chunks = MergeCheckpoint.objects.filter(bin_seconds=3600).count()
+        self.assertIn(chunks, (3, 4))
+
+        out = StringIO()
+        call_command('merge_data', **{**options, 'stdout': out})
+        self.assertIn(f'in 0 chunk(s), skipped {chunks}', out.getvalue())
+
+    def test_interrupted_merge_resumes_after_last_chunk(self):
+        from django.core.management import call_command
+
+        from . import merge
+        from .models import MergeCheckpoint
+
+        self._create_rows(Time.now().jd - 3.5, 288)
+        merge_chunk = merge.merge_chunk
+        calls = []
+
+        def fail_second_chunk(chunk, *args, **kwargs):
+            calls.append(chunk)
+            if len(calls) == 2:
+                raise RuntimeError('worker killed')
+            return merge_chunk(chunk, *args, **kwargs)
+
+        options = {'days_back': 4, 'span': 3, 'bin_size': 3600, 'stdout': StringIO()}
+        with patch('datasets.merge.merge_chunk', side_effect=fail_second_chunk):
+            with self.assertRaises(RuntimeError):
+                call_command('merge_data', **options)
+        self.assertEqual(MergeCheckpoint.objects.count(), 1)
+        self.assertTrue(Dataset.objects.filter(merged=False).exists())
+
+        out = StringIO()
+        call_command('merge_data', **{**options, 'stdout': out})
+        self.assertIn('skipped 1 checkpointed', out.getvalue())
+        self.assertFalse(Dataset.objects.filter(merged=False).exists())
+
+
+    def test_merge_skips_chunks_held_by_another_merge(self):
+        from contextlib import contextmanager
+
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        from .models import MergeCheckpoint
+
+        @contextmanager
+        def held(chunk):
+            yield False
+
+        self._create_rows(Time.now().jd - 3.5, 288)
+        out = StringIO()
+        with patch('datasets.merge.chunk_lock', held):
+            call_command('merge_data', days_back=4, span=3, bin_size=3600, stdout=out)
+        self.assertIn('held by another merge', out.getvalue())
+        self.assertFalse(MergeCheckpoint.objects.exists())
+        self.assertFalse(Dataset.objects.filter(merged=True).exists())
+
+        # SQLite has one writer: parallel workers need PostgreSQL
+        if not is_postgresql():
+            with self.assertRaises(CommandError):
+                call_command('merge_data', days_back=4, span=3, workers=2, stdout=StringIO())
+
+    def test_sql_merge_engine_needs_postgresql(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        from .merge import _sql_merge_statement
+        from .plot_db import aggregate_expression
+
+        if not is_postgresql():
+            with self.assertRaises(CommandError):
+                call_command('merge_data', days_back=4, span=3, engine='sql', stdout=StringIO())
+        statement = _sql_merge_statement()
+        # Delete and insert in one statement, aggregates from plot_db
+        self.assertIn('DELETE FROM', statement)
+        self.assertIn('INSERT INTO', statement)
+        self.assertIn(aggregate_expression('is_raining', 'max'), statement)
+        self.assertIn(aggregate_expression('rain', 'sum'), statement)
+        # Min/max/sum/count of the merged samples are kept and re-combined
+        self.assertIn('merge_stats', statement)
+        self.assertIn("merge_stats -> 'temperature' ->> 'count'", statement)
+
+
+    @skipUnless(os.environ.get('TEST_DATABASE_URL'), 'TEST_DATABASE_URL not set')
+    def test_sql_merge_engine_matches_python_engine(self):
+        from .merge import MERGE_EPOCH_JD, merge_chunk, merge_chunks
+
+        self.assertTrue(is_postgresql())
+        python_day = MERGE_EPOCH_JD + math.floor(Time.now().jd - 20 - MERGE_EPOCH_JD)
+        sql_day = python_day + 1
+        # Same samples on two days, off the bin edges
+        for day in (python_day, sql_day):
+            self._create_rows(day + 150 / 86400.0, 288, step_seconds=300)
+
+        def merged_rows(day):
+            return list(
+                Dataset.objects.filter(jd__gte=day, jd__lt=day + 1)
+                .order_by('jd')
+                .values_list('temperature', 'rain', 'is_raining', 'pm10', 'merge_stats')
+            )
+
+        for bin_seconds, include_merged in ((1800, False), (3600, True)):
+            for day, engine in ((python_day, 'python'), (sql_day, 'sql')):
+                written = 0
+                for chunk in merge_chunks(day, day + 1, bin_seconds):
+                    result = merge_chunk(chunk, bin_seconds, engine=engine, include_merged=include_merged)
+                    self.assertFalse(result.skipped)
+                    written += result.rows_written
+                self.assertEqual(written, 86400 // bin_seconds)
+            self.assertFalse(Dataset.objects.filter(merged=False).exists())
+            self.assertEqual(merged_rows(sql_day), merged_rows(python_day))
+            # New rows on the bin midpoints of the SQL merge, too
+            for jd in Dataset.objects.filter(jd__gte=sql_day).values_list('jd', flat=True):
+                self.assertAlmostEqual(((jd - MERGE_EPOCH_JD) * 86400 / bin_seconds) % 1, 0.5, places=4)
+
+        row = Dataset.objects.filter(jd__gte=sql_day).order_by('jd').first()
+        self.assertEqual(row.merge_stats['temperature'], {'min': 0.0, 'max': 5.0, 'sum': 30.0, 'count': 12})
+
+    def test_merge_retention_moves_days_through_tiers(self):
+        from django.core.management import call_command
+
+        from .merge import MERGE_EPOCH_JD, parse_retention_tiers
+        from .models import MergeCheckpoint
+
+        now = Time.now().jd
+        old_day = MERGE_EPOCH_JD + math.floor(now - 100 - MERGE_EPOCH_JD)
+        recent_day = MERGE_EPOCH_JD + math.floor(now - 10 - MERGE_EPOCH_JD)
+        self._create_rows(old_day, 288, step_seconds=300)
+        self._create_rows(recent_day, 288, step_seconds=300)
+
+        call_command('merge_retention', tiers=['3:600', '90:3600'], stdout=StringIO())
+        self.assertFalse(Dataset.objects.filter(merged=False).exists())
+        # Old data goes straight to its final tier
+        self.assertEqual(Dataset.objects.filter(jd__lt=old_day + 1).count(), 24)
+        self.assertEqual(Dataset.objects.filter(jd__gte=recent_day).count(), 144)
+
+        # The recent day ages into the coarser tier
+        call_command('merge_retention', tiers=['3:600', '5:3600'], stdout=StringIO())
+        self.assertEqual(Dataset.objects.filter(jd__gte=recent_day).count(), 24)
+        self.assertTrue(
+            MergeCheckpoint.objects.filter(bin_seconds=3600, start_jd=recent_day).exists()
+        )
+        out = StringIO()
+        call_command('merge_retention', tiers=['3:600', '5:3600'], stdout=out)
+        self.assertIn('0 row(s)', out.getvalue())
+
+        with self.assertRaises(ValueError):
+            parse_retention_tiers(['3:600', '90:900'])
+
+    def test_merged_rows_keep_min_max_sum_count(self):
+        import numpy as np
+
+        from .merge import MERGE_EPOCH_JD, merge_chunk, merge_chunks
+        from .plots import _downsampled_bins
+        from .rollups import load_tier, refresh_rollups
+
+        day = MERGE_EPOCH_JD + math.floor(Time.now().jd - 10 - MERGE_EPOCH_JD)
+        # Temperatures 0..5 in every half hour, off the bin edges
+        self._create_rows(day + 150 / 86400.0, 288, step_seconds=300)
+        for chunk in merge_chunks(day, day + 1, 1800):
+            merge_chunk(chunk, 1800, engine='python')
+        row = Dataset.objects.order_by('jd').first()
+        self.assertEqual(row.temperature, 2.5)
+        self.assertEqual(row.merge_stats['temperature'], {'min': 0.0, 'max': 5.0, 'sum': 15.0, 'count': 6})
+
+        # Coarser merges combine the statistics, not the medians
+        for chunk in merge_chunks(day, day + 1, 3600):
+            merge_chunk(chunk, 3600, engine='python', include_merged=True)
+        self.assertEqual(Dataset.objects.count(), 24)
+        row = Dataset.objects.order_by('jd').first()
+        self.assertEqual(row.merge_stats['temperature'], {'min': 0.0, 'max': 5.0, 'sum': 30.0, 'count': 12})
+        self.assertAlmostEqual(row.merge_stats['rain']['sum'], row.rain)
+
+        refresh_rollups(day, day + 1)
+        _, _, stats = load_tier(3600, first=None, start_jd=day, end_jd=day + 1)
+        self.assertEqual(stats[('temperature', 'min')][0], 0.0)
+        self.assertEqual(stats[('temperature', 'max')][0], 5.0)
+        self.assertEqual(stats[('temperature', 'count')][0], 12)
+
+        # The min/max envelope shows the merged samples
+        _, series = _downsampled_bins(['temperature'], start_jd=day, end_jd=day + 1, mode='minmax')
+        self.assertEqual(np.nanmin(series['temperature']), 0.0)
+        self.assertEqual(np.nanmax(series['temperature']), 5.0)
+
+
 class PlotCacheTests(TestCase):
     def setUp(self):
         cache.clear()
@@ -418,9 +986,400 @@ class PlotCacheTests(TestCase):
             rain=0.0,
             is_raining=0,
         )
+        # Write paths (API, merge cron, admin) bump the day's data version.
+        bump_data_version(jd)
         _, _, third_meta = default_plots(fresh=False, **params)
         self.assertFalse(third_meta['cache_hit'])
 
+    @override_settings(PLOT_CACHE_TTL_SECONDS=300)
+    def test_plot_cache_hit_does_not_query_datasets(self):
+        params = {
+            'plot_range': 0.5,
+            'time_resolution': '300',
+        }
+        default_plots(fresh=False, **params)
+        with self.assertNumQueries(0):
+            _, _, meta = default_plots(fresh=False, **params)
+        self.assertTrue(meta['cache_hit'])
+
+    @override_settings(PLOT_CACHE_TTL_SECONDS=300)
+    def test_plot_cache_serves_stale_while_another_worker_rebuilds(self):
+        params = {
+            'plot_range': 0.5,
+            'time_resolution': '300',
+        }
+        first_script, _, _ = default_plots(fresh=False, **params)
+        bump_data_version(Time.now().jd)
+
+        # Another worker holds the rebuild lock for this key.
+        with patch('datasets.plots.acquire_rebuild_lock', return_value=None), \
+                patch('datasets.plots.main_plots') as mocked_build:
+            script, _, meta = default_plots(fresh=False, **params)
+        mocked_build.assert_not_called()
+        self.assertEqual(meta['cache_state'], 'stale')
+        self.assertTrue(meta['cache_hit'])
+        self.assertEqual(script, first_script)
+
+        # Lock free again: this request rebuilds and refreshes the entry.
+        _, _, meta = default_plots(fresh=False, **params)
+        self.assertEqual(meta['cache_state'], 'miss')
+        _, _, meta = default_plots(fresh=False, **params)
+        self.assertEqual(meta['cache_state'], 'hit')
+
+    @override_settings(PLOT_CACHE_TTL_SECONDS=300)
+    def test_busy_render_pool_serves_stale_plots(self):
+        from .render_pool import RenderPoolBusy
+
+        params = {
+            'plot_range': 0.5,
+            'time_resolution': '300',
+        }
+        first_script, _, _ = default_plots(fresh=False, **params)
+        bump_data_version(Time.now().jd)
+
+        with override_settings(PLOT_RENDER_WORKERS=2), \
+                patch('datasets.plots.submit_render', side_effect=RenderPoolBusy) as submit, \
+                patch('datasets.plots.main_plots') as mocked_build:
+            script, _, meta = default_plots(fresh=False, **params)
+            self.assertEqual(meta['cache_state'], 'stale')
+            self.assertEqual(script, first_script)
+            self.assertFalse(submit.call_args.kwargs['wait'])
+
+            # Nothing cached to fall back to: a note instead of a render
+            script, div, meta = default_plots(fresh=False, plot_range=1, time_resolution='600')
+            self.assertEqual(meta['cache_state'], 'busy')
+            self.assertEqual(script, '')
+            self.assertIn('note', div)
+            self.assertTrue(submit.call_args.kwargs['wait'])
+        mocked_build.assert_not_called()
+
+    def test_render_pool_rejects_work_when_saturated(self):
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+
+        from .render_pool import RenderPoolBusy, shutdown_render_pool, submit_render
+
+        release = threading.Event()
+        with override_settings(PLOT_RENDER_WORKERS=1), \
+                patch('datasets.render_pool._new_executor', lambda workers: ThreadPoolExecutor(workers)):
+            shutdown_render_pool()
+            try:
+                running = submit_render(release.wait, 5)
+                with self.assertRaises(RenderPoolBusy):
+                    submit_render(int, '1')
+                # Waiting for a child ends at the deadline of the whole render
+                with self.assertRaises(RenderPoolBusy):
+                    submit_render(int, '1', wait=True, deadline=time.monotonic() + 0.05)
+                release.set()
+                self.assertTrue(running.result(timeout=5))
+                self.assertEqual(submit_render(int, '1', wait=True).result(timeout=5), 1)
+            finally:
+                shutdown_render_pool()
+
+    @override_settings(PLOT_CACHE_TTL_SECONDS=300, PLOT_CACHE_LOCK_WAIT_SECONDS=0)
+    def test_plot_cache_rebuild_lock_is_single_flight(self):
+        from .plot_cache import acquire_rebuild_lock, release_rebuild_lock
+
+        lock = acquire_rebuild_lock('plot_cache:test')
+        self.assertIsNotNone(lock)
+        self.assertIsNone(acquire_rebuild_lock('plot_cache:test'))
+        release_rebuild_lock(lock)
+        second = acquire_rebuild_lock('plot_cache:test')
+        self.assertIsNotNone(second)
+        release_rebuild_lock(second)
+
+        with patch('datasets.plot_cache.cache.add', side_effect=ConnectionError):
+            local = acquire_rebuild_lock('plot_cache:test')
+            self.assertIsNotNone(local.local_lock)
+            self.assertIsNone(acquire_rebuild_lock('plot_cache:test'))
+            release_rebuild_lock(local)
+
+    @override_settings(UPLOAD_AUTH_MODE='dual')
+    def test_upload_bumps_data_version(self):
+        from .data_versions import data_versions
+
+        jd = Time.now().jd
+        before = data_versions(jd, jd)
+        User.objects.create_user(username='data_upload_user', password='test-password')
+        token = base64.b64encode(b'data_upload_user:test-password').decode('ascii')
+        response = APIClient().post(
+            reverse('datasets-api:dataset-create'),
+            {
+                'jd': jd,
+                'temperature': 12.5,
+                'pressure': 1013.0,
+                'humidity': 55.0,
+                'illuminance': 1000.0,
+                'wind_speed': 3.0,
+                'rain': 0.0,
+                'is_raining': 0,
+            },
+            format='json',
+            HTTP_AUTHORIZATION=f'Basic {token}',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(data_versions(jd, jd), before)
+
+    @override_settings(PLOT_CACHE_TTL_SECONDS=300)
+    def test_warm_plot_cache_prerenders_preset(self):
+        from django.core.management import call_command
+        from .forms import plot_form_from_query
+
+        call_command('warm_plot_cache', preset=['0.5:300'], stdout=StringIO())
+        form = plot_form_from_query({'plot_range': '0.5', 'time_resolution': '300'})
+        self.assertTrue(form.is_valid())
+        with self.assertNumQueries(0):
+            _, _, meta = default_plots(fresh=False, **form.cleaned_data)
+        self.assertEqual(meta['cache_state'], 'hit')
+
+    def test_warm_plot_cache_rejects_invalid_preset(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        for preset in ('0.5', 'abc:300', '0.5:-1'):
+            with self.assertRaises(CommandError):
+                call_command('warm_plot_cache', preset=[preset], stdout=StringIO())
+
+
+class PlotChunkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _series(self):
+        import numpy as np
+
+        from .plot_chunks import BIN_EPOCH_JD
+
+        # Six hours of 30 s samples starting on an hour boundary.
+        start = BIN_EPOCH_JD + 20000
+        jd = start + (np.arange(720) + 0.5) * 30.0 / 86400.0
+        return start, jd, np.arange(720, dtype=float)
+
+    def _fetcher(self, jd, values, calls):
+        from .binning import aggregate_bins
+        from .plot_chunks import BIN_EPOCH_JD
+
+        def fetch(lo_jd, hi_jd):
+            calls.append((lo_jd, hi_jd))
+            keep = (jd >= lo_jd) & (jd <= hi_jd)
+            return aggregate_bins(
+                jd[keep],
+                {'temperature': (values[keep], 'median')},
+                300,
+                origin_jd=BIN_EPOCH_JD,
+            )
+        return fetch
+
+    @override_settings(PLOT_CHUNK_BINS=12, PLOT_CHUNK_SETTLE_SECONDS=0)
+    def test_closed_chunks_are_reused(self):
+        import numpy as np
+
+        from .binning import aggregate_bins
+        from .plot_chunks import aligned_bins
+
+        start, jd, values = self._series()
+        end = jd[-1]
+        calls = []
+        fetch = self._fetcher(jd, values, calls)
+        kwargs = {'source': 'exact', 'now_jd': end}
+
+        first_jd, first = aligned_bins(start, end, 300, ['temperature'], fetch, **kwargs)
+        self.assertEqual(len(calls), 2)  # closed chunks + open tail
+
+        calls.clear()
+        second_jd, second = aligned_bins(start, end, 300, ['temperature'], fetch, **kwargs)
+        self.assertEqual(len(calls), 1)
+        # Only the open tail (the final hour chunk) is binned again.
+        self.assertGreaterEqual(calls[0][0], end - 1.0 / 24.0)
+
+        expected_jd, expected = aggregate_bins(
+            jd, {'temperature': (values, 'median')}, 300, origin_jd=start,
+        )
+        np.testing.assert_allclose(first_jd, expected_jd, rtol=0, atol=1e-9)
+        np.testing.assert_allclose(second_jd, expected_jd, rtol=0, atol=1e-9)
+        np.testing.assert_allclose(second['temperature'], expected['temperature'])
+        np.testing.assert_allclose(first['temperature'], expected['temperature'])
+
+    @override_settings(PLOT_CHUNK_BINS=12, PLOT_CHUNK_SETTLE_SECONDS=0)
+    def test_data_version_bump_invalidates_closed_chunks(self):
+        from .plot_chunks import aligned_bins
+
+        start, jd, values = self._series()
+        calls = []
+        fetch = self._fetcher(jd, values, calls)
+        kwargs = {'source': 'exact', 'now_jd': jd[-1]}
+        aligned_bins(start, jd[-1], 300, ['temperature'], fetch, **kwargs)
+
+        # A late row for the first hour bumps that day's version.
+        bump_data_version(start + 0.01)
+        calls.clear()
+        aligned_bins(start, jd[-1], 300, ['temperature'], fetch, **kwargs)
+        self.assertEqual(len(calls), 2)
+
+    @override_settings(PLOT_CHUNK_BINS=12, PLOT_CHUNK_SETTLE_SECONDS=0)
+    def test_range_start_snaps_to_aligned_bin(self):
+        from .plot_chunks import aligned_bins
+
+        start, jd, values = self._series()
+        calls = []
+        fetch = self._fetcher(jd, values, calls)
+        # Start in the middle of a 5-minute bin.
+        bin_jd, binned = aligned_bins(
+            start + 90.0 / 86400.0, jd[-1], 300, ['temperature'], fetch,
+            source='exact', now_jd=jd[-1],
+        )
+        self.assertAlmostEqual(bin_jd[0], start, places=9)
+        self.assertEqual(binned['temperature'][0], 4.5)
+
+
+class BinnedFrameTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.start_dt = now - timedelta(days=3)
+        self.end_dt = now - timedelta(days=2)
+        start_jd = Time(self.start_dt).jd
+        for i in range(12):
+            Dataset.objects.create(
+                jd=start_jd + (i + 0.5) * 600 / 86400.0,
+                temperature=10.0 + i,
+                pressure=1010.0,
+                humidity=50.0,
+                illuminance=100.0,
+                wind_speed=1.0,
+                sky_temp=-5.0,
+                box_temp=20.0,
+                rain=0.0,
+                is_raining=0,
+            )
+
+    def test_one_frame_feeds_main_and_additional_plots(self):
+        from .plots import (
+            FRAME_COLUMNS,
+            MAIN_PLOT_IDENTIFIERS,
+            additional_plots,
+            binned_frame,
+            main_plots,
+        )
+
+        frame = binned_frame(
+            start_dt=self.start_dt, end_dt=self.end_dt, time_resolution=600,
+        )
+        self.assertEqual(frame.values.shape, (len(FRAME_COLUMNS), 12))
+        self.assertTrue(frame.valid.all())
+        self.assertEqual(frame['pm2_5'].shape, frame.bin_jd.shape)
+        self.assertEqual(list(frame['temp_sky_diff'][:2]), [15.0, 16.0])
+
+        with self.assertNumQueries(0):
+            main = main_plots('jd', MAIN_PLOT_IDENTIFIERS, frame=frame)
+            additional = additional_plots(frame=frame)
+        self.assertEqual(set(main), set(MAIN_PLOT_IDENTIFIERS))
+        self.assertIn('temp_combined', additional)
+
+    def test_plot_sets_share_cached_chunks(self):
+        from .plots import binned_frame
+
+        kwargs = {
+            'start_dt': self.start_dt,
+            'end_dt': self.end_dt,
+            'time_resolution': 600,
+            'chunk_cache': True,
+        }
+        first = binned_frame(**kwargs)
+        # Main plots, additional plots and the data API bin the same columns.
+        with self.assertNumQueries(0):
+            second = binned_frame(**kwargs)
+        self.assertEqual(list(second.bin_jd), list(first.bin_jd))
+
+
+class DownsampleTests(TestCase):
+    def _gusty_series(self):
+        import numpy as np
+
+        rng = np.random.default_rng(3)
+        x = 2460000.5 + np.arange(100_000) * 30.0 / 86400.0
+        y = rng.normal(10.0, 1.0, x.size)
+        y[[1234, 56_789]] = [95.0, 120.0]
+        return x, y
+
+    def test_minmax_and_lttb_keep_spikes_within_budget(self):
+        import numpy as np
+
+        from .binning import aggregate_bins
+        from .downsample import BucketAccumulator, bucket_count
+
+        x, y = self._gusty_series()
+        # Median time bins at a similar point count smooth the gusts away
+        _, medians = aggregate_bins(x, {'wind_speed': (y, 'median')}, 1800)
+        self.assertLess(medians['wind_speed'].max(), 20.0)
+
+        for mode in ('minmax', 'lttb'):
+            accumulator = BucketAccumulator(
+                x[0], x[-1], bucket_count(mode, 1000), {'wind_speed': 'median'},
+            )
+            for start in range(0, x.size, 7000):
+                accumulator.add(x[start:start + 7000], {'wind_speed': y[start:start + 7000]})
+            slot_jd, series = (
+                accumulator.minmax() if mode == 'minmax' else accumulator.lttb()
+            )
+            self.assertLessEqual(slot_jd.size, 1000)
+            self.assertTrue(np.all(np.diff(slot_jd) > 0))
+            self.assertIn(95.0, series['wind_speed'])
+            self.assertIn(120.0, series['wind_speed'])
+            self.assertEqual(series['wind_speed'].min(), y.min())
+
+    def test_totals_are_exact(self):
+        import numpy as np
+
+        from .downsample import BucketAccumulator
+
+        x = np.arange(10, dtype=float)
+        accumulator = BucketAccumulator(0.0, 10.0, 2, {'rain': 'sum', 'is_raining': 'mean'})
+        accumulator.add(x[:3], {'rain': np.ones(3), 'is_raining': np.array([1.0, 0.0, 1.0])})
+        accumulator.add(x[3:], {'rain': np.ones(7), 'is_raining': np.zeros(7)})
+        _, series = accumulator.minmax()
+        self.assertEqual(list(series['rain']), [5.0, 5.0])
+        self.assertAlmostEqual(series['is_raining'][0], 0.4)
+
+    def test_downsample_mode_skips_resolution_cap_and_row_limit(self):
+        from .forms import plot_form_from_query
+        from .plots import FRAME_COLUMNS, binned_frame
+
+        form = plot_form_from_query({
+            'plot_range': '30', 'time_resolution': '1', 'downsample': 'minmax',
+        })
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['time_resolution'], '1')
+        self.assertFalse(form.cleaned_data['resolution_adjusted'])
+
+        now_jd = Time.now().jd
+        for i in range(20):
+            Dataset.objects.create(
+                jd=now_jd - 0.1 + i * 0.001,
+                temperature=10.0,
+                pressure=1010.0,
+                humidity=50.0,
+                illuminance=100.0,
+                wind_speed=80.0 if i == 7 else 5.0,
+                rain=0.0,
+                is_raining=0,
+            )
+        with patch('datasets.plots.MAX_PLOT_ROWS', 5):
+            binned = binned_frame(plot_range=0.5, time_resolution=300)
+            shaped = binned_frame(plot_range=0.5, time_resolution=300, downsample='lttb')
+        self.assertIsNotNone(binned.note)
+        self.assertIsNone(shaped.note)
+        self.assertEqual(shaped.columns, tuple(FRAME_COLUMNS))
+        self.assertEqual(shaped['wind_speed'].max(), 80.0)
+
+        with patch('datasets.plots.MAX_PLOT_ROWS', 5):
+            _, div, _ = default_plots(
+                fresh=True, plot_range=0.5, time_resolution='300', downsample='minmax',
+            )
+        self.assertNotIn('note', div)
+        self.assertIn('wind_speed', div)
+
 
 class PlotTimezoneTests(TestCase):
     def test_jd_array_to_local_dt_uses_berlin_wall_clock(self):
@@ -461,6 +1420,35 @@ class PlotTimezoneTests(TestCase):
             convert_datetime_type(dt(2024, 1, 15, 13, 0)),
         )
 
+    def test_local_datetime64_matches_zoneinfo_across_dst(self):
+        from datetime import datetime as dt, timezone as dt_timezone
+        from zoneinfo import ZoneInfo
+
+        import numpy as np
+
+        from .plots import _series_axis_label, jd_array_to_local_datetime64
+
+        berlin = ZoneInfo('Europe/Berlin')
+        # 10 min steps over both 2024 transitions, plus the exact instants
+        start_jd = Time('2024-03-30T00:00:00').jd
+        jd = np.concatenate([
+            start_jd + np.arange(0, 215 * 144) / 144.0,
+            [Time('2024-03-31T01:00:00').jd, Time('2024-10-27T01:00:00').jd],
+        ])
+        local = jd_array_to_local_datetime64(jd)
+        self.assertEqual(local.dtype, np.dtype('datetime64[ms]'))
+
+        utc_ms = np.rint((jd - 2440587.5) * 86_400_000).astype(np.int64)
+        expected = np.array([
+            dt.fromtimestamp(ms / 1000, dt_timezone.utc).astimezone(berlin).replace(tzinfo=None)
+            for ms in utc_ms.tolist()
+        ], dtype='datetime64[ms]')
+        np.testing.assert_array_equal(local, expected)
+        self.assertEqual(str(local[-2]), '2024-03-31T03:00:00.000')
+        self.assertEqual(str(local[-1]), '2024-10-27T02:00:00.000')
+        self.assertEqual(_series_axis_label(jd[:2]), 'Time [CET]')
+        self.assertEqual(_series_axis_label(jd[:200]), 'Time [CET/CEST]')
+
     @override_settings(PLOT_DISPLAY_TIMEZONE='UTC')
     def test_plot_timezone_setting_utc(self):
         from .plots import _plot_axis_label, jd_array_to_local_dt
@@ -481,6 +1469,317 @@ class PlotTimezoneTests(TestCase):
         self.assertEqual(_plot_axis_label(summer_dt), 'Time [EDT]')
 
 
+@override_settings(UPLOAD_AUTH_MODE='dual')
+class AsyncReadAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+
+    async def test_download_csv_streams_from_async_iterator(self):
+        from .api import async_views
+
+        await Dataset.objects.acreate(jd=Time.now().jd - 0.01, temperature=7.5, pressure=1000.0, note='=CMD()')
+        request = self.factory.get('/weather_api/download-csv/', {'dl': 'csv', 'last_24h': '1'})
+        response = await async_views.download_csv(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode('utf-8')
+        lines = body.strip().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("'=CMD()", lines[1])
+
+        request = self.factory.get('/weather_api/download-csv/', {
+            'start_date': '2024-02-10', 'end_date': '2024-02-01',
+        })
+        response = await async_views.download_csv(request)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_cached_downloads_are_throttled(self):
+        from .api import async_views
+        from .api.throttles import DownloadRateThrottle
+
+        query = {'start_date': '2024-02-01', 'end_date': '2024-02-10'}
+        with patch.object(DownloadRateThrottle, 'THROTTLE_RATES', {'downloads': '1/min'}):
+            first = await async_views.download_csv(self.factory.get('/weather_api/download-csv/', query))
+            # Same URL: the page cache has the response, the throttle still applies
+            second = await async_views.download_csv(self.factory.get('/weather_api/download-csv/', query))
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 429)
+
+    async def test_plot_data_and_last_dataset(self):
+        from .api import async_views
+
+        request = self.factory.get('/weather_api/plot-data/', {'plot_range': 'x', 'time_resolution': '300'})
+        response = await async_views.plot_data_view(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['code'], 'invalid_plot_params')
+
+        request = self.factory.get('/weather_api/last_dataset/')
+        self.assertEqual((await async_views.get_last_dataset(request)).status_code, 404)
+
+        await Dataset.objects.acreate(jd=Time.now().jd - 0.001, temperature=9.0, pressure=1000.0)
+        request = self.factory.get('/weather_api/plot-data/', {
+            'set': 'additional', 'plot_range': '0.5', 'time_resolution': '300',
+        })
+        response = await async_views.plot_data_view(request)
+        self.assertEqual(response.status_code, 200)
+        payload = json.loads(response.content)
+        self.assertEqual((payload['set'], payload['length']), ('additional', 1))
+
+        response = await async_views.get_last_dataset(self.factory.get('/weather_api/last_dataset/'))
+        self.assertEqual(json.loads(response.content)['temperature'], 9.0)
+
+
+class CurrentConditionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='data_upload_user', password='test-password')
+        token = base64.b64encode(b'data_upload_user:test-password').decode('ascii')
+        self.auth = {'HTTP_AUTHORIZATION': f'Basic {token}'}
+
+    def _upload(self, **overrides):
+        payload = {
+            'jd': Time.now().jd,
+            'temperature': 12.5,
+            'pressure': 1013.0,
+            'humidity': 55.0,
+            'illuminance': 1000.0,
+            'wind_speed': 50.0,
+            'sky_temp': 10.0,
+            'box_temp': 15.0,
+            'rain': 0.0,
+            'is_raining': 0,
+        }
+        payload.update(overrides)
+        response = APIClient().post(
+            reverse('datasets-api:dataset-create'), payload, format='json', **self.auth,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response
+
+    def test_upload_refreshes_snapshot_and_last_dataset_reads_it(self):
+        self._upload(temperature=11.0)
+        latest = self._upload(temperature=14.0, rain=1.25)
+
+        snapshot = cache.get(conditions.CACHE_KEY)
+        self.assertEqual(snapshot['reading']['pk'], latest.data['pk'])
+        self.assertAlmostEqual(snapshot['wind_mps'], 50.0 * conditions.WIND_ROTATIONS_TO_MPS)
+        self.assertEqual(snapshot['rain_sum_30min'], 1.25)
+        self.assertEqual(snapshot['icon_title'], 'Light rain / drizzle')
+
+        with self.assertNumQueries(0):
+            response = APIClient().get(reverse('datasets-api:last_dataset'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['pk'], latest.data['pk'])
+        self.assertEqual(response.data['temperature'], 14.0)
+
+    def test_cache_miss_rebuilds_from_database(self):
+        Dataset.objects.create(jd=Time.now().jd, temperature=3.0, pressure=1000.0, humidity=60.0)
+        self.assertIsNone(cache.get(conditions.CACHE_KEY))
+        snapshot = conditions.current_conditions()
+        self.assertEqual(snapshot['reading']['temperature'], 3.0)
+        self.assertIsNotNone(cache.get(conditions.CACHE_KEY))
+
+    def test_icon_follows_day_and_night(self):
+        reading = {'temperature': 10.0, 'humidity': 40.0, 'sky_temp': -10.0, 'is_raining': 0}
+        self.assertEqual(conditions.select_icon(reading, 0.0, 1.0, True), ('wi-day-sunny', 'Clear'))
+        self.assertEqual(
+            conditions.select_icon(reading, 0.0, 1.0, False, moon_phase=180.0),
+            ('wi-moon-full', 'Clear'),
+        )
+
+
+@override_settings(LIVE_STREAM_ENABLED=True, REDIS_URL='')
+class LiveStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _bin_start(self, index, resolution=300):
+        return live.BIN_EPOCH_JD + index * resolution / 86400.0
+
+    def _reading(self, jd, temperature):
+        return Dataset.objects.create(
+            jd=jd, temperature=temperature, pressure=1010.0, humidity=50.0,
+        )
+
+    def test_closed_bins_payload_bins_like_the_plots(self):
+        now_bin = int((Time.now().jd - live.BIN_EPOCH_JD) * 86400 // 300)
+        first = now_bin - 3
+        self._reading(self._bin_start(first) + 0.0001, 10.0)
+        self._reading(self._bin_start(first) + 0.0002, 14.0)
+        self._reading(self._bin_start(first + 1) + 0.0001, 20.0)
+
+        payload = live.closed_bins_payload(first, first + 1, 300)
+        self.assertEqual(payload['bins'], [first, first + 1])
+        self.assertEqual(payload['length'], 2)
+        main = payload['sets']['main']
+        self.assertEqual(main['columns']['temperature'], [12.0, 20.0])
+        self.assertEqual(main['x'], live.jd_array_to_local_epoch_ms(
+            [self._bin_start(first), self._bin_start(first + 1)],
+        ).tolist())
+        self.assertIn('dew_point', payload['sets']['additional']['columns'])
+
+    @override_settings(LIVE_STREAM_MAX_SECONDS=0)
+    def test_stream_sends_bins_closed_by_a_new_reading(self):
+        now_bin = int((Time.now().jd - live.BIN_EPOCH_JD) * 86400 // 300)
+        open_bin = now_bin - 2
+        self._reading(self._bin_start(open_bin) + 0.0001, 7.0)
+        new_reading = self._reading(self._bin_start(open_bin + 1) + 0.0001, 9.0)
+        live.publish_reading(new_reading.jd)
+
+        messages = list(live.bin_stream(
+            300, now_jd=self._bin_start(open_bin) + 0.0002,
+        ))
+        self.assertTrue(messages[0].startswith('retry: '))
+        self.assertIn(f'id: {open_bin}\nevent: bins\n', messages[1])
+        self.assertIn('"temperature":[7.0]', messages[1])
+
+        # A reconnect after that bin has nothing new
+        resumed = list(live.bin_stream(300, last_event_id=str(open_bin)))
+        self.assertEqual(len(resumed), 1)
+
+    @override_settings(LIVE_STREAM_MAX_SECONDS=0)
+    @patch('datasets.live.live_updates_shared', return_value=True)
+    def test_endpoint_streams_events(self, _shared):
+        response = APIClient().get(
+            reverse('datasets-api:live-stream'),
+            {'plot_range': '0.5', 'time_resolution': '300'},
+            HTTP_ACCEPT='text/event-stream',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('retry: '))
+
+    def test_process_local_cache_without_redis_keeps_streams_off(self):
+        from django.core.checks import run_checks
+
+        # Uploads in other workers would never reach the LocMem cache here
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}):
+            self.assertFalse(live.live_stream_enabled())
+            self.assertIn('weather.W001', [message.id for message in run_checks()])
+        with override_settings(REDIS_URL='redis://localhost:6379/0'):
+            self.assertTrue(live.live_stream_enabled())
+
+    @override_settings(LIVE_STREAM_ENABLED=False)
+    def test_endpoint_disabled_by_default(self):
+        response = APIClient().get(
+            reverse('datasets-api:live-stream'),
+            HTTP_ACCEPT='text/event-stream',
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class EphemerisTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ephemeris.clear_memo()
+
+    def test_summer_solstice_sun_times_in_berlin(self):
+        entry = ephemeris.day_ephemeris(date(2026, 6, 21), 'Europe/Berlin')
+        berlin = ZoneInfo('Europe/Berlin')
+        self.assertEqual(ephemeris.local_clock(entry['sunrise'], berlin)[:2], '04')
+        self.assertEqual(ephemeris.local_clock(entry['sunset'], berlin)[:2], '21')
+        self.assertTrue(ephemeris.is_daytime(entry, entry['day_start'] + 12 * 3600))
+        self.assertFalse(ephemeris.is_daytime(entry, entry['day_start'] + 3600))
+        angle = ephemeris.moon_phase_angle(entry, entry['day_start'])
+        self.assertAlmostEqual(angle, entry['moon_phase_start'])
+
+    def test_days_are_computed_once_and_shared_through_cache(self):
+        with patch('datasets.ephemeris.compute_day', wraps=ephemeris.compute_day) as compute:
+            with patch('datasets.ephemeris.Observer') as mock_observer_cls:
+                observer = mock_observer_cls.return_value
+                observer.sun_rise_time.return_value = Time('2026-04-16 04:30:00')
+                observer.sun_set_time.return_value = Time('2026-04-16 18:15:00')
+                self.assertEqual(ephemeris.precompute(days=2, start=date(2026, 4, 16)), 3)
+                self.assertEqual(compute.call_count, 3)
+
+                ephemeris.precompute(days=2, start=date(2026, 4, 16))
+                ephemeris.clear_memo()
+                ephemeris.day_ephemeris(date(2026, 4, 17), 'Europe/Berlin')
+                self.assertEqual(compute.call_count, 3)
+                self.assertEqual(mock_observer_cls.call_count, 1)
+
+    @override_settings(PLOT_DISPLAY_TIMEZONE='Not/AZone')
+    def test_invalid_display_timezone_falls_back_to_utc(self):
+        self.assertEqual(ephemeris.display_timezone()[0], 'UTC')
+
+
+class ReplayStoreTests(TestCase):
+    DIGEST = 'ab' * 32
+
+    def setUp(self):
+        cache.clear()
+
+    def _race(self, digests):
+        """Reserve one nonce from a thread per digest, released together."""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        from datasets.api.replay import ReplayConflict, reserve_nonce
+
+        barrier = threading.Barrier(len(digests))
+
+        def attempt(digest):
+            barrier.wait()
+            try:
+                return reserve_nonce('race-dev', 'key1', 'cd' * 16, digest).created
+            except ReplayConflict:
+                return 'conflict'
+
+        with ThreadPoolExecutor(max_workers=len(digests)) as pool:
+            return list(pool.map(attempt, digests))
+
+    def _assert_single_winner(self):
+        from datasets.api.replay import mark_success, reserve_nonce
+
+        results = self._race([self.DIGEST] * 16)
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(results.count(False), 15)
+
+        #   Another body with the same nonce never wins
+        results = self._race(['ef' * 32] * 4)
+        self.assertEqual(results, ['conflict'] * 4)
+
+        reservation = reserve_nonce('race-dev', 'key1', 'ab' * 16, self.DIGEST)
+        self.assertTrue(reservation.created)
+        mark_success(reservation, self.DIGEST, 42)
+        retry = reserve_nonce('race-dev', 'key1', 'ab' * 16, self.DIGEST)
+        self.assertFalse(retry.created)
+        self.assertEqual(retry.stored_pk(), 42)
+
+    def test_duplicate_nonce_race_cache_backend(self):
+        with override_settings(UPLOAD_REPLAY_BACKEND='cache'):
+            self._assert_single_winner()
+
+    @skipUnless(os.environ.get('TEST_REDIS_URL'), 'TEST_REDIS_URL not set')
+    def test_duplicate_nonce_race_redis_backend(self):
+        from datasets.redis_client import redis_client
+
+        prefix = f'test-{os.getpid()}:'
+        with override_settings(
+                REDIS_URL=os.environ['TEST_REDIS_URL'],
+                UPLOAD_REPLAY_BACKEND='redis',
+                UPLOAD_REPLAY_REDIS_PREFIX=prefix,
+        ):
+            client = redis_client()
+            try:
+                self._assert_single_winner()
+            finally:
+                keys = list(client.scan_iter(f'{prefix}*'))
+                if keys:
+                    client.delete(*keys)
+
+    def test_redis_backend_without_url_is_unavailable(self):
+        from datasets.api.replay import ReplayStoreUnavailable, reserve_nonce
+
+        with override_settings(REDIS_URL='', UPLOAD_REPLAY_BACKEND='redis'):
+            with self.assertRaises(ReplayStoreUnavailable):
+                reserve_nonce('race-dev', 'key1', 'ab' * 16, self.DIGEST)
+
+
 class SecurityRemediationTests(TestCase):
     def setUp(self):
         cache.clear()
@@ -620,6 +1919,192 @@ class SecurityRemediationTests(TestCase):
         self.assertEqual(Dataset.objects.count(), 1)
         self.assertEqual(Dataset.objects.get().upload_device_id, device.pk)
 
+    def _post_batch(self, rows, nonce, body=None):
+        from datasets.hmac_client import BATCH_CONTENT_TYPE, BATCH_PATH, encode_ndjson, sign_body
+
+        body = encode_ndjson(rows) if body is None else body
+        body, headers = sign_body(
+            self.secret,
+            device_id='batch-dev',
+            key_id='key1',
+            body=body,
+            nonce=nonce,
+            path=BATCH_PATH,
+            content_type=BATCH_CONTENT_TYPE,
+        )
+        return self.client.post(
+            reverse('datasets-api:dataset-batch-create'),
+            data=body,
+            content_type=headers['Content-Type'],
+            HTTP_X_WEATHER_DEVICE=headers['X-Weather-Device'],
+            HTTP_X_WEATHER_KEY_ID=headers['X-Weather-Key-Id'],
+            HTTP_X_WEATHER_TIMESTAMP=headers['X-Weather-Timestamp'],
+            HTTP_X_WEATHER_NONCE=headers['X-Weather-Nonce'],
+            HTTP_X_WEATHER_SIGNATURE=headers['X-Weather-Signature'],
+        )
+
+    def test_hmac_batch_upload_and_idempotent_retry(self):
+        device, self.secret = self._provision_device(device_id='batch-dev')
+        now_jd = Time.now().jd
+        rows = [
+            self._sample_payload(jd=now_jd - (3 - i) / 1440.0, temperature=10.0 + i)
+            for i in range(3)
+        ]
+        nonce = '0123456789abcdef0123456789abcdef'
+        r1 = self._post_batch(rows, nonce)
+        r2 = self._post_batch(rows, nonce)
+        self.assertEqual(r1.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(r1.data['count'], 3)
+        self.assertEqual(r2.status_code, status.HTTP_200_OK)
+        self.assertEqual(r2.data['pks'], r1.data['pks'])
+        self.assertEqual(Dataset.objects.filter(upload_device=device).count(), 3)
+        self.assertEqual(
+            sorted(Dataset.objects.values_list('temperature', flat=True)),
+            [10.0, 11.0, 12.0],
+        )
+        #   The single-reading endpoint does not accept the batch signature
+        with override_settings(UPLOAD_AUTH_MODE='hmac_only'):
+            response = self.client.post(
+                self.create_url,
+                data=b'{}',
+                content_type='application/x-ndjson',
+                HTTP_X_WEATHER_DEVICE='batch-dev',
+                HTTP_X_WEATHER_KEY_ID='key1',
+                HTTP_X_WEATHER_TIMESTAMP=str(int(Time.now().unix)),
+                HTTP_X_WEATHER_NONCE='f' * 32,
+                HTTP_X_WEATHER_SIGNATURE='0' * 64,
+            )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_hmac_batch_rejects_invalid_and_oversized(self):
+        _, self.secret = self._provision_device(device_id='batch-dev')
+        rows = [self._sample_payload(), self._sample_payload(humidity=150.0)]
+        response = self._post_batch(rows, 'a' * 32)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Dataset.objects.count(), 0)
+
+        response = self._post_batch(None, 'b' * 32, body=b'{"jd": 1}\nnot json\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['code'], 'invalid_batch')
+
+        with override_settings(UPLOAD_BATCH_MAX_ROWS=2):
+            response = self._post_batch([self._sample_payload()] * 3, 'c' * 32)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Dataset.objects.count(), 0)
+
+    def test_upload_credentials_cached_until_revoked(self):
+        from django.core.management import call_command
+
+        from datasets.api.credential_cache import get_credential
+
+        device, secret = self._provision_device(device_id='cached-dev')
+        first = get_credential('cached-dev', 'key1')
+        self.assertEqual(first.secret, secret)
+        with self.assertNumQueries(0):
+            self.assertIs(get_credential('cached-dev', 'key1'), first)
+
+        call_command('revoke_upload_key', device_id='cached-dev', key_id='key1', stdout=StringIO())
+        refreshed = get_credential('cached-dev', 'key1')
+        self.assertIsNot(refreshed, first)
+        self.assertIsNotNone(refreshed.signing_key.revoked_at)
+
+        # Saves that leave is_active alone keep the cache and skip the device lookup
+        service_user = device.service_user
+        with self.assertNumQueries(1):
+            service_user.first_name = 'Station'
+            service_user.save()
+        with self.assertNumQueries(0):
+            self.assertIs(get_credential('cached-dev', 'key1'), refreshed)
+
+        # Deactivating the service user drops the cached device, too
+        service_user.is_active = False
+        service_user.save()
+        self.assertFalse(get_credential('cached-dev', 'key1').device.service_user.is_active)
+
+    def test_queued_ingest_acknowledges_and_writer_stores(self):
+        from datasets.api.replay import lookup_reservation
+        from datasets.ingest import write_entries
+
+        _, self.secret = self._provision_device(device_id='batch-dev')
+        rows = [self._sample_payload(temperature=t) for t in (5.0, 6.0)]
+        queued = []
+
+        def enqueue(rows, device, replay_key='', body_digest='', batch=False):
+            queued.append((f'1-{len(queued)}', {
+                'rows': json.dumps(list(rows)),
+                'device': str(device.pk),
+                'replay_key': replay_key,
+                'body_digest': body_digest,
+                'batch': '1' if batch else '0',
+            }))
+            return queued[-1][0]
+
+        nonce = 'feed' * 8
+        with override_settings(UPLOAD_INGEST_MODE='queue'), \
+                patch('datasets.api.views.enqueue_readings', side_effect=enqueue):
+            response = self._post_batch(rows, nonce)
+            retry = self._post_batch(rows, nonce)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(retry.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(queued), 1)
+        self.assertEqual(Dataset.objects.count(), 0)
+
+        inserted, failed = write_entries(queued)
+        self.assertEqual((inserted, failed), (2, []))
+        replay_key = queued[0][1]['replay_key']
+        pks = lookup_reservation(replay_key).stored_pks()
+        self.assertEqual(sorted(pks), sorted(Dataset.objects.values_list('pk', flat=True)))
+        #   Redelivery of an entry that was stored but not acknowledged
+        self.assertEqual(write_entries(queued), (0, []))
+        self.assertEqual(Dataset.objects.count(), 2)
+        self.assertEqual(self._post_batch(rows, nonce).data['pks'], pks)
+
+    def test_dead_lettered_upload_is_queued_again_on_retry(self):
+        from django.db import DatabaseError
+
+        from datasets.ingest import drain_once, requeue_failed
+
+        _, self.secret = self._provision_device(device_id='batch-dev')
+        rows = [self._sample_payload(temperature=5.0)]
+        queued = []
+
+        def enqueue(rows, device, replay_key='', body_digest='', batch=False):
+            queued.append((f'1-{len(queued)}'.encode('ascii'), {
+                b'rows': json.dumps(list(rows)).encode('utf-8'),
+                b'device': str(device.pk).encode('ascii'),
+                b'replay_key': replay_key.encode('utf-8'),
+                b'body_digest': body_digest.encode('ascii'),
+                b'batch': b'1' if batch else b'0',
+            }))
+            return queued[-1][0].decode('ascii')
+
+        nonce = 'dead' * 8
+        client = MagicMock()
+        client.xautoclaim.return_value = (b'0-0', [])
+        with override_settings(UPLOAD_INGEST_MODE='queue', UPLOAD_REPLAY_BACKEND='cache'), \
+                patch('datasets.api.views.enqueue_readings', side_effect=enqueue):
+            self.assertEqual(self._post_batch(rows, nonce).status_code, status.HTTP_202_ACCEPTED)
+            client.xreadgroup.return_value = [(b'weather:ingest', list(queued))]
+            with patch('datasets.ingest.redis_client', return_value=client), \
+                    patch('datasets.ingest._insert', side_effect=DatabaseError('boom')):
+                self.assertEqual(drain_once('writer', block_ms=None), 1)
+            client.xadd.assert_called_once()
+            self.assertEqual(client.xadd.call_args[0][0], 'weather:ingest:failed')
+
+            # Taken in again instead of {'queued': True} until the TTL expires
+            retry = self._post_batch(rows, nonce)
+        self.assertEqual(retry.status_code, status.HTTP_202_ACCEPTED)
+        self.assertIn('entry', retry.data)
+        self.assertEqual(len(queued), 2)
+
+        client.reset_mock()
+        client.xrange.return_value = [(b'2-0', {**queued[0][1], b'entry': b'1-0'})]
+        with patch('datasets.ingest.redis_client', return_value=client):
+            self.assertEqual(requeue_failed(), 1)
+        self.assertNotIn('entry', client.xadd.call_args[0][1])
+        self.assertEqual(client.xadd.call_args[0][0], 'weather:ingest')
+        client.xdel.assert_called_once_with('weather:ingest:failed', b'2-0')
+
     def test_hmac_rejects_body_tamper(self):
         device, secret = self._provision_device(device_id='tamper-dev', key_id='k2')
         from datasets.hmac_client import encode_form, build_canonical
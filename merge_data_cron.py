@@ -2,19 +2,11 @@
 #                               Libraries                                  #
 ############################################################################
 
+import io
 import os
 
 import sys
 
-import time
-import datetime
-
-import numpy as np
-
-import astropy.units as u
-from astropy.time import Time
-from astropy.timeseries import TimeSeries, aggregate_downsample
-
 sys.path.append('../')
 os.environ["DJANGO_SETTINGS_MODULE"] = "weather_station.settings"
 
@@ -37,36 +29,14 @@ if 'django' in _cron_loggers:
 django.setup()
 logging.getLogger('axes').setLevel(logging.WARNING)
 
-from datasets.models import Dataset
-from django.db import transaction
-from django.utils import timezone
-
-MIN_ROWS_FOR_DOWNSAMPLE = 2
+from django.core.management import call_command
+from django.core.management.base import CommandError
 
 
 def _error(message):
     print(message, file=sys.stderr)
 
 
-def _jd_span_seconds(jd_values):
-    return float((np.max(jd_values) - np.min(jd_values)) * 86400.0)
-
-
-def _safe_downsample(time_series, bin_size_seconds, aggregate_func, label):
-    try:
-        return aggregate_downsample(
-            time_series,
-            time_bin_size=float(bin_size_seconds) * u.s,
-            aggregate_func=aggregate_func,
-        )
-    except (IndexError, ValueError) as exc:
-        _error(
-            f'Downsample failed for {label} '
-            f'(rows={len(time_series)}, bin_size={bin_size_seconds}s): {exc}'
-        )
-        return None
-
-
 ############################################################################
 #                                  Main                                    #
 ############################################################################
@@ -78,185 +48,33 @@ if __name__ == '__main__':
         sys.exit(2)
 
     arguments = sys.argv
-    # for i, arg in enumerate(arguments):
-    #     print(f"Argument {i:>6}: {arg}")
 
     #   Days to go back to merge the data.
     #   Keep the most recent 1–3 days as merged=False so the dashboard can show
     #   high-resolution live data; only merge windows older than that span.
-    # days_to_go_back = 90
-    # days_to_go_back = 0
-    days_to_go_back = float(arguments[1])  
+    days_to_go_back = float(arguments[1])
 
     #   Time span to merge
     merge_time_span = float(arguments[2])
 
     #   Bin size in seconds
-    # bin_size = 600.
     bin_size = float(arguments[3])
 
     #   Set test variable
-    if len(sys.argv) == 5 and arguments[4] == 'true':
-        test_only = True
-    else:
-        test_only = False
-
-    #   Load datasets
-    jd_current = Time(datetime.datetime.now(datetime.timezone.utc)).jd
-
-    #   Check provided time for consistency
-    if days_to_go_back < merge_time_span:
-        _error('Provided times are inconsistent. The time span to merge is greater than the time span to go back.')
-        sys.exit(2)
-
-    #   Get requested range of data (unmerged), ordered by time
-    data_range = Dataset.objects.filter(
-        jd__range=[
-            jd_current - days_to_go_back,
-            jd_current - days_to_go_back + merge_time_span
-        ],
-        merged=False
-    ).order_by('jd')
-    # print(data_range)
-
-    x_identifier = 'jd'
-    # Include additional fields introduced in the model
-    y_identifier_list = [
-        'temperature',
-        'pressure',
-        'humidity',
-        'illuminance',
-        'wind_speed',
-        'rain',
-        'sky_temp',
-        'box_temp',
-        'is_raining',
-        'pm1_0',
-        'pm2_5',
-        'pm10',
-        'uv_index',
-    ]
-    row_count = data_range.count()
-    if row_count == 0:
-        sys.exit(0)
+    test_only = len(sys.argv) == 5 and arguments[4] == 'true'
 
-    if row_count < MIN_ROWS_FOR_DOWNSAMPLE:
-        sys.exit(0)
-
-    data = np.array(list(data_range.values_list(x_identifier, *y_identifier_list)))
-
-    jd_span_seconds = _jd_span_seconds(data[:, 0])
-    if jd_span_seconds < bin_size:
-        sys.exit(0)
-
-    #   Verify that data was returned
-    if data.size != 0:
-        ts_time = Time(data[:, 0], format='jd')
-        time_series_to_average = TimeSeries(
-            time=ts_time,
-            data={
-                'temperature': data[:, 1],
-                'pressure': data[:, 2],
-                'humidity': data[:, 3],
-                'illuminance': data[:, 4],
-                'wind_speed': data[:, 5],
-                'sky_temp': data[:, 7],
-                'box_temp': data[:, 8],
-                'pm1_0': data[:, 10],
-                'pm2_5': data[:, 11],
-                'pm10': data[:, 12],
-                'uv_index': data[:, 13],
-            }
-        )
-        time_series_to_sum = TimeSeries(
-            time=ts_time,
-            data={'rain': data[:, 6]},
-        )
-        time_series_flag = TimeSeries(
-            time=ts_time,
-            data={'is_raining': data[:, 9]},
+    #   The merge runs in day chunks with checkpoints (datasets.merge);
+    #   --catch-up also merges the windows of days the cron did not run.
+    try:
+        call_command(
+            'merge_data',
+            days_back=days_to_go_back,
+            span=merge_time_span,
+            bin_size=bin_size,
+            catch_up=True,
+            dry_run=test_only,
+            stdout=io.StringIO(),
         )
-
-        if len(time_series_to_average) and len(time_series_to_sum):
-            time_series_averaged = _safe_downsample(
-                time_series_to_average, bin_size, np.nanmedian, 'averages',
-            )
-            time_series_summed = _safe_downsample(
-                time_series_to_sum, bin_size, np.nansum, 'rain',
-            )
-            time_series_flagged = _safe_downsample(
-                time_series_flag, bin_size, np.nanmax, 'is_raining',
-            )
-            if (
-                time_series_averaged is None
-                or time_series_summed is None
-                or time_series_flagged is None
-            ):
-                _error('Downsample produced no result; leaving unmerged data unchanged.')
-                sys.exit(1)
-
-            # print(time_series_averaged)
-            # print(time_series_to_average)
-            # Build a robust mask across key averaged columns
-            mask = np.invert(time_series_averaged['temperature'].mask)
-            for col in ['pressure', 'humidity', 'illuminance', 'wind_speed']:
-                mask = mask & np.invert(time_series_averaged[col].mask)
-
-            # print(time_series_averaged)
-            # Use bin midpoint for new records (start + bin_size/2)
-            new_time_jd = time_series_averaged['time_bin_start'].value[mask] + (float(bin_size) / 86400.0) / 2.0
-            averaged_temperature = time_series_averaged['temperature'].value[mask]
-            averaged_pressure = time_series_averaged['pressure'].value[mask]
-            averaged_humidity = time_series_averaged['humidity'].value[mask]
-            averaged_illuminance = time_series_averaged['illuminance'].value[mask]
-            averaged_wind_speed = time_series_averaged['wind_speed'].value[mask]
-            averaged_sky_temp = time_series_averaged['sky_temp'].value[mask]
-            averaged_box_temp = time_series_averaged['box_temp'].value[mask]
-            averaged_pm1_0 = time_series_averaged['pm1_0'].value[mask]
-            averaged_pm2_5 = time_series_averaged['pm2_5'].value[mask]
-            averaged_pm10 = time_series_averaged['pm10'].value[mask]
-            averaged_uv_index = time_series_averaged['uv_index'].value[mask]
-            summed_rain = time_series_summed['rain'].value[mask]
-            flagged_raining = time_series_flagged['is_raining'].value[mask]
-
-            if not np.any(mask):
-                _error('Downsample yielded no usable bins after masking; skipping merge.')
-                sys.exit(1)
-
-            # print('--------')
-            # print(new_time_jd)
-            # print(averaged_temperature)
-            # print(summed_rain)
-            # sys.exit()
-
-            if not test_only:
-                instances = []
-                for i, new_jd in enumerate(new_time_jd):
-                    # Convert JD midpoint to aware datetime (UTC)
-                    dt_naive = Time(new_jd, format='jd').to_datetime()
-                    dt_aware = timezone.make_aware(dt_naive, timezone=datetime.timezone.utc) if timezone.is_naive(dt_naive) else dt_naive
-
-                    new_dataset = Dataset(
-                        jd=float(new_jd),
-                        temperature=float(averaged_temperature[i]) if not np.isnan(averaged_temperature[i]) else None,
-                        pressure=float(averaged_pressure[i]) if not np.isnan(averaged_pressure[i]) else None,
-                        humidity=float(averaged_humidity[i]) if not np.isnan(averaged_humidity[i]) else None,
-                        illuminance=float(averaged_illuminance[i]) if not np.isnan(averaged_illuminance[i]) else None,
-                        wind_speed=float(averaged_wind_speed[i]) if not np.isnan(averaged_wind_speed[i]) else None,
-                        rain=float(summed_rain[i]) if not np.isnan(summed_rain[i]) else 0.0,
-                        sky_temp=float(averaged_sky_temp[i]) if not np.isnan(averaged_sky_temp[i]) else None,
-                        box_temp=float(averaged_box_temp[i]) if not np.isnan(averaged_box_temp[i]) else None,
-                        is_raining=int(flagged_raining[i]) if not np.isnan(flagged_raining[i]) else 0,
-                        pm1_0=int(np.rint(averaged_pm1_0[i])) if not np.isnan(averaged_pm1_0[i]) else 0,
-                        pm2_5=int(np.rint(averaged_pm2_5[i])) if not np.isnan(averaged_pm2_5[i]) else 0,
-                        pm10=int(np.rint(averaged_pm10[i])) if not np.isnan(averaged_pm10[i]) else 0,
-                        uv_index=int(np.rint(averaged_uv_index[i])) if not np.isnan(averaged_uv_index[i]) else 0,
-                        merged=True,
-                        added_on=dt_aware,
-                    )
-                    instances.append(new_dataset)
-
-                with transaction.atomic():
-                    Dataset.objects.bulk_create(instances, batch_size=1000)
-                    # Remove original unmerged rows in the processed window
-                    data_range.delete()
+    except CommandError as exc:
+        _error(str(exc))
+        sys.exit(2)
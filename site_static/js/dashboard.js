@@ -203,7 +203,7 @@ document.addEventListener('DOMContentLoaded', function () {
 
     function plotQueryParams() {
         const source = new URLSearchParams(window.location.search);
-        const allowed = ['plot_range', 'time_resolution', 'start_date', 'end_date', 'fresh'];
+        const allowed = ['plot_range', 'time_resolution', 'start_date', 'end_date', 'downsample', 'fresh'];
         const params = new URLSearchParams();
         let hasRange = false;
 
@@ -286,6 +286,168 @@ document.addEventListener('DOMContentLoaded', function () {
             });
     }
 
+    function decodeFloat64(encoded) {
+        // Little-endian float64 buffers from the plot data API
+        const binary = atob(encoded || '');
+        const view = new DataView(new ArrayBuffer(binary.length));
+        for (let i = 0; i < binary.length; i++) {
+            view.setUint8(i, binary.charCodeAt(i));
+        }
+        const values = new Float64Array(binary.length / 8);
+        for (let i = 0; i < values.length; i++) {
+            values[i] = view.getFloat64(i * 8, true);
+        }
+        return values;
+    }
+
+    function findPlotSource(name) {
+        if (!window.Bokeh || !window.Bokeh.documents) {
+            return null;
+        }
+        for (const doc of window.Bokeh.documents) {
+            const model = doc.get_model_by_name(name);
+            if (model) {
+                return model;
+            }
+        }
+        return null;
+    }
+
+    function applyPlotData(data) {
+        const x = decodeFloat64(data.x);
+        const columns = {};
+        Object.entries(data.columns || {}).forEach(([name, encoded]) => {
+            columns[name] = decodeFloat64(encoded);
+        });
+        Object.entries(data.figures || {}).forEach(([figureKey, names]) => {
+            const source = findPlotSource(`plot-data:${data.set}:${figureKey}`);
+            if (!source) {
+                return;
+            }
+            const update = { x };
+            names.forEach((name) => {
+                if (columns[name]) {
+                    update[name] = columns[name];
+                }
+            });
+            source.data = update;
+        });
+    }
+
+    // Start JD of the last bin per plot set: later refreshes only fetch
+    // the bins from there on (``since_jd``).
+    const plotDataCursors = {};
+
+    function applyPlotDelta(data) {
+        const columns = {};
+        Object.entries(data.columns || {}).forEach(([name, encoded]) => {
+            columns[name] = Array.from(decodeFloat64(encoded));
+        });
+        appendPlotBins(data.set, {
+            x: Array.from(decodeFloat64(data.x)),
+            columns,
+            figures: data.figures,
+        });
+    }
+
+    function refreshPlotData(plotSet) {
+        const params = plotQueryParams();
+        params.set('set', plotSet);
+        const cursor = plotDataCursors[plotSet];
+        if (cursor !== undefined && cursor !== null && !params.has('downsample')) {
+            params.set('since_jd', String(cursor));
+        }
+        return fetch(`${window.PLOT_DATA_URL}?${params.toString()}`)
+            .then((response) => {
+                if (!response.ok) {
+                    throw new Error(`Failed to load plot data (${response.status})`);
+                }
+                return response.json();
+            })
+            .then((data) => {
+                // Too many rows: keep the figures as rendered
+                if (data.note) {
+                    return;
+                }
+                if (data.delta) {
+                    applyPlotDelta(data);
+                } else {
+                    applyPlotData(data);
+                }
+                plotDataCursors[plotSet] = data.cursor_jd;
+            });
+    }
+
+    function appendPlotBins(plotSet, data) {
+        const x = data.x || [];
+        const columns = {};
+        Object.entries(data.columns || {}).forEach(([name, values]) => {
+            columns[name] = values.map((value) => (value === null ? NaN : value));
+        });
+        Object.entries(data.figures || {}).forEach(([figureKey, names]) => {
+            const source = findPlotSource(`plot-data:${plotSet}:${figureKey}`);
+            if (!source || x.length === 0) {
+                return;
+            }
+            const length = source.data.x ? source.data.x.length : 0;
+            let first = 0;
+            // The open trailing bin of the page is replaced by its closed version
+            if (length > 0 && source.data.x[length - 1] >= x[0]) {
+                const patches = { x: [[length - 1, x[0]]] };
+                names.forEach((name) => {
+                    patches[name] = [[length - 1, columns[name][0]]];
+                });
+                source.patch(patches);
+                first = 1;
+            }
+            if (x.length > first) {
+                const update = { x: x.slice(first) };
+                names.forEach((name) => {
+                    update[name] = columns[name].slice(first);
+                });
+                // Rollover keeps the plotted time window at its length
+                source.stream(update, Math.max(length, 1));
+            }
+        });
+    }
+
+    function openLiveStream() {
+        const params = plotQueryParams();
+        // Min/max and LTTB points are not time bins
+        if (!window.EventSource || params.has('downsample')) {
+            return false;
+        }
+        const stream = new EventSource(`${window.LIVE_STREAM_URL}?${params.toString()}`);
+        stream.addEventListener('bins', function (event) {
+            const data = JSON.parse(event.data);
+            Object.entries(data.sets || {}).forEach(([plotSet, setData]) => {
+                appendPlotBins(plotSet, setData);
+            });
+        });
+        return true;
+    }
+
+    // Swap new data into the rendered figures instead of reloading the page
+    // (relative ranges only; custom date ranges do not move). The live stream
+    // pushes closed bins; without it the plot data is polled.
+    const plotDataRefreshMs = Number(window.PLOT_DATA_REFRESH_SECONDS || 0) * 1000;
+    const hasCustomRange = new URLSearchParams(window.location.search).has('start_date');
+    const liveStreamOpen = Boolean(
+        window.LIVE_STREAM_URL && !hasCustomRange && openLiveStream()
+    );
+    if (window.PLOT_DATA_URL && plotDataRefreshMs > 0 && !hasCustomRange && !liveStreamOpen) {
+        setInterval(function () {
+            if (document.hidden) {
+                return;
+            }
+            refreshPlotData('main').catch(() => {});
+            const container = document.getElementById('additional-plots');
+            if (container && container.getAttribute('data-loaded') === 'true') {
+                refreshPlotData('additional').catch(() => {});
+            }
+        }, plotDataRefreshMs);
+    }
+
     const ADDITIONAL_PLOTS_OPEN_KEY = 'additionalPlotsOpen';
 
     function setAdditionalPlotsOpen(isOpen) {
@@ -1,10 +1,19 @@
 from django.conf import settings
-from django.core.checks import Error, register
+from django.core.checks import Error, Warning, register
 
 
 @register()
 def weather_deploy_checks(app_configs, **kwargs):
     errors = []
+    if getattr(settings, 'LIVE_STREAM_ENABLED', False):
+        from datasets.live import live_updates_shared
+
+        if not live_updates_shared():
+            errors.append(Warning(
+                'LIVE_STREAM_ENABLED needs REDIS_URL or a cache shared by all '
+                'workers; live updates stay off with a per-process cache',
+                id='weather.W001',
+            ))
     if getattr(settings, 'DJANGO_ENV', None) != 'production':
         return errors
 
@@ -154,13 +154,56 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Dashboard plot cache
 PLOT_CACHE_MIN_RESOLUTION_SECONDS = 60
 PLOT_CACHE_LIVE_MAX_DAYS = 1.0
-PLOT_CACHE_TTL_SECONDS = 30
+PLOT_CACHE_TTL_SECONDS = 30  # soft TTL: served as a fresh hit
+PLOT_CACHE_HARD_TTL_SECONDS = 300  # served stale while one worker rebuilds
+PLOT_CACHE_LOCK_SECONDS = 60
+PLOT_CACHE_LOCK_WAIT_SECONDS = 5
 PLOT_CACHE_BYPASS_QUERY = 'fresh'
+# Child processes per web worker that render plots (0: render in the request)
+PLOT_RENDER_WORKERS = env.int('PLOT_RENDER_WORKERS', default=0)
+PLOT_RENDER_TIMEOUT_SECONDS = 30
+# Dashboard swaps new plot data in place (relative ranges); 0 disables
+PLOT_DATA_REFRESH_SECONDS = 60
+# Point budget of the min/max and LTTB plot modes (about the plot width in px)
+PLOT_DOWNSAMPLE_POINTS = 2000
+# Server-Sent Events with newly closed plot bins (`weather_api/live/`). Each
+# open stream holds a worker thread: run gunicorn with gthread or ASGI workers.
+LIVE_STREAM_ENABLED = env.bool('LIVE_STREAM_ENABLED', default=False)
+LIVE_STREAM_CHANNEL = 'weather:live'
+LIVE_STREAM_MAX_SECONDS = 300  # clients reconnect with Last-Event-ID
+LIVE_STREAM_HEARTBEAT_SECONDS = 15
+LIVE_STREAM_RETRY_SECONDS = 5  # EventSource reconnect delay (SSE retry)
+LIVE_STREAM_POLL_SECONDS = 2.0  # without Redis pub/sub
+LIVE_STREAM_MAX_CATCHUP_BINS = 288
+# Presets (range days:resolution seconds) rendered by `manage.py warm_plot_cache`
+PLOT_WARM_PRESETS = env.list('PLOT_WARM_PRESETS', default=['0.5:300', '1:300', '7:1800', '30:3600'])
+# Binned chunks of closed time bins (datasets.plot_chunks)
+PLOT_CHUNK_BINS = 64
+PLOT_CHUNK_SETTLE_SECONDS = 300
+PLOT_CHUNK_TTL_SECONDS = 6 * 3600
 
 PLOT_PG_BIN_MIN_DAYS = 1.0
 
+# Read long-range plots from datasets.DatasetRollup (run rebuild_rollups first)
+PLOT_ROLLUPS_ENABLED = env.bool('PLOT_ROLLUPS_ENABLED', default=False)
+PLOT_ROLLUP_MIN_DAYS = 1.0
+
 PLOT_DISPLAY_TIMEZONE = env('PLOT_DISPLAY_TIMEZONE', default='Europe/Berlin')
 
+# Retention policy of `manage.py merge_retention` (AGE_DAYS:BIN_SECONDS): data
+# older than AGE_DAYS is merged into BIN_SECONDS bins, newer data stays raw
+MERGE_RETENTION_TIERS = env.list('MERGE_RETENTION_TIERS', default=['3:60', '90:600', '730:3600'])
+
+# Route last_dataset, plot-data, additional-plots and download-csv to async
+# views; only useful under ASGI workers (see README "Async read API")
+ASYNC_READ_API = env.bool('ASYNC_READ_API', default=False)
+
+# Dashboard header / last_dataset snapshot; rebuilt on upload and on a miss
+CURRENT_CONDITIONS_TTL_SECONDS = 300
+
+# Sunrise/sunset/moon phase days cached ahead by `manage.py warm_plot_cache`
+EPHEMERIS_PRECOMPUTE_DAYS = 7
+
 # Upload authentication
 UPLOAD_AUTH_MODE = env('UPLOAD_AUTH_MODE', default='dual')  # dual | hmac_only
 UPLOAD_LEGACY_BASIC_USERNAME = env('UPLOAD_LEGACY_BASIC_USERNAME', default='data_upload_user')
@@ -168,15 +211,34 @@ UPLOAD_HMAC_CANONICAL_PATH = env(
     'UPLOAD_HMAC_CANONICAL_PATH',
     default='/weather_station/weather_api/datasets/',
 )
+UPLOAD_HMAC_BATCH_CANONICAL_PATH = env(
+    'UPLOAD_HMAC_BATCH_CANONICAL_PATH',
+    default='/weather_station/weather_api/datasets/batch/',
+)
+# Readings per signed batch upload (NDJSON lines)
+UPLOAD_BATCH_MAX_ROWS = env.int('UPLOAD_BATCH_MAX_ROWS', default=500)
 UPLOAD_HMAC_TIMESTAMP_SKEW_SECONDS = env.int('UPLOAD_HMAC_TIMESTAMP_SKEW_SECONDS', default=300)
 UPLOAD_HMAC_REPLAY_TTL_SECONDS = env.int('UPLOAD_HMAC_REPLAY_TTL_SECONDS', default=600)
 UPLOAD_REPLAY_CACHE_ALIAS = env('UPLOAD_REPLAY_CACHE_ALIAS', default='default')
+# auto: atomic Lua script on REDIS_URL, else the cache alias above | redis | cache
+UPLOAD_REPLAY_BACKEND = env('UPLOAD_REPLAY_BACKEND', default='auto')
+UPLOAD_REPLAY_REDIS_PREFIX = 'weather:'
+# sync | queue: acknowledge uploads after appending them to a Redis stream
+# (needs REDIS_URL and `manage.py drain_ingest_queue` running)
+UPLOAD_INGEST_MODE = env('UPLOAD_INGEST_MODE', default='sync')
+UPLOAD_INGEST_STREAM = 'weather:ingest'
+UPLOAD_INGEST_GROUP = 'ingest-writers'
+UPLOAD_INGEST_BATCH_SIZE = 500
+UPLOAD_INGEST_CLAIM_IDLE_SECONDS = 60  # entries of a dead writer are re-read after this
 UPLOAD_JD_MAX_AGE_DAYS = env.float('UPLOAD_JD_MAX_AGE_DAYS', default=1.0)
 UPLOAD_JD_MAX_FUTURE_DAYS = env.float(
     'UPLOAD_JD_MAX_FUTURE_DAYS',
     default=5.0 / (24.0 * 60.0),
 )
 UPLOAD_CREDENTIAL_MASTER_KEY = env('UPLOAD_CREDENTIAL_MASTER_KEY', default='')
+# Decrypted signing keys kept per worker; key commands and admin edits invalidate them
+UPLOAD_CREDENTIAL_CACHE_TTL_SECONDS = env.int('UPLOAD_CREDENTIAL_CACHE_TTL_SECONDS', default=300)
+UPLOAD_CREDENTIAL_CACHE_SIZE = 64
 
 DASHBOARD_RATE_LIMIT_ENABLED = env.bool('DASHBOARD_RATE_LIMIT_ENABLED', default=True)
 DASHBOARD_RATE_LIMIT_PER_MINUTE = env.int('DASHBOARD_RATE_LIMIT_PER_MINUTE', default=60)
@@ -194,6 +256,9 @@ CACHES = {
     }
 }
 
+# Redis for pub/sub (production reads it again and requires it)
+REDIS_URL = env('REDIS_URL', default='')
+
 # Fail-fast environment selection — no DEVICE/hostname fallback.
 _django_env = env('DJANGO_ENV', default='').strip().lower()
 if _django_env not in ('development', 'production'):
@@ -220,6 +285,7 @@ if DJANGO_ENV == 'production':
         SECURE_HSTS_INCLUDE_SUBDOMAINS,
         SECURE_HSTS_PRELOAD,
         CACHES,
+        REDIS_URL,
     )
 else:
     from .settings_development import DEBUG, ALLOWED_HOSTS, DATABASES, LOGGING